@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
 import os
+from importlib import import_module
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MainApp.settings")
 
 application = get_asgi_application()
+
+# Import the URLconf, and with it every view and serializer, now rather than on
+# the first request. Servers that preload the application then do it once,
+# before forking their workers.
+import_module(settings.ROOT_URLCONF)
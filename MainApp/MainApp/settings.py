@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,6 +31,24 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# SHOP_API_ONLY=1 starts a worker that serves only the API, /metrics and the
+# prebuilt /schema/: the admin, the Swagger UI, the browsable API and the apps
+# and middleware only they need are left out, so the process imports and
+# checks less at startup.
+SHOP_API_ONLY = os.environ.get("SHOP_API_ONLY") == "1"
+API_ONLY_EXCLUDED = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "drf_spectacular",
+    "rest_framework.renderers.BrowsableAPIRenderer",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.contrib.messages.context_processors.messages",
+]
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -44,7 +63,11 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "ShopAPI.authentication.CachedTokenAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "ShopAPI.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
@@ -52,6 +75,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    # First, so the metrics cover the other middleware too.
+    "ShopAPI.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,6 +105,70 @@ TEMPLATES = [
 ]
 SPECTACULAR_SETTINGS = {"TITLE": "Shop api"}
 
+if SHOP_API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_ONLY_EXCLUDED]
+    MIDDLEWARE = [name for name in MIDDLEWARE if name not in API_ONLY_EXCLUDED]
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        name
+        for name in REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]
+        if name not in API_ONLY_EXCLUDED
+    ]
+    TEMPLATES[0]["OPTIONS"]["context_processors"] = [
+        name
+        for name in TEMPLATES[0]["OPTIONS"]["context_processors"]
+        if name not in API_ONLY_EXCLUDED
+    ]
+
+# The OpenAPI schema served at /schema/, written by "python manage.py
+# build_schema" (see ShopAPI/schema.py), and how long clients may cache it.
+SHOP_SCHEMA_FILE = os.environ.get("SHOP_SCHEMA_FILE", BASE_DIR / "openapi.json")
+SHOP_SCHEMA_MAX_AGE = 3600
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Serialized purchase orders, see ShopAPI/order_cache.py. LocMem is per
+    # process; for several workers switch to a shared backend such as
+    # FileBasedCache with LOCATION on /dev/shm or a cache server. The
+    # ShopAPI.caching backend reports its evictions under its LOCATION.
+    "orders": {
+        "BACKEND": "ShopAPI.caching.LocMemCache",
+        "LOCATION": "orders",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # Resolved API tokens, see ShopAPI/authentication.py. Signals clear entries
+    # in the process that made the change only, so with several workers use a
+    # shared backend (e.g. FileBasedCache on /dev/shm) or accept that revoked
+    # tokens keep working for up to TIMEOUT seconds in the other workers.
+    "tokens": {
+        "BACKEND": "ShopAPI.caching.LocMemCache",
+        "LOCATION": "tokens",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+SHOP_ORDER_CACHE = "orders"
+SHOP_TOKEN_CACHE = "tokens"
+
+# How ShopAPI.renderers writes Decimal values: "number" (like DRF's renderer)
+# or "string".
+SHOP_JSON_DECIMALS = "number"
+
+# Route the ShopAPI endpoints to the native async views in
+# ShopAPI/async_views.py. Only useful when serving MainApp.asgi.
+SHOP_ASYNC_VIEWS = False
+
+# Per-route latency, phase and query metrics, served at /metrics. Requests
+# slower than SHOP_SLOW_REQUEST_MS are logged with their slowest queries (None
+# turns the log off).
+SHOP_METRICS = True
+SHOP_SLOW_REQUEST_MS = 500
+
 
 WSGI_APPLICATION = "MainApp.wsgi.application"
 
@@ -87,13 +176,73 @@ WSGI_APPLICATION = "MainApp.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+# SQLite by default. Set DATABASE_ENGINE=postgresql and the POSTGRES_*
+# variables to use PostgreSQL instead; with POSTGRES_POOLER=pgbouncer the
+# connections go through a PgBouncer pool in transaction mode.
+#
+# DATABASE_PROFILE=production keeps connections open for
+# DATABASE_CONN_MAX_AGE seconds, checked before reuse, and tunes SQLite with
+# SQLITE_PRODUCTION_OPTIONS. The default profile is Django's plain
+# configuration, which development and the tests use.
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "default")
+if DATABASE_PROFILE not in ("default", "production"):
+    raise ValueError(f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}.")
+DATABASE_CONN_MAX_AGE = int(
+    os.environ.get(
+        "DATABASE_CONN_MAX_AGE", 60 if DATABASE_PROFILE == "production" else 0
+    )
+)
+
+SQLITE_PRODUCTION_OPTIONS = {
+    # Seconds a writer waits for the lock before "database is locked".
+    "timeout": 20,
+    # Take the write lock when atomic() starts, so writers queue for the
+    # timeout instead of failing on a lock upgrade.
+    "transaction_mode": "IMMEDIATE",
+    # WAL lets readers run alongside the single writer, and synchronous=NORMAL
+    # is durable in WAL mode except for the last commits before a power loss.
+    "pragmas": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -64000,  # KiB, i.e. 64 MB
+        "mmap_size": 256 * 1024 * 1024,
+    },
 }
 
+if DATABASE_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "shop"),
+            "USER": os.environ.get("POSTGRES_USER", "shop"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DATABASE_PROFILE == "production",
+            # Server-side cursors (used by QuerySet.iterator()) do not
+            # survive transaction pooling.
+            "DISABLE_SERVER_SIDE_CURSORS": (
+                os.environ.get("POSTGRES_POOLER") == "pgbouncer"
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        }
+    }
+    if DATABASE_PROFILE == "production":
+        DATABASES["default"].update(
+            # Django's backend plus the pragmas and transaction_mode options.
+            ENGINE="ShopAPI.backends.sqlite3",
+            CONN_HEALTH_CHECKS=True,
+            OPTIONS=SQLITE_PRODUCTION_OPTIONS,
+        )
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -14,19 +14,28 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import include, path
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from ShopAPI.metrics import metrics_view
+from ShopAPI.schema import schema_view
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include("ShopAPI.urls")),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "",
-        SpectacularSwaggerView.as_view(
-            template_name="swagger-ui.html", url_name="schema"
-        ),
-        name="Docs",
-    ),
+    path("metrics", metrics_view, name="metrics"),
+    path("schema/", schema_view, name="schema"),
 ]
+
+if not getattr(settings, "SHOP_API_ONLY", False):
+    from django.contrib import admin
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    urlpatterns += [
+        path("admin/", admin.site.urls),
+        path(
+            "",
+            SpectacularSwaggerView.as_view(
+                template_name="swagger-ui.html", url_name="schema"
+            ),
+            name="Docs",
+        ),
+    ]
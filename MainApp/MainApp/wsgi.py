@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 """
 
 import os
+from importlib import import_module
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MainApp.settings")
 
 application = get_wsgi_application()
+
+# Import the URLconf, and with it every view and serializer, now rather than on
+# the first request. Servers that preload the application then do it once,
+# before forking their workers.
+import_module(settings.ROOT_URLCONF)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ShopapiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ShopAPI"
+
+    def ready(self):
+        # Connects the signals keeping the token cache and the search index in
+        # step and recording the queries of each request.
+        from . import authentication, metrics, search  # noqa: F401
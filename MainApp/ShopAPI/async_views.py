@@ -0,0 +1,212 @@
+"""Native async versions of the purchase order views for ASGI deployments.
+
+DRF's ``APIView`` is synchronous, so under ASGI every request would hold a
+worker thread for its whole duration. These views run on the event loop and use
+Django's async ORM API (``aget``, ``afirst``, ``async for``). They
+reuse the DRF request handling, serializers, pagination and JSON rendering, so
+the responses are the same as those of ``ShopAPI.views``. Writes still go
+through ``sync_to_async`` because ``transaction.atomic()`` has no async
+version, and so does the list page, which DRF's paginator fetches itself.
+
+They are routed instead of the sync views when ``SHOP_ASYNC_VIEWS`` is set.
+"""
+from inspect import iscoroutine
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from . import fieldsets, metrics
+from .models import PurchaseOrder
+from .fast_serializers import aserialize_orders
+from .order_cache import aget_order_data
+from .pagination import PurchaseOrderCursorPagination
+from .serializers import PurchaseOrderMutateSerializer, PurchaseOrderSerializer
+from .streaming import STREAM_CONTENT_TYPES, stream_orders
+from .views import (
+    delete_order,
+    filter_orders,
+    if_match_versions,
+    not_found,
+    order_etag,
+    page_etag,
+)
+
+
+class AsyncAPIView(APIView):
+    """DRF's ``APIView`` with an async ``dispatch``.
+
+    Requests go through the same ``initialize_request``, ``initial``,
+    ``handle_exception`` and ``finalize_response`` as the sync views, so
+    authentication, parsing, error responses and rendering are shared. Only
+    the credentials are checked first, with the authenticators'
+    ``aauthenticate``, because DRF's ``authenticate`` would query the database
+    from the event loop.
+    """
+
+    # The browsable API builds its forms with the ORM, which async code cannot.
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES[:1]
+
+    async def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch, awaiting the authentication and the handler.
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if isinstance(self.response, Response):
+            # Rendered here; Django would render it in a worker thread.
+            self.response.render()
+            self.response = HttpResponse(
+                self.response.content,
+                status=self.response.status_code,
+                headers=self.response.headers,
+            )
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """Set ``request.user`` and ``request.auth`` before ``initial`` runs.
+
+        Without credentials nothing is set and ``initial`` falls back to the
+        unauthenticated user as usual, which needs no queries.
+        """
+        for authenticator in request.authenticators:
+            user_auth_tuple = await authenticator.aauthenticate(request)
+            if user_auth_tuple is not None:
+                request.user, request.auth = user_auth_tuple
+                return
+
+
+class AsyncPurchaseOrderView(AsyncAPIView):
+    async def post(self, request):
+        serializer = PurchaseOrderMutateSerializer(data=request.data)
+
+        if serializer.is_valid():
+            response_data = await sync_to_async(serializer.save)()
+            return Response(response_data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    async def get(self, request):
+        stream_format = request.query_params.get("stream")
+        if stream_format and stream_format not in STREAM_CONTENT_TYPES:
+            return Response(
+                f"Unsupported stream format: {stream_format}",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fields = fieldsets.get_fields(request)
+        queryset = fieldsets.select_fields(filter_orders(request), fields)
+
+        if stream_format:
+            return stream_orders(
+                queryset, stream_format, asynchronous=True, fields=fields
+            )
+
+        paginator = PurchaseOrderCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, request, view=self)
+        etag = page_etag(request, paginator, page)
+        # No Last-Modified: deleting an order from the page would not move it.
+        response = get_conditional_response(request, etag)
+        if response is None:
+            with metrics.phase("serialize"):
+                data = await aserialize_orders(page, fields)
+            response = paginator.get_paginated_response(data)
+        response["ETag"] = etag
+        return response
+
+
+class AsyncPurchaseOrderIDView(AsyncAPIView):
+    async def get(self, request, id):
+        state = (
+            await PurchaseOrder.objects.filter(id=id)
+            .values_list("version", "updated_at")
+            .afirst()
+        )
+        if state is None:
+            return not_found()
+        version, updated_at = state
+        fields = fieldsets.get_fields(request)
+        etag = order_etag(id, version, fields)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag, last_modified)
+        if response is None and fields != fieldsets.ORDER_FIELDS:
+            # The cache only holds complete orders; a narrow query is cheaper.
+            queryset = PurchaseOrder.objects.filter(id=id)
+            orders = [
+                order async for order in fieldsets.select_fields(queryset, fields)
+            ]
+            with metrics.phase("serialize"):
+                data = await aserialize_orders(orders, fields)
+            if not data:
+                return not_found()
+            response = Response(data[0])
+        elif response is None:
+
+            async def serialize():
+                instance = await PurchaseOrder.objects.with_related().aget(id=id)
+                return PurchaseOrderSerializer(instance).data
+
+            try:
+                with metrics.phase("serialize"):
+                    data = await aget_order_data(id, version, serialize)
+            except ObjectDoesNotExist:
+                return not_found()
+            response = Response(data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    async def put(self, request, id):
+        instance = await PurchaseOrder.objects.filter(id=id).afirst()
+        if instance is None:
+            return not_found()
+
+        serializer = PurchaseOrderMutateSerializer(
+            instance,
+            data=request.data,
+            partial=True,
+            context={"if_match": if_match_versions(request, id)},
+        )
+        if serializer.is_valid():
+            try:
+                response_data = await sync_to_async(serializer.save)()
+            except KeyError:
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            response = Response(response_data, status=status.HTTP_201_CREATED)
+            response["ETag"] = order_etag(instance.id, instance.version)
+            return response
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    async def delete(self, request, id):
+        instance = await PurchaseOrder.objects.filter(id=id).afirst()
+        if instance is None:
+            return not_found()
+
+        # The version check, the rollup update and the deletes share one
+        # transaction.
+        await sync_to_async(delete_order)(instance, if_match_versions(request, id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
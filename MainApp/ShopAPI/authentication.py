@@ -0,0 +1,207 @@
+"""Token authentication that answers from a cache instead of the database.
+
+DRF's ``TokenAuthentication`` joins the token and its user on every request.
+:class:`CachedTokenAuthentication` keeps resolved tokens in the
+``SHOP_TOKEN_CACHE`` cache and only queries on a miss. The cache bounds the
+number of entries and their age (``MAX_ENTRIES`` and ``TIMEOUT`` of the
+alias); its hits and misses are reported through ``cache_stats``.
+
+Entries are keyed by a hash of the token and hold the user's fields without
+the password hash, so a shared file or memory backend never stores either
+secret. Saving or deleting a token or a user, including deactivating the
+user, forgets the affected tokens through signals, both right away and once
+the transaction commits.
+
+Forgetting a token also replaces its generation, a random value stored next
+to the entry. Every entry records the generation read before its database
+query and only counts as a hit while that is still the current one. A request
+that read the old user before a change committed, and caches it afterwards,
+therefore writes an entry that is never used. Changes that bypass signals,
+such as queryset ``update()``, show up once the entries expire; call
+:func:`forget_user` after them.
+"""
+import hashlib
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .caching import cache_stats
+
+TOKEN_CACHE = getattr(settings, "SHOP_TOKEN_CACHE", "tokens")
+
+
+def _cache():
+    return caches[TOKEN_CACHE]
+
+
+def _key(token_key):
+    digest = hashlib.sha256(token_key.encode()).hexdigest()
+    return f"token:{digest}"
+
+
+def _generation_key(token_key):
+    return f"{_key(token_key)}:generation"
+
+
+@lru_cache(maxsize=None)
+def _user_fields():
+    # Every column of the user except the password hash, which stays deferred.
+    return tuple(
+        field.attname
+        for field in get_user_model()._meta.concrete_fields
+        if field.name != "password"
+    )
+
+
+def _token_model():
+    from rest_framework.authtoken.models import Token
+
+    return Token
+
+
+def _entry(token, generation):
+    user = token.user
+    values = tuple(getattr(user, name) for name in _user_fields())
+    return generation, token.created, values
+
+
+def _current_entry(token_key, cached):
+    """Return the entry in ``cached`` if its generation is still current."""
+    entry = cached.get(_key(token_key))
+    if entry is not None and entry[0] == cached.get(_generation_key(token_key)):
+        return entry
+    return None
+
+
+def _from_entry(token_key, entry):
+    _, created, values = entry
+    User = get_user_model()
+    user = User.from_db(router.db_for_read(User), _user_fields(), values)
+    Token = _token_model()
+    token = Token.from_db(
+        router.db_for_read(Token),
+        ["key", "user_id", "created"],
+        (token_key, user.pk, created),
+    )
+    token.user = user
+    return user, token
+
+
+def _check(user, token):
+    # The same checks and messages as TokenAuthentication.
+    if token is None:
+        raise AuthenticationFailed(_("Invalid token."))
+    if not user.is_active:
+        raise AuthenticationFailed(_("User inactive or deleted."))
+    return user, token
+
+
+def authenticate_credentials(token_key):
+    """Return ``(user, token)`` for ``token_key``, from the cache if possible."""
+    cache = _cache()
+    stats = cache_stats(TOKEN_CACHE)
+    cached = cache.get_many([_key(token_key), _generation_key(token_key)])
+    entry = _current_entry(token_key, cached)
+    if entry is not None:
+        stats.incr("hits")
+        return _check(*_from_entry(token_key, entry))
+    stats.incr("misses")
+    Token = _token_model()
+    token = Token.objects.select_related("user").filter(key=token_key).first()
+    user, token = _check(token and token.user, token)
+    generation = cached.get(_generation_key(token_key))
+    cache.set(_key(token_key), _entry(token, generation))
+    return user, token
+
+
+async def aauthenticate_credentials(token_key):
+    """Async counterpart of :func:`authenticate_credentials`."""
+    cache = _cache()
+    stats = cache_stats(TOKEN_CACHE)
+    cached = await cache.aget_many([_key(token_key), _generation_key(token_key)])
+    entry = _current_entry(token_key, cached)
+    if entry is not None:
+        stats.incr("hits")
+        return _check(*_from_entry(token_key, entry))
+    stats.incr("misses")
+    Token = _token_model()
+    token = await Token.objects.select_related("user").filter(key=token_key).afirst()
+    user, token = _check(token and token.user, token)
+    generation = cached.get(_generation_key(token_key))
+    await cache.aset(_key(token_key), _entry(token, generation))
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` backed by the ``SHOP_TOKEN_CACHE`` cache.
+
+    :meth:`aauthenticate` is the same check for ``ShopAPI.async_views``.
+    """
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else await aauthenticate_credentials(key)
+
+    def get_key(self, request):
+        """Return the key of the ``Authorization`` header, or None if unset.
+
+        ``TokenAuthentication.authenticate`` validates the header and passes
+        the key to ``authenticate_credentials``, which returns it as it is.
+        """
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+def forget_tokens(token_keys):
+    token_keys = list(token_keys)
+    cache = _cache()
+    # Generations never expire, so an entry written late cannot outlive them.
+    cache.set_many(
+        {_generation_key(token_key): uuid.uuid4().hex for token_key in token_keys},
+        timeout=None,
+    )
+    cache.delete_many([_key(token_key) for token_key in token_keys])
+    cache_stats(TOKEN_CACHE).incr("invalidations", len(token_keys))
+
+
+def forget_user(user_id):
+    """Drop the cached tokens of a user."""
+    Token = _token_model()
+    forget_tokens(Token.objects.filter(user_id=user_id).values_list("key", flat=True))
+
+
+def clear():
+    _cache().clear()
+
+
+def _forget_now_and_on_commit(forget, *args):
+    forget(*args)
+    transaction.on_commit(lambda: forget(*args))
+
+
+@receiver(post_save, sender="authtoken.Token")
+@receiver(post_delete, sender="authtoken.Token")
+def _forget_token(sender, instance, **kwargs):
+    _forget_now_and_on_commit(forget_tokens, [instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _forget_user(sender, instance, created, **kwargs):
+    # Deleting a user deletes its tokens, which forgets them.
+    if not created:
+        _forget_now_and_on_commit(forget_user, instance.pk)
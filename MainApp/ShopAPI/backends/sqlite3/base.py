@@ -0,0 +1,40 @@
+"""Django's SQLite backend with connection pragmas and a transaction mode.
+
+Two extra ``OPTIONS`` are understood, in the spirit of the ones Django 5.1
+adds:
+
+``pragmas``
+    A ``{name: value}`` dict of ``PRAGMA`` statements run on every new
+    connection, e.g. ``{"journal_mode": "wal"}``.
+
+``transaction_mode``
+    ``"DEFERRED"`` (SQLite's and Django's default), ``"IMMEDIATE"`` or
+    ``"EXCLUSIVE"``. With ``IMMEDIATE``, ``atomic()`` takes the write lock when
+    it starts. A deferred transaction that reads first and writes later cannot
+    wait for the lock (SQLite fails it at once with "database is locked"),
+    whereas an immediate one waits up to the busy timeout.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop("pragmas", {})
+        self.transaction_mode = kwargs.pop("transaction_mode", "DEFERRED").upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            choices = ", ".join(TRANSACTION_MODES)
+            raise ImproperlyConfigured(f"transaction_mode must be one of {choices}.")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
@@ -0,0 +1,159 @@
+"""Create many purchase orders in one request.
+
+Every order is validated with ``PurchaseOrderMutateSerializer`` before anything
+is written. Then, in one transaction, the suppliers referenced by id or by name
+and email are read and locked with one query through ``ShopAPI.suppliers``,
+order numbers are reserved as a single block and orders and line items are
+inserted with ``bulk_create``.
+
+In ``atomic`` mode any invalid order fails the whole batch. In ``partial``
+mode invalid orders are reported and the valid ones are still created. Both
+modes return one result per submitted order, in submission order.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from . import reports, search, suppliers
+from .models import LineItem, PurchaseOrder
+from .order_numbers import allocate_order_numbers
+from .response_formatter import purchase_order_formatter
+from .serializers import PurchaseOrderMutateSerializer
+from .totals import calculate_totals
+
+ATOMIC = "atomic"
+PARTIAL = "partial"
+BATCH_MODES = (ATOMIC, PARTIAL)
+
+# Bounds the memory held per request and the size of the supplier lookup.
+MAX_BATCH_SIZE = 10000
+
+
+def get_batch_mode(request):
+    mode = request.query_params.get("mode", ATOMIC)
+    if mode not in BATCH_MODES:
+        choices = ", ".join(BATCH_MODES)
+        raise ValidationError({"mode": f"Must be one of {choices}."})
+    return mode
+
+
+def validate_orders(items):
+    """Return ``({index: validated data}, {index: errors})`` for ``items``."""
+    if not isinstance(items, list):
+        raise ValidationError("Expected a list of purchase orders.")
+    if not items:
+        raise ValidationError("Expected at least one purchase order.")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValidationError(
+            f"A batch may contain at most {MAX_BATCH_SIZE} purchase orders."
+        )
+    validated, errors = {}, {}
+    for index, item in enumerate(items):
+        serializer = PurchaseOrderMutateSerializer(data=item)
+        if serializer.is_valid():
+            validated[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    return validated, errors
+
+
+def resolve_suppliers(validated, errors):
+    """Attach a supplier to every validated order, without writing anything.
+
+    Orders naming an unknown supplier id are moved from ``validated`` to
+    ``errors``. Call it in the transaction that saves the suppliers.
+    """
+    resolution = suppliers.resolve_suppliers(
+        [data["supplier"] for data in validated.values()]
+    )
+    for (index, data), supplier in zip(list(validated.items()), resolution.suppliers):
+        if supplier is None:
+            del validated[index]
+            errors[index] = {"supplier": {"id": ["Supplier not found."]}}
+        else:
+            data["supplier_instance"] = supplier
+    return resolution
+
+
+def create_orders(items, mode=ATOMIC):
+    """Create the orders in ``items`` and return ``(results, created count)``."""
+    validated, errors = validate_orders(items)
+    if errors and mode == ATOMIC:
+        return _results(len(items), {}, validated, errors), 0
+
+    purchase_orders, line_items, order_lines = {}, [], defaultdict(list)
+    with transaction.atomic():
+        resolution = resolve_suppliers(validated, errors)
+        if (errors and mode == ATOMIC) or not validated:
+            return _results(len(items), {}, validated, errors), 0
+        suppliers.save_suppliers(resolution)
+
+        order_numbers = allocate_order_numbers(len(validated))
+        for (index, data), order_number in zip(validated.items(), order_numbers):
+            totals = calculate_totals(data["line_items"])
+            purchase_orders[index] = purchase_order = PurchaseOrder(
+                supplier=data["supplier_instance"],
+                order_number=order_number,
+                total_quantity=totals.total_quantity,
+                total_amount=totals.total_amount,
+                total_tax=totals.total_tax,
+            )
+            for line_item_data, line_total in zip(
+                data["line_items"], totals.line_totals
+            ):
+                # Line item ids only mean something when updating an order.
+                line_item_data.pop("id", None)
+                line_item_data["line_total"] = line_total
+                line_item = LineItem(purchase_order=purchase_order, **line_item_data)
+                line_items.append((line_item_data, line_item))
+                order_lines[index].append(line_item)
+        PurchaseOrder.objects.bulk_create(purchase_orders.values())
+        LineItem.objects.bulk_create([line_item for _, line_item in line_items])
+        rollups = reports.Rollups()
+        for index, purchase_order in purchase_orders.items():
+            rollups.add_order(purchase_order, order_lines[index])
+        rollups.save()
+        search.index_orders(
+            purchase_order.id for purchase_order in purchase_orders.values()
+        )
+    for line_item_data, line_item in line_items:
+        line_item_data["id"] = line_item.id
+    results = _results(len(items), purchase_orders, validated, errors)
+    return results, len(purchase_orders)
+
+
+def _results(count, purchase_orders, validated, errors):
+    results = []
+    for index in range(count):
+        if index in purchase_orders:
+            data = validated[index]
+            supplier = data["supplier_instance"]
+            supplier_data = {
+                "id": supplier.id,
+                "name": supplier.name,
+                "email": supplier.email,
+            }
+            results.append(
+                {
+                    "index": index,
+                    "status": status.HTTP_201_CREATED,
+                    **purchase_order_formatter(
+                        purchase_orders[index], supplier_data, data["line_items"]
+                    ),
+                }
+            )
+        elif index in errors:
+            results.append(
+                {
+                    "index": index,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": errors[index],
+                }
+            )
+        else:
+            # Valid, but not created because another order in the atomic
+            # batch failed.
+            results.append({"index": index, "status": status.HTTP_424_FAILED_DEPENDENCY})
+    return results
@@ -0,0 +1,239 @@
+"""Seed data, endpoint scenarios and result comparison for ``shopbench``.
+
+Each scenario sends requests through the full Django stack with the test
+client and records the latency, the number of SQL queries and the response
+size of every request. Results are plain dicts so they can be written as JSON
+and compared with :func:`compare` later.
+"""
+import math
+import platform
+import random
+from datetime import timedelta
+from time import perf_counter
+
+import django
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import batch, reports
+from .models import PurchaseOrder
+
+SCENARIOS = ("list", "headers", "filter", "detail", "create", "update", "delete")
+TAX_RATES = {"GST 5%": 5, "GST 12%": 12, "GST 18%": 18, "VAT 20%": 20}
+ITEM_NAMES = 500
+PAGE_SIZE = 20
+# Orders created per batch while seeding.
+SEED_BATCH_SIZE = 1000
+
+# Metrics compared by compare(): name -> True when higher is better.
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "queries": False,
+    "bytes": False,
+}
+
+
+def _supplier(number):
+    return {"name": f"Supplier {number}", "email": f"supplier{number}@example.com"}
+
+
+def order_payload(rng, suppliers, lines):
+    """Return a random order payload for one of ``suppliers`` suppliers."""
+    line_items = []
+    for _ in range(lines):
+        tax_name = rng.choice(list(TAX_RATES))
+        price = rng.randint(100, 100000)
+        line_items.append(
+            {
+                "item_name": f"Item {rng.randrange(ITEM_NAMES)}",
+                "quantity": rng.randint(1, 20),
+                "price_without_tax": f"{price / 100:.2f}",
+                "tax_name": tax_name,
+                "tax_amount": f"{price * TAX_RATES[tax_name] / 10000:.2f}",
+            }
+        )
+    return {
+        "supplier": _supplier(rng.randrange(suppliers)),
+        "line_items": line_items,
+    }
+
+
+def seed(suppliers, orders, lines, days=30, seed=0):
+    """Create ``orders`` orders spread over the last ``days`` days.
+
+    Orders go through the batch create path, so the search index and the
+    rollups are written as they would be in production. Returns the order ids.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    batch_size = min(SEED_BATCH_SIZE, math.ceil(orders / days))
+    order_ids = []
+    for start in range(0, orders, batch_size):
+        count = min(batch_size, orders - start)
+        payloads = [order_payload(rng, suppliers, lines) for _ in range(count)]
+        results, _ = batch.create_orders(payloads)
+        ids = [result["data"]["id"] for result in results]
+        day = now - timedelta(days=start * days // orders)
+        PurchaseOrder.objects.filter(id__in=ids).update(order_time=day)
+        order_ids += ids
+    with transaction.atomic():
+        reports.rebuild()
+    return order_ids
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _percentile(ordered, percent):
+    # Nearest-rank percentile of an already sorted list.
+    index = max(math.ceil(len(ordered) * percent / 100) - 1, 0)
+    return ordered[index]
+
+
+def summarize(latencies, queries, errors, seconds, sizes=()):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / seconds, 1) if seconds else 0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(_percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+        "queries": round(sum(queries) / len(queries), 2),
+        "bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+class Benchmark:
+    """Runs the scenarios against a seeded database."""
+
+    def __init__(self, order_ids, suppliers, lines, seed=0):
+        self.client = Client()
+        self.rng = random.Random(seed)
+        self.order_ids = order_ids
+        self.suppliers = suppliers
+        self.lines = lines
+        self.created = []
+        # Updates must name the order's supplier by id.
+        rows = PurchaseOrder.objects.values_list(
+            "id", "supplier_id", "supplier__name", "supplier__email"
+        )
+        self.order_suppliers = {
+            order_id: {"id": supplier_id, "name": name, "email": email}
+            for order_id, supplier_id, name, email in rows.iterator()
+        }
+
+    def run(self, scenario, requests, warmup=0):
+        send = getattr(self, scenario)
+        for _ in range(warmup):
+            send()
+        latencies, queries, sizes, errors = [], [], [], 0
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = perf_counter()
+            for _ in range(requests):
+                before = counter.count
+                start = perf_counter()
+                response = send()
+                latencies.append(perf_counter() - start)
+                queries.append(counter.count - before)
+                sizes.append(len(response.content))
+                errors += response.status_code >= 400
+            seconds = perf_counter() - started
+        return summarize(latencies, queries, errors, seconds, sizes)
+
+    def _payload(self):
+        return order_payload(self.rng, self.suppliers, self.lines)
+
+    def _detail_url(self, order_id):
+        return reverse("purchase-order-id", args=[order_id])
+
+    def list(self):
+        return self.client.get(reverse("purchase-order"), {"page_size": PAGE_SIZE})
+
+    def headers(self):
+        # The list without supplier and line items, see ShopAPI.fieldsets.
+        return self.client.get(
+            reverse("purchase-order"), {"page_size": PAGE_SIZE, "include": ""}
+        )
+
+    def filter(self):
+        supplier = _supplier(self.rng.randrange(self.suppliers))
+        return self.client.get(
+            reverse("purchase-order"),
+            {"supplier_name": supplier["name"], "page_size": PAGE_SIZE},
+        )
+
+    def detail(self):
+        return self.client.get(self._detail_url(self.rng.choice(self.order_ids)))
+
+    def create(self):
+        response = self.client.post(
+            reverse("purchase-order"), self._payload(), content_type="application/json"
+        )
+        if response.status_code == 201:
+            self.created.append(response.json()["data"]["id"])
+        return response
+
+    def update(self):
+        order_id = self.rng.choice(self.order_ids)
+        payload = dict(self._payload(), supplier=self.order_suppliers[order_id])
+        return self.client.put(
+            self._detail_url(order_id), payload, content_type="application/json"
+        )
+
+    def delete(self):
+        # Deletes the orders the create scenario added, newest first, so the
+        # seeded data stays the same from run to run.
+        return self.client.delete(self._detail_url(self.created.pop()))
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def compare(baseline, current, threshold):
+    """Compare two runs scenario by scenario.
+
+    Returns ``(rows, regressions)``. Each row is ``(scenario, metric, baseline
+    value, current value, change in percent, regressed)``; a metric regresses
+    when it got worse by more than ``threshold`` percent.
+    """
+    rows, regressions = [], 0
+    for scenario, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(scenario)
+        if after is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in before or metric not in after:
+                # Recorded before the metric existed.
+                continue
+            old, new = before[metric], after[metric]
+            if old:
+                change = (new - old) / old * 100
+            else:
+                change = 0 if new == old else math.inf
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold
+            regressions += regressed
+            rows.append((scenario, metric, old, new, change, regressed))
+    return rows, regressions
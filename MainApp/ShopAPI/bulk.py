@@ -0,0 +1,90 @@
+"""Set-based INSERT, UPDATE and DELETE helpers for writes that touch many rows.
+
+``bulk_create()`` and ``bulk_update()`` build a model instance per row and
+prepare every field value through the field and the connection, which costs
+far more than the database work for narrow rows. These helpers send one
+statement with ``executemany()`` instead. They skip signals, ``save()`` and
+``pre_save()`` (so no ``auto_now``), exactly like queryset ``update()``.
+"""
+from django.db import connections, router
+
+
+def _connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def insert_rows(model, fields, rows):
+    """Insert ``rows``, tuples of values for the ``fields`` names.
+
+    Values are passed to the driver as they are, so they must already be of
+    types it accepts for the columns (``str``, ``int``, ``Decimal``; use the
+    ``<name>_id`` value for foreign keys).
+    """
+    connection = _connection(model)
+    quote_name = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in fields]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        quote_name(model._meta.db_table),
+        ", ".join(map(quote_name, columns)),
+        ", ".join(["%s"] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def update_rows(model, fields, key_fields, rows, increment=False):
+    """Update one row per tuple in ``rows``.
+
+    Each tuple holds the new values of ``fields`` followed by the values of
+    ``key_fields`` that select the row. With ``increment`` the values are
+    added to the current ones, so concurrent increments never overwrite each
+    other. Values are prepared through their fields, like ``update()`` does.
+    """
+    connection = _connection(model)
+    quote_name = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in fields]
+    key_fields = [model._meta.get_field(name) for name in key_fields]
+    assignments = ", ".join(
+        f"{quote_name(field.column)} = {quote_name(field.column)} + %s"
+        if increment
+        else f"{quote_name(field.column)} = %s"
+        for field in fields
+    )
+    condition = " AND ".join(f"{quote_name(field.column)} = %s" for field in key_fields)
+    sql = (
+        f"UPDATE {quote_name(model._meta.db_table)} SET {assignments} "
+        f"WHERE {condition}"
+    )
+    all_fields = fields + key_fields
+    params = [
+        [
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(all_fields, row)
+        ]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def delete_rows(model, key_field, values):
+    """Delete the rows whose ``key_field`` is one of ``values``; return how many.
+
+    Unlike ``QuerySet.delete()`` nothing is loaded, no signals are sent and
+    nothing is cascaded, so rows referring to these must be deleted first.
+    Keep ``values`` under the database's limit on query parameters.
+    """
+    if not values:
+        return 0
+    connection = _connection(model)
+    quote_name = connection.ops.quote_name
+    field = model._meta.get_field(key_field)
+    sql = "DELETE FROM %s WHERE %s IN (%s)" % (
+        quote_name(model._meta.db_table),
+        quote_name(field.column),
+        ", ".join(["%s"] * len(values)),
+    )
+    params = [field.get_db_prep_value(value, connection) for value in values]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
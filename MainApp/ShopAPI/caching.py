@@ -0,0 +1,62 @@
+from collections import defaultdict
+from threading import Lock
+
+from django.core.cache.backends import locmem
+
+
+class CacheStats:
+    """Hit, miss and eviction counters for one named cache."""
+
+    FIELDS = ("hits", "misses", "evictions", "invalidations")
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def incr(self, field, count=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + count)
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+_stats = defaultdict(CacheStats)
+
+
+def cache_stats(name):
+    return _stats[name]
+
+
+def all_cache_stats():
+    """Return ``{name: {counter: value}}`` for every cache seen so far."""
+    return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+class LocMemCache(locmem.LocMemCache):
+    """Django's LRU ``LocMemCache`` that also counts its evictions.
+
+    Evictions are entries dropped because the cache hit ``MAX_ENTRIES`` or
+    because their ``TIMEOUT`` passed. They are reported under the cache's
+    ``LOCATION`` in :func:`cache_stats`.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._stats = cache_stats(name)
+
+    def _has_expired(self, key):
+        expired = super()._has_expired(key)
+        if expired and key in self._expire_info:
+            self._stats.incr("evictions")
+        return expired
+
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        self._stats.incr("evictions", size - len(self._cache))
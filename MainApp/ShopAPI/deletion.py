@@ -0,0 +1,51 @@
+"""Delete purchase orders with their line items and search entries in bulk.
+
+``QuerySet.delete()`` loads every order to cascade the delete to its line
+items and search entries. Here the ids (and versions, for the order cache)
+are read once, then for every ``DELETE_BATCH_SIZE`` orders the rollups are
+reduced by two aggregate queries and the search entries, line items and
+orders are removed with one DELETE each (see ``bulk.delete_rows``), all in one
+transaction. No ``pre_delete``/``post_delete`` signals are sent for them.
+"""
+from typing import NamedTuple
+
+from django.db import transaction
+
+from . import bulk, reports
+from .models import LineItem, LineItemSearchEntry, PurchaseOrder
+from .order_cache import invalidate_orders
+
+# Keeps the IN (...) lists under SQLite's limit on query parameters.
+DELETE_BATCH_SIZE = 900
+
+
+class Deleted(NamedTuple):
+    orders: int
+    line_items: int
+
+
+def count_orders(orders):
+    """What :func:`delete_orders` would delete for ``orders``."""
+    return Deleted(
+        orders.count(),
+        LineItem.objects.filter(purchase_order__in=orders.values("id")).count(),
+    )
+
+
+def delete_orders(orders):
+    """Delete the orders of the ``orders`` queryset and everything they own."""
+    deleted = Deleted(0, 0)
+    with transaction.atomic():
+        versions = list(orders.order_by("id").values_list("id", "version"))
+        rollups = reports.Rollups()
+        for start in range(0, len(versions), DELETE_BATCH_SIZE):
+            batch = versions[start : start + DELETE_BATCH_SIZE]
+            order_ids = [order_id for order_id, _ in batch]
+            rollups.remove_orders(order_ids)
+            bulk.delete_rows(LineItemSearchEntry, "purchase_order", order_ids)
+            line_items = bulk.delete_rows(LineItem, "purchase_order", order_ids)
+            count = bulk.delete_rows(PurchaseOrder, "id", order_ids)
+            deleted = Deleted(deleted.orders + count, deleted.line_items + line_items)
+        rollups.save()
+        invalidate_orders(versions)
+    return deleted
@@ -0,0 +1,275 @@
+"""Streaming export of purchase orders to CSV, NDJSON or a columnar file.
+
+Rows are flat: one per order (:data:`ORDER_COLUMNS`) or one per line item
+(:data:`LINE_COLUMNS`, the order and supplier columns repeated on every line).
+Orders are read in pages of ``chunk_size`` orders by increasing id, each page
+with one query (plus one for its line items), and every page is encoded and
+handed on before the next one is read. Memory use therefore depends on the
+page size only, on every database and behind poolers that cannot hold a
+server-side cursor, and no transaction stays open for the whole export.
+
+For incremental exports, ``after_id`` skips the orders up to and including
+that id and ``since`` keeps the orders created or changed at or after that
+time (``updated_at``). The highest ``order_id`` of an export is where the next
+one can continue; ``version`` tells changed orders apart.
+
+The columnar format needs only the standard library to write and read (see
+:func:`read_columnar`)::
+
+    b"SHOPCOL1"
+    u32 length, JSON header {"level", "columns": [{"name", "type"}, ...],
+                             "compression": "zlib"}
+    row groups: u32 row count, then per column u32 length, zlib(values)
+    u32 0
+
+All integers are little-endian. Column values are stored as ``int`` int64s,
+``decimal`` int64 hundredths, ``datetime`` int64 microseconds since the Unix
+epoch (UTC) and ``string`` as n + 1 uint32 offsets into the UTF-8 data that
+follows them. Each page of orders is one row group.
+"""
+import csv
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import partial
+from itertools import accumulate
+
+from . import renderers
+from .models import LineItem, PurchaseOrder
+
+ORDER = "order"
+LINE = "line"
+LEVELS = (ORDER, LINE)
+
+CSV = "csv"
+NDJSON = "ndjson"
+COLUMNAR = "columnar"
+FORMATS = (CSV, NDJSON, COLUMNAR)
+CONTENT_TYPES = {
+    CSV: "text/csv; charset=utf-8",
+    NDJSON: "application/x-ndjson",
+    COLUMNAR: "application/octet-stream",
+}
+EXTENSIONS = {CSV: "csv", NDJSON: "ndjson", COLUMNAR: "shopcol"}
+
+EXPORT_CHUNK_SIZE = 1000
+
+INT = "int"
+DECIMAL = "decimal"
+DATETIME = "datetime"
+STRING = "string"
+
+# Column name -> (type, field path for values_list()).
+_ORDER_FIELDS = {
+    "order_id": (INT, "id"),
+    "order_number": (INT, "order_number"),
+    "order_time": (DATETIME, "order_time"),
+    "updated_at": (DATETIME, "updated_at"),
+    "version": (INT, "version"),
+    "supplier_id": (INT, "supplier_id"),
+    "supplier_name": (STRING, "supplier__name"),
+    "supplier_email": (STRING, "supplier__email"),
+}
+_ORDER_TOTAL_FIELDS = {
+    "total_quantity": (INT, "total_quantity"),
+    "total_amount": (DECIMAL, "total_amount"),
+    "total_tax": (DECIMAL, "total_tax"),
+}
+_LINE_FIELDS = {
+    "line_item_id": (INT, "id"),
+    "item_name": (STRING, "item_name"),
+    "quantity": (INT, "quantity"),
+    "price_without_tax": (DECIMAL, "price_without_tax"),
+    "tax_name": (STRING, "tax_name"),
+    "tax_amount": (DECIMAL, "tax_amount"),
+    "line_total": (DECIMAL, "line_total"),
+}
+ORDER_COLUMNS = (*_ORDER_FIELDS, *_ORDER_TOTAL_FIELDS)
+LINE_COLUMNS = (*_ORDER_FIELDS, *_LINE_FIELDS)
+COLUMN_TYPES = {
+    name: column_type
+    for fields in (_ORDER_FIELDS, _ORDER_TOTAL_FIELDS, _LINE_FIELDS)
+    for name, (column_type, _) in fields.items()
+}
+
+MAGIC = b"SHOPCOL1"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_U32 = struct.Struct("<I")
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def columns(level):
+    return ORDER_COLUMNS if level == ORDER else LINE_COLUMNS
+
+
+def _order_queryset(since):
+    queryset = PurchaseOrder.objects.order_by("id")
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    return queryset
+
+
+def iter_rows(level, after_id=None, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row tuples in ``columns(level)`` order, one per page of
+    ``chunk_size`` orders."""
+    queryset = _order_queryset(since)
+    order_fields = [path for _, path in _ORDER_FIELDS.values()]
+    if level == ORDER:
+        order_fields += [path for _, path in _ORDER_TOTAL_FIELDS.values()]
+    line_fields = ["purchase_order_id"]
+    line_fields += [path for _, path in _LINE_FIELDS.values()]
+    last_id = after_id
+    while True:
+        page = queryset
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        orders = list(page.values_list(*order_fields)[:chunk_size])
+        if not orders:
+            return
+        last_id = orders[-1][0]
+        if level == ORDER:
+            yield orders
+            continue
+        # Line items of the page's id range; the orders of that range which
+        # were filtered out are skipped by the lookup.
+        orders = {order[0]: order for order in orders}
+        line_items = (
+            LineItem.objects.filter(
+                purchase_order__gte=min(orders), purchase_order__lte=last_id
+            )
+            .order_by("purchase_order_id", "id")
+            .values_list(*line_fields)
+        )
+        yield [
+            orders[line[0]] + line[1:]
+            for line in line_items.iterator(chunk_size=chunk_size)
+            if line[0] in orders
+        ]
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(level, chunks):
+    yield (",".join(columns(level)) + "\r\n").encode()
+    for rows in chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([map(_csv_value, row) for row in rows])
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(level, chunks):
+    names = columns(level)
+    # Decimals as strings, so amounts stay exact.
+    encode = partial(renderers.encode_json, decimal_format=renderers.STRING)
+    for rows in chunks:
+        yield b"".join(encode(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def _int64(values):
+    values = array("q", values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _uint32(values):
+    values = array("I", values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_column(column_type, values):
+    if column_type == INT:
+        return _int64(values)
+    if column_type == DECIMAL:
+        return _int64(int(value * 100) for value in values)
+    if column_type == DATETIME:
+        return _int64((value - EPOCH) // _MICROSECOND for value in values)
+    encoded = [value.encode() for value in values]
+    offsets = accumulate(map(len, encoded), initial=0)
+    return _uint32(offsets) + b"".join(encoded)
+
+
+def _decode_int64(data, count):
+    values = array("q")
+    values.frombytes(data[: count * 8])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _decode_column(column_type, data, count):
+    if column_type == INT:
+        return list(_decode_int64(data, count))
+    if column_type == DECIMAL:
+        return [Decimal(value).scaleb(-2) for value in _decode_int64(data, count)]
+    if column_type == DATETIME:
+        return [EPOCH + value * _MICROSECOND for value in _decode_int64(data, count)]
+    offsets = array("I")
+    offsets.frombytes(data[: (count + 1) * 4])
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    text = data[(count + 1) * 4 :]
+    return [text[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def encode_columnar(level, chunks):
+    names = columns(level)
+    header = json.dumps(
+        {
+            "level": level,
+            "columns": [{"name": name, "type": COLUMN_TYPES[name]} for name in names],
+            "compression": "zlib",
+        }
+    ).encode()
+    yield MAGIC + _U32.pack(len(header)) + header
+    for rows in chunks:
+        if not rows:
+            continue
+        parts = [_U32.pack(len(rows))]
+        for name, values in zip(names, zip(*rows)):
+            data = zlib.compress(_encode_column(COLUMN_TYPES[name], values), 1)
+            parts += [_U32.pack(len(data)), data]
+        yield b"".join(parts)
+    yield _U32.pack(0)
+
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated columnar file.")
+    return data
+
+
+def read_columnar(file):
+    """Yield the row groups of a columnar export from the binary ``file``,
+    each as a dict of column name -> list of values."""
+    if _read_exactly(file, len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar export.")
+    (length,) = _U32.unpack(_read_exactly(file, _U32.size))
+    header = json.loads(_read_exactly(file, length))
+    while True:
+        (count,) = _U32.unpack(_read_exactly(file, _U32.size))
+        if not count:
+            return
+        group = {}
+        for column in header["columns"]:
+            (length,) = _U32.unpack(_read_exactly(file, _U32.size))
+            data = zlib.decompress(_read_exactly(file, length))
+            group[column["name"]] = _decode_column(column["type"], data, count)
+        yield group
+
+
+# Format -> function encoding the row chunks of iter_rows() as bytes.
+ENCODERS = {CSV: encode_csv, NDJSON: encode_ndjson, COLUMNAR: encode_columnar}
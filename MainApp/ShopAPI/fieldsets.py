@@ -0,0 +1,68 @@
+"""Sparse fieldsets for order reads: ``?fields=`` and ``?include=``.
+
+``fields`` names the order fields to return and ``include`` the relations
+(``supplier``, ``line_items``) to embed; ``id`` is always returned. Without
+either parameter every field and both relations are returned, as before.
+``include`` alone keeps all plain fields, so ``?include=`` lists order headers
+and totals only.
+
+Relations that are left out are not joined or queried, and the order query
+loads only the requested columns plus the few every read needs for
+pagination and the ``ETag``.
+"""
+from rest_framework.exceptions import ValidationError
+
+# In PurchaseOrderSerializer field order, which responses keep.
+ORDER_FIELDS = (
+    "id",
+    "supplier",
+    "order_number",
+    "order_time",
+    "total_amount",
+    "total_quantity",
+    "total_tax",
+    "line_items",
+)
+RELATIONS = ("supplier", "line_items")
+_REQUIRED_COLUMNS = ("id", "order_number", "version")
+
+
+def _names(request, param, choices):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",")} - {""}
+    unknown = names.difference(choices)
+    if unknown:
+        raise ValidationError(
+            {
+                param: f"Unknown fields: {', '.join(sorted(unknown))}. "
+                f"Must be among {', '.join(choices)}."
+            }
+        )
+    return names
+
+
+def get_fields(request):
+    """Return the order fields the request asks for, in response order."""
+    fields = _names(request, "fields", ORDER_FIELDS)
+    include = _names(request, "include", RELATIONS)
+    if fields is None and include is None:
+        return ORDER_FIELDS
+    if fields is None:
+        fields = set(ORDER_FIELDS).difference(RELATIONS)
+    fields |= (include or set()) | {"id"}
+    return tuple(name for name in ORDER_FIELDS if name in fields)
+
+
+def select_fields(queryset, fields):
+    """Limit an order queryset to what serializing ``fields`` reads."""
+    if fields == ORDER_FIELDS:
+        return queryset.select_related("supplier")
+    columns = [*_REQUIRED_COLUMNS]
+    columns += [name for name in fields if name not in RELATIONS]
+    if "supplier" in fields:
+        return queryset.select_related("supplier").only(
+            *columns, "supplier", "supplier__name", "supplier__email"
+        )
+    return queryset.only(*columns)
@@ -0,0 +1,372 @@
+"""Bulk import of purchase orders from CSV or NDJSON files.
+
+Input is read as a stream and handled ``batch_size`` orders at a time, so
+memory use does not grow with the file. Each batch is validated with plain
+Python checks that mirror ``PurchaseOrderMutateSerializer``, then written in
+one transaction: suppliers are resolved through ``ShopAPI.suppliers``, order
+numbers are reserved as a block, line totals and order totals are computed up
+front and orders and line items are inserted with one ``executemany()`` each
+(see ``ShopAPI.bulk``), without building model instances. The
+rollups and the search index are updated per batch, as for API writes.
+
+NDJSON input holds one order per line in the shape the API accepts. CSV input
+holds one line item per row with the :data:`CSV_COLUMNS` columns; consecutive
+rows with the same ``order_ref`` form one order, which takes its supplier and
+``order_time`` from its first row. Both may set an ISO 8601 ``order_time``;
+orders without one are stamped with the import time.
+"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from itertools import groupby, islice
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bulk, reports, search, suppliers
+from .models import LineItem, PurchaseOrder
+from .order_numbers import allocate_order_numbers
+from .totals import calculate_totals
+
+CSV = "csv"
+NDJSON = "ndjson"
+FORMATS = (CSV, NDJSON)
+
+CSV_COLUMNS = (
+    "order_ref",
+    "supplier_id",
+    "supplier_name",
+    "supplier_email",
+    "order_time",
+    "item_name",
+    "quantity",
+    "price_without_tax",
+    "tax_name",
+    "tax_amount",
+)
+REQUIRED_CSV_COLUMNS = set(CSV_COLUMNS) - {"supplier_id", "order_time"}
+
+# Limits of the model fields, checked the way the serializers do.
+MAX_LENGTH = 100
+MAX_DIGITS = 10
+DECIMAL_PLACES = 2
+MAX_INTEGER = 2147483647
+
+
+class Order(NamedTuple):
+    # A purchase order as inserted, before it has an id.
+    supplier_id: int
+    order_number: int
+    total_quantity: int
+    total_amount: Decimal
+    total_tax: Decimal
+    order_time: datetime
+
+
+class Line(NamedTuple):
+    # A line item as inserted, without building LineItem instances.
+    item_name: str
+    quantity: int
+    price_without_tax: Decimal
+    tax_name: str
+    tax_amount: Decimal
+    line_total: Decimal
+
+
+class InvalidOrder(Exception):
+    """An input order that cannot be imported, with the line it started on."""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def read_ndjson(file):
+    """Yield ``(line number, order)`` for every non-blank line of ``file``."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, InvalidOrder(number, f"JSON parse error - {exc}")
+
+
+def read_csv(file):
+    """Yield ``(line number, order)`` for every group of rows of ``file``."""
+    reader = csv.DictReader(file)
+    missing = REQUIRED_CSV_COLUMNS.difference(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}.")
+    rows = ((reader.line_num, row) for row in reader)
+    for _, group in groupby(rows, key=lambda numbered: numbered[1]["order_ref"]):
+        group = list(group)
+        number, first = group[0]
+        supplier = {"name": first["supplier_name"], "email": first["supplier_email"]}
+        if first.get("supplier_id"):
+            supplier["id"] = first["supplier_id"]
+        order = {
+            "supplier": supplier,
+            "line_items": [
+                {
+                    field: row[field]
+                    for field in (
+                        "item_name",
+                        "quantity",
+                        "price_without_tax",
+                        "tax_name",
+                        "tax_amount",
+                    )
+                }
+                for _, row in group
+            ],
+        }
+        if first.get("order_time"):
+            order["order_time"] = first["order_time"]
+        yield number, order
+
+
+READERS = {CSV: read_csv, NDJSON: read_ndjson}
+
+
+def _string(data, field):
+    value = data.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{field}: This field is required.")
+    if len(value) > MAX_LENGTH:
+        raise ValueError(
+            f"{field}: Ensure this field has no more than {MAX_LENGTH} characters."
+        )
+    return value
+
+
+def _decimal(data, field):
+    value = data.get(field)
+    try:
+        if isinstance(value, float):
+            value = str(value)
+        value = Decimal(value)
+    except (TypeError, InvalidOperation):
+        raise ValueError(f"{field}: A valid number is required.")
+    if not value.is_finite():
+        raise ValueError(f"{field}: A valid number is required.")
+    sign, digits, exponent = value.as_tuple()
+    if -exponent > DECIMAL_PLACES:
+        raise ValueError(
+            f"{field}: Ensure that there are no more than "
+            f"{DECIMAL_PLACES} decimal places."
+        )
+    if len(digits) + max(exponent, 0) > MAX_DIGITS:
+        raise ValueError(
+            f"{field}: Ensure that there are no more than {MAX_DIGITS} digits in "
+            "total."
+        )
+    if len(digits) + exponent > MAX_DIGITS - DECIMAL_PLACES:
+        raise ValueError(
+            f"{field}: Ensure that there are no more than "
+            f"{MAX_DIGITS - DECIMAL_PLACES} digits before the decimal point."
+        )
+    return value
+
+
+def _integer(data, field, minimum=0):
+    value = data.get(field)
+    if isinstance(value, bool):
+        value = None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: A valid integer is required.")
+    if value < minimum:
+        raise ValueError(f"{field}: Ensure this value is at least {minimum}.")
+    if value > MAX_INTEGER:
+        raise ValueError(f"{field}: Ensure this value is at most {MAX_INTEGER}.")
+    return value
+
+
+def clean_order(order):
+    """Validate one input order and return it with Python values.
+
+    Raises ``ValueError`` describing the first problem found.
+    """
+    if not isinstance(order, dict):
+        raise ValueError("Expected an object.")
+    supplier = order.get("supplier")
+    if not isinstance(supplier, dict):
+        raise ValueError("supplier: This field is required.")
+    supplier = {
+        "name": _string(supplier, "name"),
+        "email": _string(supplier, "email"),
+        "id": _integer(supplier, "id", 1) if supplier.get("id") else None,
+    }
+    try:
+        validate_email(supplier["email"])
+    except ValidationError:
+        raise ValueError("email: Enter a valid email address.")
+
+    line_items = order.get("line_items")
+    if not isinstance(line_items, list) or not line_items:
+        raise ValueError("line_items: This field is required.")
+    cleaned_line_items = []
+    for line_item in line_items:
+        if not isinstance(line_item, dict):
+            raise ValueError("line_items: Expected a list of objects.")
+        cleaned_line_items.append(
+            {
+                "item_name": _string(line_item, "item_name"),
+                "quantity": _integer(line_item, "quantity"),
+                "price_without_tax": _decimal(line_item, "price_without_tax"),
+                "tax_name": _string(line_item, "tax_name"),
+                "tax_amount": _decimal(line_item, "tax_amount"),
+            }
+        )
+
+    order_time = order.get("order_time")
+    if order_time is not None:
+        try:
+            order_time = parse_datetime(order_time)
+        except (TypeError, ValueError):
+            order_time = None
+        if order_time is None:
+            raise ValueError("order_time: Expected an ISO 8601 date and time.")
+        if timezone.is_naive(order_time):
+            order_time = timezone.make_aware(order_time)
+    return {
+        "supplier": supplier,
+        "line_items": cleaned_line_items,
+        "order_time": order_time,
+    }
+
+
+class Importer:
+    """Imports orders in batches and counts what it did.
+
+    Invalid orders are skipped and collected in ``errors``, unless ``strict``
+    is set, in which case the first one raises :class:`InvalidOrder` and the
+    batch it belongs to is not written.
+
+    With ``index=False`` the rollups and the search index are left alone; the
+    caller must rebuild them afterwards (``reports.rebuild()`` and the
+    ``rebuild_search_index`` command).
+    """
+
+    def __init__(self, batch_size=5000, strict=False, index=True):
+        self.batch_size = batch_size
+        self.strict = strict
+        self.index = index
+        self.orders = 0
+        self.line_items = 0
+        self.errors = []
+
+    def run(self, records, progress=None):
+        """Import ``(line number, order)`` records; call ``progress(self)``
+        after every batch."""
+        records = iter(records)
+        while batch := list(islice(records, self.batch_size)):
+            self.import_batch(batch)
+            if progress is not None:
+                progress(self)
+        return self
+
+    def _fail(self, error):
+        if self.strict:
+            raise error
+        self.errors.append(error)
+
+    def import_batch(self, records):
+        cleaned = []
+        for number, order in records:
+            if isinstance(order, InvalidOrder):
+                self._fail(order)
+                continue
+            try:
+                cleaned.append((number, clean_order(order)))
+            except ValueError as exc:
+                self._fail(InvalidOrder(number, str(exc)))
+
+        with transaction.atomic():
+            resolved = suppliers.bulk_upsert([data["supplier"] for _, data in cleaned])
+            valid = []
+            for (number, data), supplier in zip(cleaned, resolved):
+                if supplier is None:
+                    self._fail(InvalidOrder(number, "supplier: Supplier not found."))
+                else:
+                    valid.append((data, supplier))
+            if valid:
+                self._write(valid)
+
+    def _write(self, valid):
+        connection = connections[router.db_for_write(PurchaseOrder)]
+        now = timezone.now()
+        orders, order_lines = [], []
+        for (data, supplier), order_number in zip(
+            valid, allocate_order_numbers(len(valid))
+        ):
+            totals = calculate_totals(data["line_items"])
+            orders.append(
+                Order(
+                    supplier.id,
+                    order_number,
+                    totals.total_quantity,
+                    totals.total_amount,
+                    totals.total_tax,
+                    data["order_time"] or now,
+                )
+            )
+            order_lines.append(
+                [
+                    Line(line_total=line_total, **item)
+                    for item, line_total in zip(data["line_items"], totals.line_totals)
+                ]
+            )
+
+        prepare_datetime = partial(
+            PurchaseOrder._meta.get_field("order_time").get_db_prep_save,
+            connection=connection,
+        )
+        updated_at = prepare_datetime(now)
+        bulk.insert_rows(
+            PurchaseOrder,
+            (*Order._fields, "updated_at", "version"),
+            [
+                (*order[:-1], prepare_datetime(order.order_time), updated_at, 1)
+                for order in orders
+            ],
+        )
+        # Order numbers are unique and were reserved as one block, so they
+        # identify the new rows.
+        ids = dict(
+            PurchaseOrder.objects.filter(
+                order_number__range=(orders[0].order_number, orders[-1].order_number)
+            ).values_list("order_number", "id")
+        )
+        order_ids = [ids[order.order_number] for order in orders]
+
+        bulk.insert_rows(
+            LineItem,
+            (*Line._fields, "purchase_order"),
+            [
+                (*line, order_id)
+                for order_id, lines in zip(order_ids, order_lines)
+                for line in lines
+            ],
+        )
+        if self.index:
+            rollups = reports.Rollups()
+            for order, lines in zip(orders, order_lines):
+                rollups.add_order(order, lines)
+            rollups.save()
+            search.index_new_orders(
+                (order_id, line.item_name)
+                for order_id, lines in zip(order_ids, order_lines)
+                for line in lines
+            )
+        self.orders += len(orders)
+        self.line_items += sum(map(len, order_lines))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ShopAPI import schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema into SHOP_SCHEMA_FILE, which /schema/ "
+        "serves instead of introspecting the API on every request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only fail if the file is missing or out of date.",
+        )
+
+    def handle(self, *args, check, **options):
+        path = schema.schema_file()
+        if not path:
+            raise CommandError("Set SHOP_SCHEMA_FILE to build the schema.")
+        content = schema.generate()
+        version = schema.version(content)
+        if check:
+            if schema.read(path) != content:
+                raise CommandError(f"{path} is out of date, run build_schema.")
+        else:
+            schema.write(path, content)
+        if options["verbosity"]:
+            self.stdout.write(f"Schema {version} in {path}.")
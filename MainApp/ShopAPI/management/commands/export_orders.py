@@ -0,0 +1,96 @@
+import os
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ShopAPI import exporting
+
+
+def _datetime(value):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"Expected an ISO 8601 date and time: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Export purchase orders as flat order or line item rows to a CSV, "
+        "NDJSON or columnar file (or - for stdout), one page of orders at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument(
+            "--format",
+            choices=exporting.FORMATS,
+            help="Defaults to the file extension, or csv for stdout.",
+        )
+        parser.add_argument("--level", choices=exporting.LEVELS, default="order")
+        parser.add_argument(
+            "--after-id", type=int, help="Only orders with a higher id."
+        )
+        parser.add_argument(
+            "--since",
+            type=_datetime,
+            help="Only orders created or changed at or after this time.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=exporting.EXPORT_CHUNK_SIZE,
+            help="Orders per page.",
+        )
+
+    def handle(
+        self, *args, path, format, level, after_id, since, chunk_size, **options
+    ):
+        if format is None:
+            if path == "-":
+                format = exporting.CSV
+            else:
+                extension = os.path.splitext(path)[1].lstrip(".").lower()
+                formats = {ext: name for name, ext in exporting.EXTENSIONS.items()}
+                if extension not in formats:
+                    raise CommandError("Cannot tell the format; pass --format.")
+                format = formats[extension]
+        self.orders = self.rows = 0
+        self.last_id = after_id
+        started = perf_counter()
+        chunks = self.count(exporting.iter_rows(level, after_id, since, chunk_size))
+        file = sys.stdout.buffer if path == "-" else open(path, "wb")
+        try:
+            for data in exporting.ENCODERS[format](level, chunks):
+                file.write(data)
+        finally:
+            if file is sys.stdout.buffer:
+                file.flush()
+            else:
+                file.close()
+
+        if options["verbosity"]:
+            # Summary goes to stderr, as stdout may hold the export.
+            seconds = perf_counter() - started
+            last_id = "none" if self.last_id is None else self.last_id
+            self.stderr.write(
+                f"Exported {self.orders} orders as {self.rows} rows in "
+                f"{seconds:.1f} s ({self.rows / seconds:,.0f} rows/s); continue "
+                f"after order id {last_id}.",
+                style_func=lambda text: text,
+            )
+
+    def count(self, chunks):
+        for rows in chunks:
+            if rows:
+                self.rows += len(rows)
+                self.orders += len({row[0] for row in rows})
+                self.last_id = rows[-1][0]
+            yield rows
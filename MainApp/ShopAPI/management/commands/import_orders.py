@@ -0,0 +1,81 @@
+import os
+import sys
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from ShopAPI import importing
+
+
+class Command(BaseCommand):
+    help = (
+        "Import purchase orders from a CSV or NDJSON file (or - for stdin) in "
+        "batched transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=importing.FORMATS,
+            help="Defaults to the file extension.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Orders.")
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Stop at the first invalid order instead of skipping it.",
+        )
+        parser.add_argument(
+            "--defer-index",
+            action="store_true",
+            help=(
+                "Rebuild the rollups and the search index once at the end instead "
+                "of updating them per batch. Faster when the file is large "
+                "compared to the existing data."
+            ),
+        )
+
+    def handle(
+        self, *args, path, format, batch_size, strict, defer_index, **options
+    ):
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".").lower()
+            if format not in importing.FORMATS:
+                raise CommandError("Cannot tell the format; pass --format.")
+        self.verbosity = options["verbosity"]
+        self.started = perf_counter()
+        importer = importing.Importer(
+            batch_size=batch_size, strict=strict, index=not defer_index
+        )
+        file = sys.stdin if path == "-" else open(path, newline="")
+        try:
+            importer.run(importing.READERS[format](file), progress=self.progress)
+        except (importing.InvalidOrder, ValueError) as exc:
+            raise CommandError(f"{exc} Imported {importer.orders} orders before it.")
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if defer_index and importer.orders:
+                call_command("rebuild_order_rollups", verbosity=0)
+                call_command("rebuild_search_index", verbosity=0)
+
+        for error in importer.errors:
+            self.stderr.write(str(error))
+        if self.verbosity:
+            seconds = perf_counter() - self.started
+            self.stdout.write(
+                f"Imported {importer.orders} orders and {importer.line_items} line "
+                f"items in {seconds:.1f} s ({importer.line_items / seconds:,.0f} "
+                f"line items/s), skipped {len(importer.errors)} invalid orders."
+            )
+
+    def progress(self, importer):
+        if self.verbosity > 1:
+            seconds = perf_counter() - self.started
+            self.stderr.write(
+                f"{importer.orders} orders, {importer.line_items} line items, "
+                f"{importer.line_items / seconds:,.0f} line items/s",
+                style_func=lambda text: text,
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ShopAPI import reports
+from ShopAPI.models import SupplierDayRollup, TaxDayRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the per supplier and per tax name order rollups."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reports.rebuild()
+        if options["verbosity"]:
+            suppliers = SupplierDayRollup.objects.count()
+            taxes = TaxDayRollup.objects.count()
+            self.stdout.write(
+                f"Rebuilt {suppliers} supplier and {taxes} tax name rollups."
+            )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ShopAPI import search
+from ShopAPI.models import PurchaseOrder, Supplier
+
+
+def _batches(queryset, batch_size):
+    batch = []
+    for item in queryset.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Rebuild the supplier name and item name search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        suppliers = orders = 0
+        for batch in _batches(Supplier.objects.order_by("id"), batch_size):
+            with transaction.atomic():
+                search.index_suppliers(batch)
+            suppliers += len(batch)
+        order_ids = PurchaseOrder.objects.order_by("id").values_list("id", flat=True)
+        for batch in _batches(order_ids, batch_size):
+            with transaction.atomic():
+                search.index_orders(batch)
+            orders += len(batch)
+        search.purge_unused_names()
+        if options["verbosity"]:
+            self.stdout.write(f"Indexed {suppliers} suppliers and {orders} orders.")
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ShopAPI import benchmarking
+
+# Options recorded with the results; runs are only comparable when they match.
+PARAMETERS = ("suppliers", "orders", "lines", "days", "requests", "warmup", "seed")
+
+
+def _scenarios(value):
+    scenarios = [scenario.strip() for scenario in value.split(",")]
+    unknown = set(scenarios).difference(benchmarking.SCENARIOS)
+    if unknown:
+        raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}.")
+    if "delete" in scenarios and "create" not in scenarios:
+        raise CommandError("The delete scenario needs the create scenario.")
+    # Run in the canonical order, so delete always follows create.
+    return [scenario for scenario in benchmarking.SCENARIOS if scenario in scenarios]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the purchase order endpoints against a freshly seeded test "
+        "database and print the results as JSON, or compare two such results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suppliers", type=int, default=50)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--lines", type=int, default=5, help="Per order.")
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--requests", type=int, default=200, help="Per scenario.")
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--scenarios",
+            type=_scenarios,
+            default=list(benchmarking.SCENARIOS),
+            help="Comma separated subset of: " + ", ".join(benchmarking.SCENARIOS),
+        )
+        parser.add_argument("--output", help="Also write the results to this file.")
+        parser.add_argument(
+            "--compare",
+            nargs=2,
+            metavar=("BASELINE", "CURRENT"),
+            help="Compare two result files instead of running the benchmark.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10,
+            help="Percent by which a metric may get worse before --compare fails.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        if options["compare"]:
+            return self.compare(*options["compare"], options["threshold"])
+        results = self.run(options)
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
+
+    def run(self, options):
+        # Same setup as the test runner, but on a file so the timings include
+        # real I/O. Never touches the configured database.
+        test_settings = connection.settings_dict["TEST"]
+        if connection.vendor != "sqlite" or test_settings["NAME"]:
+            return self.run_in_test_db(options)
+        with tempfile.TemporaryDirectory(prefix="shopbench-") as directory:
+            test_settings["NAME"] = os.path.join(directory, "db.sqlite3")
+            try:
+                return self.run_in_test_db(options)
+            finally:
+                test_settings["NAME"] = None
+
+    def run_in_test_db(self, options):
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            self.log(
+                f"Seeding {options['orders']} orders of {options['lines']} lines "
+                f"for {options['suppliers']} suppliers..."
+            )
+            order_ids = benchmarking.seed(
+                options["suppliers"],
+                options["orders"],
+                options["lines"],
+                options["days"],
+                options["seed"],
+            )
+            bench = benchmarking.Benchmark(
+                order_ids, options["suppliers"], options["lines"], options["seed"]
+            )
+            scenarios = {}
+            for scenario in options["scenarios"]:
+                scenarios[scenario] = result = bench.run(
+                    scenario, options["requests"], options["warmup"]
+                )
+                self.log(
+                    f"{scenario:8} {result['throughput']:8.1f} req/s"
+                    f"  p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms"
+                    f"  {result['queries']:5.1f} queries  {result['bytes']:8} bytes"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        parameters = {key: options[key] for key in PARAMETERS}
+        return {
+            "parameters": parameters,
+            "environment": benchmarking.environment(),
+            "scenarios": scenarios,
+        }
+
+    def compare(self, baseline_path, current_path, threshold):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        with open(current_path) as file:
+            current = json.load(file)
+        if baseline.get("parameters") != current.get("parameters"):
+            self.log("Warning: the runs used different parameters.")
+        rows, regressions = benchmarking.compare(baseline, current, threshold)
+        for scenario, metric, old, new, change, regressed in rows:
+            marker = "  REGRESSION" if regressed else ""
+            self.stdout.write(
+                f"{scenario:8} {metric:10} {old:10.2f} -> {new:10.2f}"
+                f"  {change:+7.1f}%{marker}"
+            )
+        if regressions:
+            raise CommandError(
+                f"{regressions} metrics regressed by more than {threshold:g}%."
+            )
+
+    def log(self, message):
+        # Progress goes to stderr so stdout stays valid JSON.
+        if self.verbosity:
+            self.stderr.write(message, style_func=lambda text: text)
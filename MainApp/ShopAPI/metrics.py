@@ -0,0 +1,285 @@
+"""Per-route request metrics, exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and breaks the time down into
+phases: ``db`` (SQL, recorded by a wrapper installed on every database
+connection), ``serialize`` and ``render`` (code wrapped in :func:`phase`) and
+``app`` for whatever is left. Phases are exclusive, so queries run while
+serializing count towards ``db`` only. It also counts the queries of each
+request and logs requests slower than ``SHOP_SLOW_REQUEST_MS`` together with
+their slowest queries.
+
+Routes are labelled with their URL pattern, e.g.
+``api/purchase/orders/<int:id>/``, so the number of series stays bounded.
+Streaming responses are only timed up to their first byte.
+
+The recording costs a few microseconds per request and per query, and
+``SHOP_METRICS = False`` removes the middleware altogether.
+"""
+import heapq
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .caching import all_cache_stats
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PHASES = ("db", "serialize", "render", "app")
+UNMATCHED = "unmatched"
+# How many queries a slow request log entry lists.
+SLOW_QUERY_COUNT = 5
+
+_current = ContextVar("shop_request_metrics", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, a sum and a count, as Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """Yield ``(le, cumulative count)`` pairs, ending with ``+Inf``."""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """What one request spent, filled in while it runs."""
+
+    __slots__ = ("queries", "db_seconds", "phases", "slowest")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+        self.phases = {}
+        self.slowest = []
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = (seconds, self.queries, sql)
+        if len(self.slowest) < SLOW_QUERY_COUNT:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+
+class Registry:
+    """Metrics of all requests handled by this process."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+            self.phases = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+            self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+
+    def observe(self, route, method, status, seconds, metrics):
+        phases = dict(metrics.phases, db=metrics.db_seconds)
+        phases["app"] = max(seconds - sum(phases.values()), 0)
+        with self._lock:
+            self.requests[(route, method, status)] += 1
+            self.durations[(route, method)].observe(seconds)
+            self.queries[(route, method)].observe(metrics.queries)
+            for name in PHASES:
+                self.phases[(route, method, name)].observe(phases.get(name, 0))
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        out = []
+        with self._lock:
+            out += _header("shop_requests_total", "counter", "Requests handled.")
+            for (route, method, status), count in sorted(self.requests.items()):
+                labels = _labels(route=route, method=method, status=status)
+                out.append(f"shop_requests_total{{{labels}}} {count}")
+            _histogram(
+                out,
+                "shop_request_duration_seconds",
+                "Request latency.",
+                self.durations,
+                ("route", "method"),
+            )
+            _histogram(
+                out,
+                "shop_request_phase_seconds",
+                "Request latency per phase: db, serialize, render and app.",
+                self.phases,
+                ("route", "method", "phase"),
+            )
+            _histogram(
+                out,
+                "shop_request_queries",
+                "SQL queries per request.",
+                self.queries,
+                ("route", "method"),
+            )
+        out += _header("shop_cache_events_total", "counter", "Cache events.")
+        for cache, counters in all_cache_stats().items():
+            for event, count in counters.items():
+                labels = _labels(cache=cache, event=event)
+                out.append(f"shop_cache_events_total{{{labels}}} {count}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _header(name, kind, help_text):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _histogram(out, name, help_text, histograms, label_names):
+    out += _header(name, "histogram", help_text)
+    for key, histogram in sorted(histograms.items()):
+        labels = _labels(**dict(zip(label_names, key)))
+        for bound, count in histogram.samples():
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        out.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        out.append(f"{name}_count{{{labels}}} {sum(histogram.counts)}")
+
+
+registry = Registry()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, perf_counter() - start)
+
+
+@receiver(connection_created)
+def _install_query_recorder(sender, connection, **kwargs):
+    # First in line, so the pop() of connection.execute_wrapper() blocks that
+    # are open while the connection is made still removes their own wrapper.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@contextmanager
+def phase(name):
+    """Count the time spent in the block, less its queries, towards ``name``."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start, db_seconds = perf_counter(), metrics.db_seconds
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start - (metrics.db_seconds - db_seconds)
+        metrics.phases[name] = metrics.phases.get(name, 0) + elapsed
+
+
+class MetricsMiddleware:
+    """Record the metrics of every request. Put it first in ``MIDDLEWARE``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SHOP_METRICS", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, perf_counter() - start, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, perf_counter() - start, metrics)
+        return response
+
+    def finish(self, request, response, seconds, metrics):
+        match = request.resolver_match
+        route = match.route if match else UNMATCHED
+        registry.observe(route, request.method, response.status_code, seconds, metrics)
+        slow_ms = getattr(settings, "SHOP_SLOW_REQUEST_MS", 500)
+        if slow_ms is not None and seconds * 1000 >= slow_ms:
+            queries = "".join(
+                f"\n  {query_seconds * 1000:8.1f} ms  {sql}"
+                for query_seconds, _, sql in sorted(metrics.slowest, reverse=True)
+            )
+            logger.warning(
+                "Slow request: %s %s took %.1f ms, %d queries in %.1f ms.%s",
+                request.method,
+                request.get_full_path(),
+                seconds * 1000,
+                metrics.queries,
+                metrics.db_seconds * 1000,
+                queries,
+            )
+
+
+def metrics_view(request):
+    """Serve :data:`registry` for Prometheus to scrape."""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,69 @@
+# Generated by Django 5.0 on 2026-10-18 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Supplier",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=100)),
+                ("email", models.EmailField(max_length=254)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PurchaseOrder",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("order_time", models.DateTimeField(auto_now_add=True)),
+                ("order_number", models.IntegerField(unique=True)),
+                ("total_quantity", models.IntegerField()),
+                (
+                    "total_amount",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("total_tax", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "supplier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ShopAPI.supplier",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LineItem",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("item_name", models.CharField(max_length=100)),
+                ("quantity", models.PositiveIntegerField()),
+                (
+                    "price_without_tax",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("tax_name", models.CharField(max_length=100)),
+                ("tax_amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "line_total",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                (
+                    "purchase_order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="line_items",
+                        to="ShopAPI.purchaseorder",
+                    ),
+                ),
+            ],
+        ),
+    ]
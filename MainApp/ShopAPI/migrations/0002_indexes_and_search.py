@@ -0,0 +1,156 @@
+# Generated by Django 5.0 on 2026-10-18 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShopAPI', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineItemSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('word', 'Word'), ('gram', 'Trigram')], max_length=4)),
+                ('term', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SupplierDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_quantity', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_tax', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SupplierSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaxDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('tax_name', models.CharField(max_length=100)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_quantity', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_tax', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='supplier',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='ShopAPI.supplier'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['supplier', 'order_time'], name='ShopAPI_pur_supplie_f40c63_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['order_time', 'id'], name='ShopAPI_pur_order_t_474d8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['total_amount'], name='ShopAPI_pur_total_a_8d89a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['name', 'email'], name='ShopAPI_sup_name_3f75dd_idx'),
+        ),
+        migrations.AddField(
+            model_name='lineitemsearchentry',
+            name='purchase_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='ShopAPI.purchaseorder'),
+        ),
+        migrations.AddField(
+            model_name='lineitemsearchentry',
+            name='name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ShopAPI.searchname'),
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='ShopAPI.searchname'),
+        ),
+        migrations.AddField(
+            model_name='supplierdayrollup',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ShopAPI.supplier'),
+        ),
+        migrations.AddField(
+            model_name='suppliersearchentry',
+            name='name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ShopAPI.searchname'),
+        ),
+        migrations.AddField(
+            model_name='suppliersearchentry',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='ShopAPI.supplier'),
+        ),
+        migrations.AddConstraint(
+            model_name='taxdayrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'tax_name'), name='unique_tax_day_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='lineitemsearchentry',
+            index=models.Index(fields=['name', 'purchase_order'], name='ShopAPI_lin_name_id_5f6c89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['kind', 'term', 'name'], name='ShopAPI_sea_kind_f08efe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierdayrollup',
+            index=models.Index(fields=['day', 'supplier'], name='ShopAPI_sup_day_88818d_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='supplierdayrollup',
+            constraint=models.UniqueConstraint(fields=('supplier', 'day'), name='unique_supplier_day_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='suppliersearchentry',
+            index=models.Index(fields=['name', 'supplier'], name='ShopAPI_sup_name_id_281acd_idx'),
+        ),
+    ]
@@ -1,4 +1,17 @@
 from django.db import models
+from django.utils import timezone
+
+from .totals import calculate_line_total
+
+
+class Sequence(models.Model):
+    """A named counter that hands out unique, increasing numbers."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.last_value}"
 
 
 class Supplier(models.Model):
@@ -6,26 +19,62 @@ class Supplier(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
 
+    class Meta:
+        # Suppliers are looked up by name and email on every order write.
+        indexes = [models.Index(fields=["name", "email"])]
+
     def __str__(self):
         return self.name
 
 
+class PurchaseOrderQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load the supplier and line items alongside the orders.
+
+        The supplier is joined in the main query and the line items are fetched
+        in one extra query, so serializing any number of orders costs two
+        queries instead of two per order.
+        """
+        return self.select_related("supplier").prefetch_related("line_items")
+
+    def touch(self):
+        """Bump the version of every order in the queryset in one UPDATE."""
+        return self.update(
+            version=models.F("version") + 1, updated_at=timezone.now()
+        )
+
+
 class PurchaseOrder(models.Model):
     id = models.AutoField(primary_key=True)
-    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    # Indexed as the first column of the (supplier, order_time) index.
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, db_index=False)
     order_time = models.DateTimeField(auto_now_add=True)
     order_number = models.IntegerField(unique=True)
     total_quantity = models.IntegerField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     total_tax = models.DecimalField(max_digits=10, decimal_places=2)
+    # Incremented on every write to the order, its line items or its supplier:
+    # by the API's write paths, and by signals for Supplier and LineItem saves
+    # and deletes (see ShopAPI.search). Queryset updates must call touch().
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PurchaseOrderQuerySet.as_manager()
+
+    class Meta:
+        # For the list filters: a supplier's orders in a date range, orders in
+        # a date range, and total amount ranges.
+        indexes = [
+            models.Index(fields=["supplier", "order_time"]),
+            models.Index(fields=["order_time", "id"]),
+            models.Index(fields=["total_amount"]),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            last_order = PurchaseOrder.objects.last()
-            if last_order:
-                self.order_number = last_order.order_number + 1
-            else:
-                self.order_number = 1
+            from .order_numbers import allocate_order_numbers
+
+            self.order_number = allocate_order_numbers(1)[0]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -43,9 +92,109 @@ class LineItem(models.Model):
     purchase_order = models.ForeignKey(
         PurchaseOrder, related_name="line_items", on_delete=models.CASCADE
     )
+
+    def calculate_line_total(self):
+        # to_python() accepts the floats and strings callers may assign.
+        price_field = self._meta.get_field("price_without_tax")
+        tax_field = self._meta.get_field("tax_amount")
+        return calculate_line_total(
+            self.quantity,
+            price_field.to_python(self.price_without_tax),
+            tax_field.to_python(self.tax_amount),
+        )
+
     def save(self, *args, **kwargs):
-        self.line_total = self.quantity * (self.price_without_tax + self.tax_amount)
+        self.line_total = self.calculate_line_total()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.item_name} - Order {self.purchase_order.order_number}"
+
+
+class SearchName(models.Model):
+    """A distinct normalized supplier or item name, see ``ShopAPI.search``."""
+
+    value = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.value
+
+
+class SearchTerm(models.Model):
+    """A word or trigram of a ``SearchName``."""
+
+    WORD = "word"
+    GRAM = "gram"
+    KIND_CHOICES = [(WORD, "Word"), (GRAM, "Trigram")]
+
+    name = models.ForeignKey(
+        SearchName, related_name="terms", on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=["kind", "term", "name"])]
+
+
+class SupplierSearchEntry(models.Model):
+    supplier = models.ForeignKey(
+        Supplier, related_name="search_entries", on_delete=models.CASCADE
+    )
+    name = models.ForeignKey(SearchName, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=["name", "supplier"])]
+
+
+class LineItemSearchEntry(models.Model):
+    """Links an order to the names of its line items, once per name."""
+
+    purchase_order = models.ForeignKey(
+        PurchaseOrder, related_name="search_entries", on_delete=models.CASCADE
+    )
+    name = models.ForeignKey(SearchName, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=["name", "purchase_order"])]
+
+
+class SupplierDayRollup(models.Model):
+    """Running order totals per supplier and day, see ``ShopAPI.reports``."""
+
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    day = models.DateField()
+    order_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_tax = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["supplier", "day"], name="unique_supplier_day_rollup"
+            )
+        ]
+        indexes = [models.Index(fields=["day", "supplier"])]
+
+
+class TaxDayRollup(models.Model):
+    """Running line item totals per tax name and day, see ``ShopAPI.reports``.
+
+    ``order_count`` counts the orders with at least one line item under the
+    tax name.
+    """
+
+    day = models.DateField()
+    tax_name = models.CharField(max_length=100)
+    order_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_tax = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "tax_name"], name="unique_tax_day_rollup"
+            )
+        ]
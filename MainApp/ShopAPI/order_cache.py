@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .caching import cache_stats
+
+ORDER_CACHE = getattr(settings, "SHOP_ORDER_CACHE", "orders")
+
+
+def _cache():
+    return caches[ORDER_CACHE]
+
+
+def _key(order_id, version):
+    return f"purchase-order:{order_id}:{version}"
+
+
+def get_order_data(order_id, version, loader):
+    """Return the serialized order, calling ``loader()`` on a cache miss.
+
+    Entries are keyed on the order's ``version``, which every write bumps, so
+    a stale entry can never be served even if another process missed the
+    invalidation.
+    """
+    cache = _cache()
+    stats = cache_stats(ORDER_CACHE)
+    key = _key(order_id, version)
+    data = cache.get(key)
+    if data is None:
+        stats.incr("misses")
+        data = loader()
+        cache.set(key, data)
+    else:
+        stats.incr("hits")
+    return data
+
+
+async def aget_order_data(order_id, version, loader):
+    """Async counterpart of :func:`get_order_data`; ``loader`` is awaited."""
+    cache = _cache()
+    stats = cache_stats(ORDER_CACHE)
+    key = _key(order_id, version)
+    data = await cache.aget(key)
+    if data is None:
+        stats.incr("misses")
+        data = await loader()
+        await cache.aset(key, data)
+    else:
+        stats.incr("hits")
+    return data
+
+
+def invalidate_order(order_id, version):
+    """Drop the cached copy of ``version`` of an order that is being written."""
+    _cache().delete(_key(order_id, version))
+    cache_stats(ORDER_CACHE).incr("invalidations")
+
+
+def invalidate_orders(versions):
+    """Drop the cached copies of many orders, given ``(id, version)`` pairs."""
+    _cache().delete_many([_key(order_id, version) for order_id, version in versions])
+    cache_stats(ORDER_CACHE).incr("invalidations", len(versions))
+
+
+def clear():
+    _cache().clear()
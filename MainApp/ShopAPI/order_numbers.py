@@ -0,0 +1,36 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import PurchaseOrder, Sequence
+
+ORDER_NUMBER_SEQUENCE = "purchase_order.order_number"
+
+
+def _create_sequence():
+    # Start after the highest number already in use so existing data keeps
+    # working. Two writers may race to create the row; the loser just reuses it.
+    start = PurchaseOrder.objects.aggregate(last=Max("order_number"))["last"] or 0
+    try:
+        with transaction.atomic():
+            Sequence.objects.create(name=ORDER_NUMBER_SEQUENCE, last_value=start)
+    except IntegrityError:
+        pass
+
+
+def allocate_order_numbers(count=1):
+    """Reserve ``count`` consecutive order numbers and return them as a range.
+
+    The counter row is incremented with a single ``UPDATE`` before it is read
+    back, so the row stays write-locked until the surrounding transaction
+    commits and concurrent writers can never receive the same numbers. When
+    that transaction rolls back, the reservation rolls back with it.
+    """
+    if count < 1:
+        raise ValueError("count must be a positive integer")
+    sequence = Sequence.objects.filter(name=ORDER_NUMBER_SEQUENCE)
+    with transaction.atomic():
+        if not sequence.update(last_value=F("last_value") + count):
+            _create_sequence()
+            sequence.update(last_value=F("last_value") + count)
+        last_value = sequence.values_list("last_value", flat=True).get()
+    return range(last_value - count + 1, last_value + 1)
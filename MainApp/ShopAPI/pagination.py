@@ -0,0 +1,19 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+
+
+class PurchaseOrderCursorPagination(CursorPagination):
+    """Keyset pagination over the unique ``order_number``.
+
+    Every page is a ``WHERE order_number > ? ORDER BY order_number LIMIT ?``
+    query, so deep pages cost the same as the first one and rows inserted
+    while a client is paging never shift the results.
+    """
+
+    ordering = "order_number"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, run in a worker thread."""
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
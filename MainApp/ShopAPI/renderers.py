@@ -0,0 +1,166 @@
+"""JSON rendering on top of orjson, with the standard library as fallback.
+
+``FastJSONRenderer`` is a drop-in replacement for DRF's ``JSONRenderer``
+(enable it in ``REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]``). It encodes with
+orjson when that is installed and with ``json`` and DRF's encoder otherwise;
+both produce the same compact output as DRF. Indented output, as requested by
+the browsable API, always goes through ``json``.
+
+``SHOP_JSON_DECIMALS`` picks how ``Decimal`` values are written: ``"number"``
+(DRF's behaviour, via ``float``) or ``"string"`` (exact).
+
+A :class:`Fragment` holds JSON that was encoded earlier, e.g. kept in a cache,
+and is copied into the output unchanged wherever it appears in the data.
+"""
+import json
+import re
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NUMBER = "number"
+STRING = "string"
+DECIMAL_FORMATS = (NUMBER, STRING)
+
+# Matches DRF: these are valid JSON but not valid JavaScript string content.
+_LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class Fragment:
+    """Pre-encoded JSON, inserted into rendered output as is."""
+
+    __slots__ = ("content",)
+
+    def __init__(self, content):
+        if isinstance(content, str):
+            content = content.encode()
+        self.content = content
+
+    def __eq__(self, other):
+        return isinstance(other, Fragment) and self.content == other.content
+
+    def __repr__(self):
+        return f"Fragment({self.content!r})"
+
+
+def get_decimal_format():
+    decimal_format = getattr(settings, "SHOP_JSON_DECIMALS", NUMBER)
+    if decimal_format not in DECIMAL_FORMATS:
+        choices = ", ".join(DECIMAL_FORMATS)
+        raise ImproperlyConfigured(f"SHOP_JSON_DECIMALS must be one of {choices}.")
+    return decimal_format
+
+
+class _Fragments:
+    """Stands in for fragments while encoding and splices them in afterwards.
+
+    Each fragment is encoded as a string holding a NUL byte, a random nonce and
+    its index, which no other value in the data can produce by accident.
+    """
+
+    def __init__(self):
+        self.contents = []
+        # The nonce and the pattern are only made when a fragment turns up;
+        # compiling the pattern costs more than encoding a small object.
+        self.nonce = None
+
+    def placeholder(self, fragment):
+        if self.nonce is None:
+            self.nonce = secrets.token_hex(8)
+        self.contents.append(fragment.content)
+        return f"\x00{self.nonce}:{len(self.contents) - 1}\x00"
+
+    def substitute(self, encoded):
+        if not self.contents:
+            return encoded
+        pattern = re.compile(
+            rb'"\\u0000' + self.nonce.encode() + rb':(\d+)\\u0000"'
+        )
+        return pattern.sub(lambda match: self.contents[int(match[1])], encoded)
+
+
+def _default(decimal_format, fragments):
+    drf_default = JSONEncoder().default
+    as_string = decimal_format == STRING
+    native_fragment = getattr(orjson, "Fragment", None)
+
+    def default(obj):
+        if isinstance(obj, Decimal):
+            return str(obj) if as_string else float(obj)
+        if isinstance(obj, Fragment):
+            if native_fragment is not None:
+                return native_fragment(obj.content)
+            return fragments.placeholder(obj)
+        return drf_default(obj)
+
+    return default
+
+
+def encode_json(data, indent=None, use_orjson=None, decimal_format=None):
+    """Encode ``data`` to UTF-8 JSON bytes the way DRF's renderer would.
+
+    ``use_orjson`` defaults to whether orjson is installed. It is ignored for
+    indented or non-compact (``COMPACT_JSON = False``) output.
+    """
+    if isinstance(data, Fragment):
+        return data.content
+    if use_orjson is None:
+        use_orjson = orjson is not None
+    fragments = _Fragments()
+    default = _default(decimal_format or get_decimal_format(), fragments)
+    if use_orjson and not indent and api_settings.COMPACT_JSON:
+        encoded = orjson.dumps(
+            data,
+            default=default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+    else:
+        encoded = json.dumps(
+            data,
+            default=default,
+            indent=indent,
+            ensure_ascii=not api_settings.UNICODE_JSON,
+            allow_nan=not api_settings.STRICT_JSON,
+            separators=(
+                (",", ": ")
+                if indent
+                else (",", ":")
+                if api_settings.COMPACT_JSON
+                else (", ", ": ")
+            ),
+        ).encode()
+    for separator, escaped in _LINE_SEPARATORS:
+        if separator in encoded:
+            encoded = encoded.replace(separator, escaped)
+    return fragments.substitute(encoded)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes with :func:`encode_json`."""
+
+    use_orjson = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        with phase("render"):
+            return encode_json(data, indent=indent, use_orjson=self.use_orjson)
+
+
+class StdlibJSONRenderer(FastJSONRenderer):
+    """:class:`FastJSONRenderer` that never uses orjson."""
+
+    use_orjson = False
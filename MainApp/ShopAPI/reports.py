@@ -0,0 +1,223 @@
+"""Order totals per supplier, day and tax name, kept up to date incrementally.
+
+Every order write adds its contribution to ``SupplierDayRollup`` (order
+totals) and ``TaxDayRollup`` (line item totals per tax name), and removes the
+contribution of what it replaced, so reports read a handful of rollup rows
+instead of every order and line item. Days are calendar days of ``order_time``
+in the current time zone.
+
+Writes that bypass the API (fixtures, the admin, raw SQL) are picked up by
+``python manage.py rebuild_order_rollups``.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import bulk
+from .models import LineItem, PurchaseOrder, SupplierDayRollup, TaxDayRollup
+from .totals import CENT, ZERO
+
+SUPPLIER = "supplier"
+DAY = "day"
+TAX_NAME = "tax_name"
+GROUPS = (SUPPLIER, DAY, TAX_NAME)
+
+TOTALS = ("order_count", "total_quantity", "total_amount", "total_tax")
+
+
+def _zero():
+    return [0, 0, ZERO, ZERO]
+
+
+class Rollups:
+    """Collects rollup deltas for one or more orders and applies them at once."""
+
+    def __init__(self):
+        self.suppliers = defaultdict(_zero)
+        self.taxes = defaultdict(_zero)
+
+    def add_order(self, purchase_order, line_items, sign=1):
+        """Add (or with ``sign=-1`` remove) one order's contribution."""
+        day = timezone.localdate(purchase_order.order_time)
+        self._add(
+            self.suppliers[(purchase_order.supplier_id, day)],
+            sign,
+            purchase_order.total_quantity,
+            purchase_order.total_amount,
+            purchase_order.total_tax,
+        )
+        per_tax = defaultdict(_zero)
+        for line_item in line_items:
+            self._add(
+                per_tax[line_item.tax_name],
+                1,
+                line_item.quantity,
+                line_item.line_total,
+                line_item.quantity * line_item.tax_amount,
+            )
+        for tax_name, (_, quantity, amount, tax) in per_tax.items():
+            self._add(self.taxes[(day, tax_name)], sign, quantity, amount, tax)
+
+    def remove_order(self, purchase_order, line_items):
+        self.add_order(purchase_order, line_items, sign=-1)
+
+    def remove_orders(self, order_ids):
+        """Remove the contribution of stored orders, summed by the database
+        instead of loading the line items."""
+        orders = PurchaseOrder.objects.filter(id__in=order_ids).values_list(
+            "id", "supplier_id", "order_time", *TOTALS[1:]
+        )
+        days = {}
+        for order_id, supplier_id, order_time, *totals in orders:
+            day = days[order_id] = timezone.localdate(order_time)
+            self._subtract(self.suppliers[(supplier_id, day)], 1, *totals)
+        # Grouped per order rather than per day, so SQLite doesn't call
+        # TruncDate's Python function for every line item.
+        lines = (
+            LineItem.objects.filter(purchase_order_id__in=order_ids)
+            .values_list("purchase_order_id", "tax_name")
+            .annotate(
+                sum_quantity=Sum("quantity"),
+                sum_amount=Sum("line_total"),
+                sum_tax=Sum(F("quantity") * F("tax_amount")),
+            )
+        )
+        for order_id, tax_name, *totals in lines:
+            self._subtract(self.taxes[(days[order_id], tax_name)], 1, *totals)
+
+    @staticmethod
+    def _add(totals, sign, quantity, amount, tax):
+        totals[0] += sign
+        totals[1] += sign * quantity
+        totals[2] += sign * amount
+        totals[3] += sign * tax
+
+    @staticmethod
+    def _subtract(totals, count, quantity, amount, tax):
+        totals[0] -= count
+        totals[1] -= quantity
+        totals[2] -= amount.quantize(CENT)
+        totals[3] -= tax.quantize(CENT)
+
+    def save(self):
+        self._save(SupplierDayRollup, ("supplier_id", "day"), self.suppliers)
+        self._save(TaxDayRollup, ("day", "tax_name"), self.taxes)
+        self.suppliers.clear()
+        self.taxes.clear()
+
+    @staticmethod
+    def _save(model, key_fields, deltas):
+        deltas = {key: totals for key, totals in deltas.items() if any(totals)}
+        if not deltas:
+            return
+        # Make sure every row exists, then add to it, so concurrent writers
+        # never overwrite each other's totals.
+        model.objects.bulk_create(
+            [model(**dict(zip(key_fields, key))) for key in deltas],
+            ignore_conflicts=True,
+        )
+        bulk.update_rows(
+            model,
+            TOTALS,
+            key_fields,
+            [(*totals, *key) for key, totals in deltas.items()],
+            increment=True,
+        )
+        for key, (count, *_) in deltas.items():
+            if count < 0:
+                rows = model.objects.filter(**dict(zip(key_fields, key)))
+                rows.filter(order_count=0).delete()
+
+
+def rebuild():
+    """Recompute both rollup tables from the orders and line items."""
+    SupplierDayRollup.objects.all().delete()
+    TaxDayRollup.objects.all().delete()
+    orders = (
+        PurchaseOrder.objects.annotate(day=TruncDate("order_time"))
+        .values("supplier_id", "day")
+        .annotate(
+            order_count=Count("id"),
+            sum_quantity=Sum("total_quantity"),
+            sum_amount=Sum("total_amount"),
+            sum_tax=Sum("total_tax"),
+        )
+    )
+    SupplierDayRollup.objects.bulk_create(
+        SupplierDayRollup(
+            supplier_id=row["supplier_id"],
+            day=row["day"],
+            order_count=row["order_count"],
+            total_quantity=row["sum_quantity"],
+            total_amount=row["sum_amount"],
+            total_tax=row["sum_tax"],
+        )
+        for row in orders.iterator()
+    )
+    lines = (
+        LineItem.objects.annotate(day=TruncDate("purchase_order__order_time"))
+        .values("day", "tax_name")
+        .annotate(
+            order_count=Count("purchase_order", distinct=True),
+            sum_quantity=Sum("quantity"),
+            sum_amount=Sum("line_total"),
+            sum_tax=Sum(F("quantity") * F("tax_amount")),
+        )
+    )
+    TaxDayRollup.objects.bulk_create(
+        TaxDayRollup(
+            day=row["day"],
+            tax_name=row["tax_name"],
+            order_count=row["order_count"],
+            total_quantity=row["sum_quantity"],
+            total_amount=row["sum_amount"],
+            total_tax=row["sum_tax"],
+        )
+        for row in lines.iterator()
+    )
+
+
+def parse_group_by(value):
+    """Turn a comma separated ``group_by`` parameter into a list of groups."""
+    groups = list(dict.fromkeys(group.strip() for group in value.split(",")))
+    if not groups or not set(groups).issubset(GROUPS):
+        choices = ", ".join(GROUPS)
+        raise ValidationError(f"Must be a comma separated list of {choices}.")
+    if SUPPLIER in groups and TAX_NAME in groups:
+        raise ValidationError("Cannot group by both supplier and tax_name.")
+    return groups
+
+
+def report(group_by, start=None, end=None):
+    """Return the totals grouped by ``group_by`` for days in [start, end]."""
+    if TAX_NAME in group_by:
+        queryset = TaxDayRollup.objects.all()
+    else:
+        queryset = SupplierDayRollup.objects.all()
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lte=end)
+
+    fields = []
+    for group in group_by:
+        if group == SUPPLIER:
+            fields += ["supplier_id", "supplier__name"]
+        else:
+            fields.append(group)
+    rows = (
+        queryset.values(*fields)
+        .annotate(**{f"sum_{field}": Sum(field) for field in TOTALS})
+        .order_by(*fields)
+    )
+    results = []
+    for row in rows:
+        result = {field: row[field] for field in fields}
+        if SUPPLIER in group_by:
+            result["supplier_name"] = result.pop("supplier__name")
+        result.update((field, row[f"sum_{field}"]) for field in TOTALS)
+        results.append(result)
+    return results
@@ -0,0 +1,146 @@
+"""The OpenAPI schema, generated once instead of on every request.
+
+``SpectacularAPIView`` introspects every view and serializer each time
+``/schema/`` is fetched. ``python manage.py build_schema`` writes the schema to
+``SHOP_SCHEMA_FILE`` at build time instead, and :func:`schema_view` serves that
+file as it is, with an ``ETag`` made from its content hash and
+``Cache-Control: max-age=SHOP_SCHEMA_MAX_AGE``. Without the file the schema is
+generated on the first request and kept for the life of the process, so
+drf-spectacular is only imported when there is no artifact.
+
+The artifact carries :func:`source_version` under ``x-source-version``. A file
+built from other code is stale: it is ignored, with a warning, and the schema
+is generated as if there were no file. ``?format=yaml`` returns the same schema
+as YAML.
+"""
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from importlib import import_module
+from importlib.metadata import version as package_version
+
+from django.apps import apps
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+CONTENT_TYPE = "application/vnd.oai.openapi+json"
+CONTENT_TYPES = {"json": CONTENT_TYPE, "yaml": "application/vnd.oai.openapi"}
+SOURCE_KEY = "x-source-version"
+MAX_AGE = getattr(settings, "SHOP_SCHEMA_MAX_AGE", 3600)
+
+logger = logging.getLogger(__name__)
+
+
+def schema_file():
+    return getattr(settings, "SHOP_SCHEMA_FILE", None)
+
+
+@lru_cache(maxsize=None)
+def source_version():
+    """A hash of what the schema is generated from.
+
+    That is the source of the ShopAPI app (without its tests) and of the root
+    URLconf, the schema settings and the versions of the libraries involved.
+    """
+    digest = hashlib.sha256()
+    for name in ("django", "djangorestframework", "drf-spectacular"):
+        digest.update(f"{name}=={package_version(name)}\n".encode())
+    digest.update(repr(getattr(settings, "SPECTACULAR_SETTINGS", {})).encode())
+    paths = [import_module(settings.ROOT_URLCONF).__file__]
+    for directory, _, names in os.walk(apps.get_app_config("ShopAPI").path):
+        paths += (os.path.join(directory, n) for n in names if n.endswith(".py"))
+    root = os.path.dirname(settings.BASE_DIR)
+    for path in sorted(paths):
+        if os.path.basename(path) == "tests.py":
+            continue
+        digest.update(os.path.relpath(path, root).encode())
+        with open(path, "rb") as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()[:16]
+
+
+def generate():
+    """Introspect the API and return its schema as JSON."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    schema[SOURCE_KEY] = source_version()
+    return OpenApiJsonRenderer().render(schema, renderer_context={})
+
+
+def version(content):
+    """The artifact version: a hash of the schema's content."""
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def write(path, content):
+    # Written next to the target and renamed, so workers starting meanwhile
+    # never read half a file.
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(content)
+    os.replace(temporary, path)
+
+
+def read(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def load(path):
+    """Return the artifact at ``path``, or None if it is missing or stale."""
+    content = read(path)
+    if content is None:
+        return None
+    if json.loads(content).get(SOURCE_KEY) != source_version():
+        logger.warning("%s is out of date, run build_schema.", path)
+        return None
+    return content
+
+
+@lru_cache(maxsize=None)
+def get_schema(format="json"):
+    """Return ``(content, version)`` of the artifact, or of a fresh schema."""
+    if format == "yaml":
+        from drf_spectacular.renderers import OpenApiYamlRenderer
+
+        schema = json.loads(get_schema()[0])
+        content = OpenApiYamlRenderer().render(schema, renderer_context={})
+        return content, version(content)
+    path = schema_file()
+    content = path and load(path)
+    if content is None:
+        content = generate()
+    return content, version(content)
+
+
+def clear():
+    """Forget the loaded schema, e.g. after rebuilding the artifact."""
+    get_schema.cache_clear()
+    source_version.cache_clear()
+
+
+@require_safe
+def schema_view(request):
+    """Serve the OpenAPI schema; see the module docstring."""
+    format = request.GET.get("format", "json")
+    if format not in CONTENT_TYPES:
+        raise Http404(f"Unknown schema format {format!r}.")
+    content, schema_version = get_schema(format)
+    etag = quote_etag(schema_version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type=CONTENT_TYPES[format])
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
@@ -0,0 +1,242 @@
+"""Indexed lookups behind the ``supplier_name`` and ``item_name`` filters.
+
+Every distinct name is normalized (case-folded, whitespace collapsed) and
+stored once as a ``SearchName`` together with its words and trigrams. Orders
+and suppliers only link to the names they use, so a catalogue of repeated item
+names costs one link row per order and name.
+
+``contains`` searches narrow the candidates to names that have every trigram
+of the query, then confirm the match with the original ``icontains`` lookup on
+that small set only. ``prefix`` (of the name or of any of its words) and
+``exact`` searches are answered from the index alone.
+
+The API's write paths index what they write. ``Supplier`` and ``LineItem``
+saves and deletes made anywhere else (the admin, fixtures, the shell) are
+indexed through signals, which also bump the version of the affected orders,
+and ``migrate`` indexes the rows that have no entries yet, such as those
+written before the index existed. Writes that send no signals, such as
+``bulk_create()`` or queryset ``update()``, must call :func:`index_suppliers`
+or :func:`index_orders` themselves, as the bulk write paths do once per batch.
+"""
+from django.db import connections
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import ValidationError
+
+from . import bulk
+from .models import (
+    LineItem,
+    LineItemSearchEntry,
+    PurchaseOrder,
+    SearchName,
+    SearchTerm,
+    Supplier,
+    SupplierSearchEntry,
+)
+
+CONTAINS = "contains"
+PREFIX = "prefix"
+EXACT = "exact"
+MATCH_MODES = (CONTAINS, PREFIX, EXACT)
+
+# Sorts after every character, so value__lt=prefix + _MAX_CHAR bounds a prefix.
+_MAX_CHAR = "\U0010ffff"
+
+
+def normalize(value):
+    return " ".join(value.casefold().split())
+
+
+def trigrams(value):
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+def _name_ids(values):
+    """Return ``{normalized value: SearchName id}``, creating missing names."""
+    values = set(values)
+    ids = dict(
+        SearchName.objects.filter(value__in=values).values_list("value", "id")
+    )
+    missing = values.difference(ids)
+    if missing:
+        SearchName.objects.bulk_create(
+            [SearchName(value=value) for value in missing], ignore_conflicts=True
+        )
+        created = dict(
+            SearchName.objects.filter(value__in=missing).values_list("value", "id")
+        )
+        SearchTerm.objects.bulk_create(
+            SearchTerm(name_id=name_id, kind=kind, term=term)
+            for value, name_id in created.items()
+            for kind, terms in (
+                (SearchTerm.WORD, set(value.split())),
+                (SearchTerm.GRAM, trigrams(value)),
+            )
+            for term in terms
+        )
+        ids.update(created)
+    return ids
+
+
+def index_suppliers(suppliers):
+    """Rebuild the search entries of ``suppliers``."""
+    suppliers = list(suppliers)
+    name_ids = _name_ids(normalize(supplier.name) for supplier in suppliers)
+    SupplierSearchEntry.objects.filter(supplier__in=suppliers).delete()
+    SupplierSearchEntry.objects.bulk_create(
+        SupplierSearchEntry(
+            supplier=supplier, name_id=name_ids[normalize(supplier.name)]
+        )
+        for supplier in suppliers
+    )
+
+
+def index_orders(order_ids):
+    """Rebuild the item name search entries of the given orders."""
+    order_ids = list(order_ids)
+    rows = (
+        LineItem.objects.filter(purchase_order_id__in=order_ids)
+        .values_list("purchase_order_id", "item_name")
+        .distinct()
+    )
+    entries = {(order_id, normalize(item_name)) for order_id, item_name in rows}
+    LineItemSearchEntry.objects.filter(purchase_order_id__in=order_ids).delete()
+    _add_order_entries(entries)
+
+
+def index_new_orders(items):
+    """Index ``(order id, item name)`` pairs of orders that have no entries yet.
+
+    Saves reading the line items back when the caller just created them.
+    """
+    _add_order_entries(
+        {(order_id, normalize(item_name)) for order_id, item_name in items}
+    )
+
+
+def _add_order_entries(entries):
+    name_ids = _name_ids(value for _, value in entries)
+    bulk.insert_rows(
+        LineItemSearchEntry,
+        ("purchase_order", "name"),
+        [(order_id, name_ids[value]) for order_id, value in entries],
+    )
+
+
+def index_missing():
+    """Index the suppliers and orders that have no search entries.
+
+    Returns the number of suppliers and orders indexed.
+    """
+    suppliers = list(
+        Supplier.objects.filter(
+            ~Exists(SupplierSearchEntry.objects.filter(supplier=OuterRef("pk")))
+        )
+    )
+    order_ids = list(
+        PurchaseOrder.objects.filter(
+            Exists(LineItem.objects.filter(purchase_order=OuterRef("pk"))),
+            ~Exists(
+                LineItemSearchEntry.objects.filter(purchase_order=OuterRef("pk"))
+            ),
+        ).values_list("id", flat=True)
+    )
+    if suppliers:
+        index_suppliers(suppliers)
+    if order_ids:
+        index_orders(order_ids)
+    return len(suppliers), len(order_ids)
+
+
+def matching_names(value, mode=CONTAINS):
+    """Return a ``SearchName`` id queryset for names matching ``value``."""
+    query = normalize(value)
+    if mode == EXACT:
+        return SearchName.objects.filter(value=query).values("id")
+    if mode == PREFIX:
+        prefix = Q(value__gte=query, value__lt=query + _MAX_CHAR)
+        words = SearchTerm.objects.filter(
+            kind=SearchTerm.WORD, term__gte=query, term__lt=query + _MAX_CHAR
+        )
+        return SearchName.objects.filter(prefix | Q(id__in=words.values("name")))
+    grams = trigrams(query)
+    return (
+        SearchTerm.objects.filter(kind=SearchTerm.GRAM, term__in=grams)
+        .values("name")
+        .annotate(matched=Count("term", distinct=True))
+        .filter(matched=len(grams))
+        .values("name")
+    )
+
+
+def purge_unused_names():
+    """Delete names no supplier or order refers to any more."""
+    return (
+        SearchName.objects.exclude(id__in=SupplierSearchEntry.objects.values("name"))
+        .exclude(id__in=LineItemSearchEntry.objects.values("name"))
+        .delete()
+    )
+
+
+def filter_supplier_name(queryset, value, mode=CONTAINS):
+    if mode == CONTAINS and len(normalize(value)) < 3:
+        return queryset.filter(supplier__name__icontains=value)
+    names = matching_names(value, mode)
+    entries = SupplierSearchEntry.objects.filter(name__in=names)
+    queryset = queryset.filter(supplier_id__in=entries.values("supplier"))
+    if mode == CONTAINS:
+        queryset = queryset.filter(supplier__name__icontains=value)
+    return queryset
+
+
+def filter_item_name(queryset, value, mode=CONTAINS):
+    # Exists() rather than a join, so an order with several matching line
+    # items is returned once.
+    contains = Exists(
+        LineItem.objects.filter(
+            purchase_order=OuterRef("pk"), item_name__icontains=value
+        )
+    )
+    if mode == CONTAINS and len(normalize(value)) < 3:
+        return queryset.filter(contains)
+    names = matching_names(value, mode)
+    entries = LineItemSearchEntry.objects.filter(name__in=names)
+    queryset = queryset.filter(id__in=entries.values("purchase_order"))
+    if mode == CONTAINS:
+        queryset = queryset.filter(contains)
+    return queryset
+
+
+def get_match_mode(request):
+    mode = request.query_params.get("match", CONTAINS)
+    if mode not in MATCH_MODES:
+        choices = ", ".join(MATCH_MODES)
+        raise ValidationError({"match": f"Must be one of {choices}."})
+    return mode
+
+
+# These writes also change the orders' responses, so their versions are bumped
+# as the API's own writes do. A deleted supplier's entries are deleted with it.
+@receiver(post_save, sender=Supplier)
+def _index_supplier(sender, instance, created, **kwargs):
+    index_suppliers([instance])
+    if not created:
+        PurchaseOrder.objects.filter(supplier=instance).touch()
+
+
+@receiver(post_save, sender=LineItem)
+@receiver(post_delete, sender=LineItem)
+def _index_line_item(sender, instance, **kwargs):
+    index_orders([instance.purchase_order_id])
+    PurchaseOrder.objects.filter(id=instance.purchase_order_id).touch()
+
+
+@receiver(post_migrate)
+def _index_after_migrate(sender, using, **kwargs):
+    if sender.name != "ShopAPI":
+        return
+    # The tables are missing after e.g. "migrate ShopAPI zero".
+    tables = connections[using].introspection.table_names()
+    if all(model._meta.db_table in tables for model in sender.get_models()):
+        index_missing()
@@ -1,6 +1,50 @@
-from rest_framework import serializers
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, NotFound
 from .models import Supplier, PurchaseOrder, LineItem
+from . import bulk, exporting, reports, search, suppliers
+from .order_cache import invalidate_order
 from .response_formatter import purchase_order_formatter
+from .totals import calculate_totals
+
+# Ids per batch delete request; larger sets are selected with a filter.
+MAX_DELETE_IDS = 10000
+
+LINE_ITEM_FIELDS = (
+    "item_name",
+    "quantity",
+    "price_without_tax",
+    "tax_name",
+    "tax_amount",
+)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The order has changed."
+    default_code = "precondition_failed"
+
+
+def claim_order(purchase_order, versions=None):
+    """Bump the order's version as the first write of the current transaction.
+
+    The UPDATE holds the order's row lock (the database lock on SQLite) until
+    the transaction ends, so a concurrent write to the order waits and then
+    finds the version it read gone. With ``versions``, the versions If-Match
+    accepts, the UPDATE only applies to those and PreconditionFailed is raised
+    otherwise. ``purchase_order`` is reloaded.
+    """
+    orders = PurchaseOrder.objects.filter(id=purchase_order.id)
+    if versions is not None:
+        orders = orders.filter(version__in=versions)
+    if not orders.touch():
+        if versions is not None and PurchaseOrder.objects.filter(
+            id=purchase_order.id
+        ).exists():
+            raise PreconditionFailed()
+        raise NotFound("Entry not found")
+    purchase_order.refresh_from_db()
+    invalidate_order(purchase_order.id, purchase_order.version - 1)
 
 
 class SupplierSerializer(serializers.ModelSerializer):
@@ -38,38 +82,31 @@ class PurchaseOrderMutateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         supplier_data = validated_data["supplier"]
         line_items_data = validated_data["line_items"]
-        if supplier_data.get("id"):
-            supplier = Supplier.objects.get(id=supplier_data.get("id"))
-            supplier.name = supplier_data["name"]
-            supplier.email = supplier_data["email"]
-            supplier.save()
-        else:
-            supplier, _ = Supplier.objects.get_or_create(**supplier_data)
-        supplier_data["id"] = supplier.id
-        purchase_order = PurchaseOrder.objects.create(
-            supplier=supplier, total_quantity=0, total_amount=0, total_tax=0
-        )
-        _total_amount = 0
-        _total_quantity = 0
-        _total_tax = 0
-        for line_item_data in line_items_data:
-            _total_amount += int(line_item_data["quantity"]) * (
-                float(line_item_data["price_without_tax"])
-                + float(line_item_data["tax_amount"])
-            )
-            _total_quantity += int(line_item_data["quantity"])
-            _total_tax += int(line_item_data["quantity"]) * float(
-                line_item_data["tax_amount"]
-            )
-            line_item = LineItem.objects.create(
-                purchase_order=purchase_order, **line_item_data
+        with transaction.atomic():
+            supplier = suppliers.upsert_supplier(supplier_data)
+            supplier_data["id"] = supplier.id
+            totals = calculate_totals(line_items_data)
+            line_items = []
+            for line_item_data, line_total in zip(
+                line_items_data, totals.line_totals
+            ):
+                line_item_data["line_total"] = line_total
+                line_items.append(LineItem(**line_item_data))
+            purchase_order = PurchaseOrder.objects.create(
+                supplier=supplier,
+                total_quantity=totals.total_quantity,
+                total_amount=totals.total_amount,
+                total_tax=totals.total_tax,
             )
+            for line_item in line_items:
+                line_item.purchase_order = purchase_order
+            LineItem.objects.bulk_create(line_items)
+            search.index_orders([purchase_order.id])
+            rollups = reports.Rollups()
+            rollups.add_order(purchase_order, line_items)
+            rollups.save()
+        for line_item_data, line_item in zip(line_items_data, line_items):
             line_item_data["id"] = line_item.id
-            line_item_data["line_total"] = line_item.line_total
-        purchase_order.total_amount = _total_amount
-        purchase_order.total_quantity = _total_quantity
-        purchase_order.total_tax = _total_tax
-        purchase_order.save()
         response_data = purchase_order_formatter(
             purchase_order, supplier_data, line_items_data
         )
@@ -78,65 +115,82 @@ class PurchaseOrderMutateSerializer(serializers.ModelSerializer):
     def update(self, purchase_order, validated_data):
         supplier_data = validated_data["supplier"]
         line_items_data = validated_data["line_items"]
-        if supplier_data.get("id"):
-            purchase_order.supplier.id = supplier_data.get("id")
-            purchase_order.supplier.name = supplier_data.get("name")
-            purchase_order.supplier.email = supplier_data.get("email")
-            purchase_order.supplier.save()
-        existing_line_item_ids = set(
-            purchase_order.line_items.values_list("id", flat=True)
-        )
-        _total_amount = 0
-        _total_quantity = 0
-        _total_tax = 0
-        for line_item_data in line_items_data:
-            line_item_id = line_item_data.get("id")
-            if line_item_id:
-                # Update existing line items
-                if line_item_id in existing_line_item_ids:
-                    _total_amount += int(line_item_data["quantity"]) * (
-                        float(line_item_data["price_without_tax"])
-                        + float(line_item_data["tax_amount"])
-                    )
-                    _total_quantity += int(line_item_data["quantity"])
-                    _total_tax += int(line_item_data["quantity"]) * float(
-                        line_item_data["tax_amount"]
-                    )
-                    line_item = LineItem.objects.get(
-                        pk=line_item_id, purchase_order=purchase_order
-                    )
-                    for attr, value in line_item_data.items():
-                        setattr(line_item, attr, value)
-                    line_item.save()
-                    line_item_data["line_total"] = line_item.line_total
-                    existing_line_item_ids.remove(line_item_id)
+        with transaction.atomic():
+            claim_order(purchase_order, self.context.get("if_match"))
+            if supplier_data.get("id"):
+                # The order keeps its supplier; the given one is only updated.
+                suppliers.upsert_supplier(supplier_data)
+            existing_line_items = {
+                line_item.id: line_item for line_item in purchase_order.line_items.all()
+            }
+            rollups = reports.Rollups()
+            rollups.remove_order(purchase_order, existing_line_items.values())
+            new_line_items = []
+            changed_line_items = []
+            kept_line_items = []
+            for line_item_data in line_items_data:
+                line_item_id = line_item_data.get("id")
+                if line_item_id:
+                    line_item = existing_line_items.pop(line_item_id, None)
+                    if line_item is None:
+                        # If an ID is given but not found in the current line items, skip
+                        continue
+                    changed = False
+                    for attr in LINE_ITEM_FIELDS:
+                        value = line_item_data[attr]
+                        if getattr(line_item, attr) != value:
+                            setattr(line_item, attr, value)
+                            changed = True
+                    if changed:
+                        changed_line_items.append(line_item)
                 else:
-                    # If an ID is given but not found in the current line items, skip
-                    continue
-            else:
-                # Create new line items
-                _total_amount += int(line_item_data["quantity"]) * (
-                    float(line_item_data["price_without_tax"])
-                    + float(line_item_data["tax_amount"])
-                )
-                _total_quantity += int(line_item_data["quantity"])
-                _total_tax += int(line_item_data["quantity"]) * float(
-                    line_item_data["tax_amount"]
-                )
-                line_item = LineItem.objects.create(
-                    purchase_order=purchase_order, **line_item_data
-                )
-                line_item_data["line_total"] = line_item.line_total
+                    line_item = LineItem(
+                        purchase_order=purchase_order, **line_item_data
+                    )
+                    new_line_items.append((line_item_data, line_item))
+                kept_line_items.append((line_item_data, line_item))
+            totals = calculate_totals(
+                [line_item_data for line_item_data, _ in kept_line_items]
+            )
+            for (line_item_data, line_item), line_total in zip(
+                kept_line_items, totals.line_totals
+            ):
+                line_item_data["line_total"] = line_item.line_total = line_total
+            LineItem.objects.bulk_create(
+                [line_item for _, line_item in new_line_items]
+            )
+            for line_item_data, line_item in new_line_items:
                 line_item_data["id"] = line_item.id
-        # Delete line items that were not updated or created
-        LineItem.objects.filter(id__in=existing_line_item_ids).delete()
-        response_data = purchase_order_formatter(
-            purchase_order, supplier_data, line_items_data
-        )
-        purchase_order.total_amount = _total_amount
-        purchase_order.total_quantity = _total_quantity
-        purchase_order.total_tax = _total_tax
-        purchase_order.save()
+            LineItem.objects.bulk_update(
+                changed_line_items, LINE_ITEM_FIELDS + ("line_total",)
+            )
+            # Delete line items that were not updated or created
+            # Without signals, which would index the order once per line item.
+            bulk.delete_rows(LineItem, "id", list(existing_line_items))
+            if new_line_items or changed_line_items or existing_line_items:
+                search.index_orders([purchase_order.id])
+            purchase_order.total_amount = totals.total_amount
+            purchase_order.total_quantity = totals.total_quantity
+            purchase_order.total_tax = totals.total_tax
+            rollups.add_order(
+                purchase_order, [line_item for _, line_item in kept_line_items]
+            )
+            rollups.save()
+            purchase_order.save(
+                update_fields=[
+                    "total_amount",
+                    "total_quantity",
+                    "total_tax",
+                    "updated_at",
+                ]
+            )
+            # Updating the supplier may have bumped the version again.
+            purchase_order.refresh_from_db(fields=["version"])
+            # Formatting inside the transaction rolls the writes back if the
+            # payload referenced an unknown line item (KeyError -> 400).
+            response_data = purchase_order_formatter(
+                purchase_order, supplier_data, line_items_data
+            )
         return response_data
 
 
@@ -170,3 +224,88 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
             "total_tax",
             "line_items",
         )
+
+
+class OrderReportParametersSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.CharField(default=reports.DAY)
+
+    def validate_group_by(self, value):
+        return reports.parse_group_by(value)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        return attrs
+
+
+class OrderExportParametersSerializer(serializers.Serializer):
+    level = serializers.ChoiceField(exporting.LEVELS, default=exporting.ORDER)
+    output = serializers.ChoiceField(exporting.FORMATS, default=exporting.CSV)
+    after_id = serializers.IntegerField(min_value=0, required=False)
+    since = serializers.DateTimeField(required=False)
+
+
+class OrderFilterSerializer(serializers.Serializer):
+    """Order list filters. Keys are PurchaseOrder lookups."""
+
+    supplier_id = serializers.IntegerField(required=False)
+    order_time__gte = serializers.DateTimeField(required=False)
+    order_time__lt = serializers.DateTimeField(required=False)
+    total_amount__gte = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    total_amount__lte = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+
+
+class OrderDeleteFilterSerializer(OrderFilterSerializer):
+    id__gte = serializers.IntegerField(required=False)
+    id__lt = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Give at least one condition.")
+        return attrs
+
+
+class OrderBatchDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_DELETE_IDS,
+        required=False,
+    )
+    filter = OrderDeleteFilterSerializer(required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Give either ids or filter.")
+        return attrs
+
+    def get_queryset(self):
+        if "ids" in self.validated_data:
+            return PurchaseOrder.objects.filter(id__in=self.validated_data["ids"])
+        return PurchaseOrder.objects.filter(**self.validated_data["filter"])
+
+
+class OrderBatchDeleteResultSerializer(serializers.Serializer):
+    dry_run = serializers.BooleanField()
+    orders = serializers.IntegerField()
+    line_items = serializers.IntegerField()
+
+
+class OrderReportSerializer(serializers.Serializer):
+    """One group of a report; only the grouped fields are present."""
+
+    supplier_id = serializers.IntegerField(required=False)
+    supplier_name = serializers.CharField(required=False)
+    day = serializers.DateField(required=False)
+    tax_name = serializers.CharField(required=False)
+    order_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+    total_amount = serializers.DecimalField(max_digits=16, decimal_places=2)
+    total_tax = serializers.DecimalField(max_digits=16, decimal_places=2)
@@ -0,0 +1,116 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .fast_serializers import aserialize_orders, serialize_orders
+from .fieldsets import ORDER_FIELDS
+from .renderers import encode_json
+
+STREAM_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+STREAM_CHUNK_SIZE = 500
+
+
+def iter_order_chunks(queryset, chunk_size=STREAM_CHUNK_SIZE, fields=ORDER_FIELDS):
+    """Yield lists of serialized orders, ``chunk_size`` orders at a time.
+
+    The queryset, which should ``select_related("supplier")`` (or be narrowed
+    to ``fields`` with ``fieldsets.select_fields()``), is walked with
+    ``.iterator()`` and the line items are loaded per chunk, so only one chunk
+    of orders and line items is held in memory at any point.
+    """
+    orders = queryset.order_by("order_number").iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(orders, chunk_size))
+        if not chunk:
+            return
+        yield serialize_orders(chunk, fields)
+
+
+async def aiter_order_chunks(
+    queryset, chunk_size=STREAM_CHUNK_SIZE, fields=ORDER_FIELDS
+):
+    """Async counterpart of :func:`iter_order_chunks`."""
+    chunk = []
+    orders = queryset.order_by("order_number").aiterator(chunk_size=chunk_size)
+    async for order in orders:
+        chunk.append(order)
+        if len(chunk) == chunk_size:
+            yield await aserialize_orders(chunk, fields)
+            chunk = []
+    if chunk:
+        yield await aserialize_orders(chunk, fields)
+
+
+async def aiterate(iterator):
+    """Yield the items of the sync ``iterator``, each produced in a thread.
+
+    Under ASGI Django reads a sync streaming body into a list before sending
+    any of it; this keeps one item in memory at a time instead.
+    """
+    step = sync_to_async(next)
+    done = object()
+    while (item := await step(iterator, done)) is not done:
+        yield item
+
+
+def is_asgi(request):
+    """Whether ``request`` (a Django or DRF request) came in through ASGI."""
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def _ndjson_lines(chunk):
+    return b"".join(encode_json(order) + b"\n" for order in chunk)
+
+
+def _json_items(chunk):
+    # Encode the whole chunk at once and drop the enclosing brackets.
+    return encode_json(chunk)[1:-1]
+
+
+def _ndjson(queryset, fields):
+    for chunk in iter_order_chunks(queryset, fields=fields):
+        yield _ndjson_lines(chunk)
+
+
+def _json_array(queryset, fields):
+    yield b"["
+    separator = b""
+    for chunk in iter_order_chunks(queryset, fields=fields):
+        yield separator + _json_items(chunk)
+        separator = b","
+    yield b"]"
+
+
+async def _async_ndjson(queryset, fields):
+    async for chunk in aiter_order_chunks(queryset, fields=fields):
+        yield _ndjson_lines(chunk)
+
+
+async def _async_json_array(queryset, fields):
+    yield b"["
+    separator = b""
+    async for chunk in aiter_order_chunks(queryset, fields=fields):
+        yield separator + _json_items(chunk)
+        separator = b","
+    yield b"]"
+
+
+def stream_orders(queryset, stream_format, asynchronous=False, fields=ORDER_FIELDS):
+    """Return a response that writes ``queryset`` out incrementally.
+
+    With ``asynchronous=True`` the body is an async generator, which ASGI
+    servers consume without tying up a thread.
+    """
+    if stream_format == "ndjson":
+        writer = _async_ndjson if asynchronous else _ndjson
+    else:
+        writer = _async_json_array if asynchronous else _json_array
+    content = writer(queryset, fields)
+    return StreamingHttpResponse(
+        content, content_type=STREAM_CONTENT_TYPES[stream_format]
+    )
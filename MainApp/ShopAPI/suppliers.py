@@ -0,0 +1,112 @@
+"""Resolve supplier payloads to ``Supplier`` rows with as few writes as possible.
+
+Order writes name their supplier either by ``id`` (and then overwrite its name
+and email) or by ``name`` and ``email`` (reusing a matching supplier or
+creating one). All payloads are looked up with one query. A supplier is only
+written, its orders only touched and its search entry only rebuilt when the
+submitted name or email actually differ from the stored ones.
+
+That decision is only as good as the rows it compares against, so they are
+read in the transaction that writes them, with ``SELECT ... FOR UPDATE`` where
+the database supports it. Call :func:`resolve_suppliers` inside the same
+``transaction.atomic()`` block as :func:`save_suppliers`.
+"""
+from typing import NamedTuple
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from . import search
+from .models import PurchaseOrder, Supplier
+
+
+class Resolution(NamedTuple):
+    # One entry per resolved payload, None where the payload's id is unknown.
+    suppliers: list
+    new: list
+    changed: list
+
+
+def _lookup(ids, details):
+    """Return ``({id: Supplier}, {(name, email): Supplier})`` for what exists.
+
+    The rows stay locked until the transaction ends, so a supplier found
+    unchanged here is still unchanged when the order referencing it is saved.
+    """
+    by_id, by_details = {}, {}
+    if not ids and not details:
+        return by_id, by_details
+    found = (
+        Supplier.objects.select_for_update()
+        .filter(Q(id__in=ids) | Q(name__in={name for name, _ in details}))
+        .order_by("id")
+    )
+    for supplier in found:
+        pair = (supplier.name, supplier.email)
+        if supplier.id in ids:
+            by_id[supplier.id] = supplier
+        if pair in details:
+            by_details.setdefault(pair, supplier)
+    return by_id, by_details
+
+
+def resolve_suppliers(payloads):
+    """Match supplier payloads to suppliers without writing anything.
+
+    Payloads sharing an id or a name and email resolve to the same instance;
+    when several payloads rename the same supplier the last one wins. Pass the
+    result to :func:`save_suppliers` to store new and changed suppliers.
+    """
+    ids = {payload["id"] for payload in payloads if payload.get("id")}
+    details = {
+        (payload["name"], payload["email"])
+        for payload in payloads
+        if not payload.get("id")
+    }
+    by_id, by_details = _lookup(ids, details)
+
+    suppliers, new, changed = [], {}, {}
+    for payload in payloads:
+        pair = (payload["name"], payload["email"])
+        if payload.get("id"):
+            supplier = by_id.get(payload["id"])
+            if supplier is not None and (supplier.name, supplier.email) != pair:
+                supplier.name, supplier.email = pair
+                changed[supplier.id] = supplier
+        else:
+            supplier = by_details.get(pair)
+            if supplier is None:
+                supplier = by_details[pair] = new[pair] = Supplier(
+                    name=pair[0], email=pair[1]
+                )
+        suppliers.append(supplier)
+    return Resolution(suppliers, list(new.values()), list(changed.values()))
+
+
+def save_suppliers(resolution):
+    """Create and update the suppliers of a :func:`resolve_suppliers` result."""
+    new, changed = resolution.new, resolution.changed
+    Supplier.objects.bulk_create(new)
+    if changed:
+        Supplier.objects.bulk_update(changed, ["name", "email"])
+        PurchaseOrder.objects.filter(supplier__in=changed).touch()
+    if new or changed:
+        search.index_suppliers(new + changed)
+
+
+def bulk_upsert(payloads):
+    """Resolve and save supplier payloads, returning one supplier per payload.
+
+    Entries are None for payloads naming an unknown supplier id.
+    """
+    resolution = resolve_suppliers(payloads)
+    save_suppliers(resolution)
+    return resolution.suppliers
+
+
+def upsert_supplier(payload):
+    (supplier,) = bulk_upsert([payload])
+    if supplier is None:
+        raise ValidationError({"supplier": {"id": ["Supplier not found."]}})
+    return supplier
+
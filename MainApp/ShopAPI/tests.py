@@ -1,9 +1,67 @@
-from django.test import TestCase
-from django.urls import reverse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing, redirect_stderr
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from .models import PurchaseOrder, LineItem, Supplier
-from .serializers import PurchaseOrderSerializer
+from rest_framework.utils.serializer_helpers import ReturnList
+from .models import LineItem, LineItemSearchEntry, PurchaseOrder, Supplier, SupplierDayRollup, SupplierSearchEntry, TaxDayRollup
+from . import authentication, benchmarking, deletion, exporting, importing, metrics, order_cache, reports, schema, search, suppliers
+from .caching import LocMemCache, cache_stats
+from .order_numbers import allocate_order_numbers
+from .totals import calculate_totals
+from .fast_serializers import serialize_orders
+from .renderers import FastJSONRenderer, Fragment, StdlibJSONRenderer, encode_json
+from .serializers import PurchaseOrderMutateSerializer, PurchaseOrderSerializer
+from .urls import build_urlpatterns
+from benchmarks import bench_order_numbers
+
+
+def temporary_directory(test):
+    """Return a new directory that is removed when ``test`` finishes."""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
+
+
+def line_item(item_name='Test Item', quantity=1, price_without_tax='10.00', tax_name='GST 5%', tax_amount='0.50'):
+    return {"item_name": item_name, "quantity": quantity, "price_without_tax": price_without_tax, "tax_name": tax_name, "tax_amount": tax_amount}
+
+
+def order_payload(supplier_name='Test Supplier', *line_items, email='test@test.com'):
+    """An order as the API accepts it, with one default line item if none are given."""
+    return {"supplier": {"name": supplier_name, "email": email}, "line_items": list(line_items) or [line_item()]}
+
+
+def create_order(test, *args, **kwargs):
+    """Create an ``order_payload(*args, **kwargs)`` through ``test.client`` and return its id."""
+    response = test.client.post(reverse('purchase-order'), order_payload(*args, **kwargs), format='json')
+    test.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+    return response.data['data']['id']
 
 class PurchaseOrderViewTestCase(TestCase):
     def setUp(self):
@@ -48,6 +106,52 @@ class PurchaseOrderViewTestCase(TestCase):
         self.assertEqual(LineItem.objects.count(), 1)
         self.assertEqual(Supplier.objects.count(), 1)
 
+    def test_create_purchase_order_bulk_inserts_line_items(self):
+        url = reverse('purchase-order')
+        # The first request creates the order number sequence and the search
+        # index entry for the item name, so only the last two are compared.
+        query_counts = []
+        for count in (1, 1, 50):
+            payload = {
+                "supplier": {"name": "Test Supplier", "email": f"{len(query_counts)}@test.com"},
+                "line_items": [dict(self.valid_payload["line_items"][0]) for _ in range(count)]
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[1], query_counts[2])
+        attributes = response.data['data']['attributes']
+        self.assertEqual(attributes['total_quantity'], 50)
+        self.assertEqual(attributes['total_amount'], Decimal('525.00'))
+        self.assertEqual(attributes['total_tax'], Decimal('25.00'))
+        line_items = response.data['data']['relationships']['line_items']
+        purchase_order = PurchaseOrder.objects.get(id=response.data['data']['id'])
+        self.assertEqual(
+            [line_item['data']['id'] for line_item in line_items],
+            list(purchase_order.line_items.order_by('id').values_list('id', flat=True)),
+        )
+        self.assertTrue(all(line_item.line_total == Decimal('10.50') for line_item in purchase_order.line_items.all()))
+
+    def test_create_purchase_order_totals_are_exact(self):
+        payload = {
+            "supplier": {"name": "Test Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"item_name": f"Item {i}", "quantity": 3, "price_without_tax": "0.10", "tax_name": "GST 5%", "tax_amount": "0.01"}
+                for i in range(10)
+            ]
+        }
+        response = self.client.post(reverse('purchase-order'), payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        purchase_order = PurchaseOrder.objects.get(id=response.data['data']['id'])
+        line_totals = [line_item.line_total for line_item in purchase_order.line_items.all()]
+        self.assertEqual(purchase_order.total_amount, sum(line_totals))
+        self.assertEqual(purchase_order.total_amount, Decimal('3.30'))
+        self.assertEqual(purchase_order.total_tax, Decimal('0.30'))
+        self.assertEqual(purchase_order.total_quantity, 30)
+
     def test_create_invalid_purchase_order(self):
         invalid_payload = {
             # Invalid payload without required fields
@@ -79,12 +183,112 @@ class PurchaseOrderViewTestCase(TestCase):
         url = reverse('purchase-order')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        purchase_orders = PurchaseOrder.objects.all()
+        purchase_orders = PurchaseOrder.objects.order_by('order_number')
         serializer = PurchaseOrderSerializer(purchase_orders, many=True)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
+
+    def test_get_all_purchase_orders_query_count(self):
+        for i in range(5):
+            supplier = Supplier.objects.create(name=f'Supplier {i}', email=f'supplier{i}@test.com')
+            purchase_order = PurchaseOrder.objects.create(supplier=supplier, total_quantity=3, total_amount=31.5, total_tax=1.5)
+            for j in range(3):
+                LineItem.objects.create(purchase_order=purchase_order, item_name=f'Item {j}', quantity=1, price_without_tax=10.00, tax_name='GST 5%', tax_amount=0.50, line_total=10.50)
+
+        url = reverse('purchase-order')
+        # One query for the orders joined with their suppliers, one for the line items.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertTrue(all(len(order['line_items']) == 3 for order in response.data['results']))
+
+    def test_get_all_purchase_orders_not_modified(self):
+        supplier = Supplier.objects.create(name='Test Supplier', email='test@test.com')
+        purchase_order = PurchaseOrder.objects.create(supplier=supplier, total_quantity=1, total_amount=10.5, total_tax=0.5)
+        LineItem.objects.create(purchase_order=purchase_order, item_name='Test Item', quantity=1, price_without_tax=10.00, tax_name='GST 5%', tax_amount=0.50, line_total=10.50)
+        url = reverse('purchase-order')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        # Only the page query runs; line items are neither loaded nor serialized.
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        PurchaseOrder.objects.filter(id=purchase_order.id).touch()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deleting_an_order_changes_the_list(self):
+        supplier = Supplier.objects.create(name='Test Supplier', email='test@test.com')
+        first, second = [PurchaseOrder.objects.create(supplier=supplier, total_quantity=0, total_amount=0, total_tax=0) for _ in range(2)]
+        url = reverse('purchase-order')
+        etag = self.client.get(url)['ETag']
+        second.delete()
+        later = http_date(timezone.now().timestamp() + 60)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=later)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data['results']], [first.id])
+
+    def test_get_purchase_orders_cursor_pagination(self):
+        supplier = Supplier.objects.create(name='Test Supplier', email='test@test.com')
+        for _ in range(15):
+            PurchaseOrder.objects.create(supplier=supplier, total_quantity=0, total_amount=0, total_tax=0)
+
+        url = reverse('purchase-order')
+        first_page = self.client.get(url)
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first_page.data['results']), 10)
+        self.assertIsNone(first_page.data['previous'])
+
+        second_page = self.client.get(first_page.data['next'])
+        self.assertEqual(len(second_page.data['results']), 5)
+        self.assertIsNone(second_page.data['next'])
+
+        order_numbers = [order['order_number'] for order in first_page.data['results'] + second_page.data['results']]
+        self.assertEqual(order_numbers, sorted(set(order_numbers)))
+        self.assertEqual(len(order_numbers), 15)
+
+    def test_stream_purchase_orders(self):
+        supplier = Supplier.objects.create(name='Test Supplier', email='test@test.com')
+        for i in range(3):
+            purchase_order = PurchaseOrder.objects.create(supplier=supplier, total_quantity=1, total_amount=10.5, total_tax=0.5)
+            LineItem.objects.create(purchase_order=purchase_order, item_name=f'Item {i}', quantity=1, price_without_tax=10.00, tax_name='GST 5%', tax_amount=0.50, line_total=10.50)
+        url = reverse('purchase-order')
+        expected = json.loads(json.dumps(PurchaseOrderSerializer(PurchaseOrder.objects.order_by('order_number'), many=True).data))
+
+        response = self.client.get(url, {'stream': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+        response = self.client.get(url, {'stream': 'json'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+        response = self.client.get(url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_stream_under_asgi(self):
+        supplier = await Supplier.objects.acreate(name='Test Supplier', email='test@test.com')
+        for _ in range(3):
+            await PurchaseOrder.objects.acreate(supplier=supplier, total_quantity=1, total_amount=10.5, total_tax=0.5)
+        response = await AsyncClient().get(reverse('purchase-order'), {'stream': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync body would be read into a list before the first byte is sent.
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(json.loads(content)), 3)
+
 
 class PurchaseOrderIDViewTestCase(TestCase):
     def setUp(self):
+        order_cache.clear()
         self.client = APIClient()
         self.supplier,_ = Supplier.objects.get_or_create(name='Test Supplier', email='test@test.com')
         self.purchase_order = PurchaseOrder.objects.create(supplier=self.supplier, total_quantity=1, total_amount=10.5, total_tax=0.5)
@@ -98,6 +302,144 @@ class PurchaseOrderIDViewTestCase(TestCase):
         serializer_data = PurchaseOrderSerializer(instance=self.purchase_order).data
         self.assertEqual(response.data, serializer_data)
 
+    def test_orm_writes_change_the_etag(self):
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        etag = self.client.get(url)['ETag']
+        self.line_item.quantity = 7
+        self.line_item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['line_items'][0]['quantity'], 7)
+
+        etag = response['ETag']
+        self.supplier.name = 'Renamed Supplier'
+        self.supplier.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['supplier']['name'], 'Renamed Supplier')
+
+        etag = response['ETag']
+        self.line_item.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['line_items'], [])
+
+    def test_get_purchase_order_query_count(self):
+        LineItem.objects.create(purchase_order=self.purchase_order, item_name='Second Item', quantity=1, price_without_tax=10.00, tax_name='GST 5%', tax_amount=0.50, line_total=10.50)
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        # The version lookup, then the order with its supplier, then the line items.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['line_items']), 2)
+
+    def test_get_purchase_order_is_cached_until_written(self):
+        stats = cache_stats('orders')
+        stats.reset()
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+
+        payload = {
+            "supplier": {"id": self.supplier.id, "name": "Renamed Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"id": self.line_item.id, "item_name": "Renamed Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+            ]
+        }
+        self.client.put(url, payload, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response.data['line_items'][0]['item_name'], 'Renamed Item')
+        self.assertEqual(response.data['supplier']['name'], 'Renamed Supplier')
+        self.assertEqual(stats.misses, 2)
+
+    def test_get_purchase_order_not_modified(self):
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_put_and_delete_check_if_match(self):
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        etag = self.client.get(url)['ETag']
+        payload = {
+            "supplier": {"id": self.supplier.id, "name": "Test Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"id": self.line_item.id, "item_name": "Renamed Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+            ]
+        }
+        response = self.client.put(url, payload, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_etag = response['ETag']
+        self.assertNotEqual(new_etag, etag)
+
+        response = self.client.put(url, payload, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(PurchaseOrder.objects.filter(id=self.purchase_order.id).exists())
+
+        response = self.client.delete(url, HTTP_IF_MATCH=new_etag)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_interleaved_writes_with_the_same_etag(self):
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        etag = self.client.get(url)['ETag']
+
+        def payload(quantity):
+            return {
+                "supplier": {"id": self.supplier.id, "name": "Test Supplier", "email": "test@test.com"},
+                "line_items": [
+                    {"id": self.line_item.id, "item_name": "Test Item", "quantity": quantity, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+                ]
+            }
+
+        def interleaved(request):
+            # PUT A runs whole after `request` has read the order, just as
+            # it opens its transaction (a savepoint inside the test's one).
+            first = {}
+
+            def run_first(execute, sql, params, many, context):
+                if not first and sql.startswith('SAVEPOINT'):
+                    first['response'] = None
+                    first['response'] = self.client.put(url, payload(2), format='json', HTTP_IF_MATCH=etag)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(run_first):
+                response = request()
+            self.assertEqual(first['response'].status_code, status.HTTP_201_CREATED)
+            return response
+
+        response = interleaved(lambda: self.client.put(url, payload(3), format='json', HTTP_IF_MATCH=etag))
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(LineItem.objects.get(id=self.line_item.id).quantity, 2)
+
+        etag = self.client.get(url)['ETag']
+        response = interleaved(lambda: self.client.delete(url, HTTP_IF_MATCH=etag))
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(PurchaseOrder.objects.filter(id=self.purchase_order.id).exists())
+
+    def test_supplier_change_invalidates_other_orders(self):
+        other_order = PurchaseOrder.objects.create(supplier=self.supplier, total_quantity=0, total_amount=0, total_tax=0)
+        other_url = reverse('purchase-order-id', kwargs={'id': other_order.id})
+        self.client.get(other_url)
+
+        payload = {
+            "supplier": {"id": self.supplier.id, "name": "Renamed Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"id": self.line_item.id, "item_name": "Test Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+            ]
+        }
+        self.client.put(reverse('purchase-order-id', kwargs={'id': self.purchase_order.id}), payload, format='json')
+        response = self.client.get(other_url)
+        self.assertEqual(response.data['supplier']['name'], 'Renamed Supplier')
+
     def test_get_nonexistent_purchase_order(self):
         non_existent_id = 9999
         url = reverse('purchase-order-id', kwargs={'id': non_existent_id})
@@ -146,6 +488,47 @@ class PurchaseOrderIDViewTestCase(TestCase):
         self.assertEqual(updated_line_item.tax_name, "GST 10%")
         self.assertEqual(updated_line_item.tax_amount, 2.00)
 
+    def test_update_purchase_order_applies_line_item_diff(self):
+        unchanged = LineItem.objects.create(purchase_order=self.purchase_order, item_name='Unchanged Item', quantity=1, price_without_tax=5.00, tax_name='GST 5%', tax_amount=0.25, line_total=5.25)
+        removed = LineItem.objects.create(purchase_order=self.purchase_order, item_name='Removed Item', quantity=1, price_without_tax=5.00, tax_name='GST 5%', tax_amount=0.25, line_total=5.25)
+        payload = {
+            "supplier": {"id": self.supplier.id, "name": "Test Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"id": self.line_item.id, "item_name": "Test Item", "quantity": 4, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+                {"id": unchanged.id, "item_name": "Unchanged Item", "quantity": 1, "price_without_tax": "5.00", "tax_name": "GST 5%", "tax_amount": "0.25"},
+                {"item_name": "New Item", "quantity": 2, "price_without_tax": "1.00", "tax_name": "GST 5%", "tax_amount": "0.05"},
+            ]
+        }
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'].split()[0] for query in queries if '"shopapi_lineitem"' in query['sql'].lower()]
+        # The final read collects the item names for the search index.
+        self.assertEqual(statements, ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'SELECT'])
+        self.assertEqual(LineItem.objects.get(id=self.line_item.id).line_total, Decimal('42.00'))
+        self.assertFalse(LineItem.objects.filter(id=removed.id).exists())
+        self.assertEqual(self.purchase_order.line_items.count(), 3)
+        purchase_order = PurchaseOrder.objects.get(id=self.purchase_order.id)
+        self.assertEqual(purchase_order.total_quantity, 7)
+        self.assertEqual(purchase_order.total_amount, Decimal('49.35'))
+        self.assertEqual(response.data['data']['attributes']['total_quantity'], 7)
+
+    def test_update_unknown_line_item_rolls_back(self):
+        payload = {
+            "supplier": {"id": self.supplier.id, "name": "Test Supplier", "email": "test@test.com"},
+            "line_items": [
+                {"id": self.line_item.id, "item_name": "Renamed Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+                {"id": 9999, "item_name": "Ghost Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+            ]
+        }
+        url = reverse('purchase-order-id', kwargs={'id': self.purchase_order.id})
+        response = self.client.put(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(LineItem.objects.get(id=self.line_item.id).item_name, 'Test Item')
+
     def test_update_invalid_purchase_order(self):
         invalid_payload = {
             # Invalid payload without required fields
@@ -178,3 +561,1308 @@ class PurchaseOrderIDViewTestCase(TestCase):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderBatchDeleteTestCase(TestCase):
+    def setUp(self):
+        order_cache.clear()
+        self.client = APIClient()
+        self.url = reverse('purchase-order-batch-delete')
+        self.order_ids = [create_order(self, name, line_item('Widget'), line_item('Bolt', 3, '1.00', 'VAT', '0.20')) for name in ('Acme', 'Acme', 'Globex', 'Acme')]
+        # Spread the orders over two days.
+        earlier = timezone.now() - timedelta(days=2)
+        PurchaseOrder.objects.filter(id__in=self.order_ids[:2]).update(order_time=earlier)
+        with transaction.atomic():
+            reports.rebuild()
+
+    def rollups(self):
+        return (
+            sorted(SupplierDayRollup.objects.values_list('supplier_id', 'day', 'order_count', 'total_quantity', 'total_amount', 'total_tax')),
+            sorted(TaxDayRollup.objects.values_list('day', 'tax_name', 'order_count', 'total_quantity', 'total_amount', 'total_tax')),
+        )
+
+    def assertRollupsMatchRebuild(self):
+        rollups = self.rollups()
+        with transaction.atomic():
+            reports.rebuild()
+        self.assertEqual(rollups, self.rollups())
+
+    def test_dry_run_counts(self):
+        acme = Supplier.objects.get(name='Acme').id
+        response = self.client.post(self.url, {'filter': {'supplier_id': acme}, 'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'dry_run': True, 'orders': 3, 'line_items': 6})
+        self.assertEqual(PurchaseOrder.objects.count(), 4)
+
+    def test_delete_by_ids(self):
+        detail_url = reverse('purchase-order-id', args=[self.order_ids[0]])
+        self.client.get(detail_url)
+        response = self.client.post(self.url, {'ids': self.order_ids[:3] + [9999]}, format='json')
+        self.assertEqual(response.data, {'dry_run': False, 'orders': 3, 'line_items': 6})
+        self.assertEqual(list(PurchaseOrder.objects.values_list('id', flat=True)), self.order_ids[3:])
+        self.assertEqual(LineItem.objects.count(), 2)
+        self.assertEqual(LineItemSearchEntry.objects.count(), 2)
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertRollupsMatchRebuild()
+        self.assertEqual(SupplierDayRollup.objects.get().order_count, 1)
+
+    def test_delete_by_filter(self):
+        acme = Supplier.objects.get(name='Acme').id
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.post(self.url, {'filter': {'supplier_id': acme, 'order_time__gte': since}}, format='json')
+        self.assertEqual(response.data['orders'], 1)
+        self.assertEqual(sorted(PurchaseOrder.objects.values_list('id', flat=True)), self.order_ids[:3])
+        self.assertRollupsMatchRebuild()
+
+    def test_one_delete_per_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            deleted = deletion.delete_orders(PurchaseOrder.objects.all())
+        self.assertEqual(deleted, deletion.Deleted(4, 8))
+        statements = [query['sql'] for query in queries]
+        for table in ('ShopAPI_lineitemsearchentry', 'ShopAPI_lineitem', 'ShopAPI_purchaseorder'):
+            self.assertEqual(sum(sql.startswith(f'DELETE FROM "{table}"') for sql in statements), 1, table)
+        # Line items are aggregated, never loaded row by row.
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT "ShopAPI_lineitem"."id"')])
+        self.assertFalse(PurchaseOrder.objects.exists())
+        self.assertFalse(SupplierDayRollup.objects.exists())
+        self.assertFalse(TaxDayRollup.objects.exists())
+
+    def test_invalid_requests(self):
+        for payload in ({}, {'ids': [1], 'filter': {'id__gte': 1}}, {'filter': {}}, {'ids': []}):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+        self.assertEqual(PurchaseOrder.objects.count(), 4)
+
+
+class OrderNumberAllocationTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Test Supplier', email='test@test.com')
+
+    def test_sequence_starts_after_existing_order_numbers(self):
+        PurchaseOrder.objects.create(supplier=self.supplier, order_number=41, total_quantity=0, total_amount=0, total_tax=0)
+        purchase_order = PurchaseOrder.objects.create(supplier=self.supplier, total_quantity=0, total_amount=0, total_tax=0)
+        self.assertEqual(purchase_order.order_number, 42)
+
+    def test_batch_allocation_returns_disjoint_ranges(self):
+        first = allocate_order_numbers(100)
+        second = allocate_order_numbers(5)
+        self.assertEqual(list(first), list(range(1, 101)))
+        self.assertEqual(list(second), list(range(101, 106)))
+        purchase_order = PurchaseOrder.objects.create(supplier=self.supplier, total_quantity=0, total_amount=0, total_tax=0)
+        self.assertEqual(purchase_order.order_number, 106)
+
+
+class MigrateTestCase(SimpleTestCase):
+    def test_migrate_empty_database(self):
+        database = os.path.join(temporary_directory(self), 'db.sqlite3')
+        environ = dict(os.environ, SQLITE_PATH=database)
+        result = subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], env=environ, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with closing(sqlite3.connect(database)) as db:
+            indexes = {name for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ShopAPI_purchaseorder'")}
+        self.assertTrue({index.name for index in PurchaseOrder._meta.indexes} <= indexes)
+
+    def test_upgrade_baseline_database(self):
+        # A database of the original schema, with rows and no search entries.
+        database = os.path.join(temporary_directory(self), 'db.sqlite3')
+        environ = dict(os.environ, SQLITE_PATH=database)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', 'ShopAPI', '0001', '-v', '0'], env=environ, cwd=settings.BASE_DIR, check=True)
+        with closing(sqlite3.connect(database)) as db, db:
+            db.execute("INSERT INTO ShopAPI_supplier (id, name, email) VALUES (1, 'Acme', 'acme@test.com')")
+            db.execute("INSERT INTO ShopAPI_purchaseorder (id, supplier_id, order_time, order_number, total_quantity, total_amount, total_tax) VALUES (1, 1, '2025-06-01 00:00:00', 7, 1, 10.5, 0.5)")
+            db.execute("INSERT INTO ShopAPI_lineitem (item_name, quantity, price_without_tax, tax_name, tax_amount, line_total, purchase_order_id) VALUES ('Widget', 1, 10, 'GST 5%', 0.5, 10.5, 1)")
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], env=environ, cwd=settings.BASE_DIR, check=True)
+        with closing(sqlite3.connect(database)) as db:
+            self.assertEqual(db.execute('SELECT version FROM ShopAPI_purchaseorder').fetchall(), [(1,)])
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM ShopAPI_lineitemsearchentry').fetchone(), (1,))
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM ShopAPI_suppliersearchentry').fetchone(), (1,))
+
+
+class OrderNumberConcurrencyTestCase(SimpleTestCase):
+    def test_concurrent_allocation_has_no_duplicates(self):
+        # Separate processes on a SQLite file, since the in-memory test
+        # database locks tables across threads.
+        database = os.path.join(temporary_directory(self), 'db.sqlite3')
+        environ = dict(os.environ, SQLITE_PATH=database)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], env=environ, cwd=settings.BASE_DIR, check=True)
+        jobs = [(database, 20, 5, 10)] * 4
+        with multiprocessing.get_context('spawn').Pool(len(jobs)) as pool:
+            results = pool.map(bench_order_numbers._worker, jobs)
+
+        order_numbers = [number for result in results for number in result]
+        self.assertEqual(len(order_numbers), 4 * (20 + 5 * 10))
+        self.assertEqual(len(set(order_numbers)), len(order_numbers))
+
+
+class CalculateTotalsTestCase(TestCase):
+    def test_totals_are_exact_decimals(self):
+        line_items_data = [
+            {"quantity": 1, "price_without_tax": Decimal("0.10"), "tax_amount": Decimal("0.20")},
+            {"quantity": 7, "price_without_tax": Decimal("19.99"), "tax_amount": Decimal("1.01")},
+        ]
+        totals = calculate_totals(line_items_data)
+
+        self.assertEqual(totals.line_totals, [Decimal("0.30"), Decimal("147.00")])
+        self.assertEqual(totals.total_quantity, 8)
+        self.assertEqual(totals.total_amount, Decimal("147.30"))
+        self.assertEqual(totals.total_tax, Decimal("7.27"))
+
+    def test_empty_order(self):
+        totals = calculate_totals([])
+        self.assertEqual(totals.line_totals, [])
+        self.assertEqual(totals.total_quantity, 0)
+        self.assertEqual(totals.total_amount, Decimal("0.00"))
+        self.assertEqual(totals.total_tax, Decimal("0.00"))
+
+
+class CountingLocMemCacheTestCase(TestCase):
+    def test_evictions_are_counted(self):
+        cache = LocMemCache('test-evictions', {'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 1}})
+        cache.clear()
+        stats = cache_stats('test-evictions')
+        stats.reset()
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(stats.evictions, 2)
+
+        cache.set('expiring', 1, timeout=-1)
+        self.assertIsNone(cache.get('expiring'))
+        self.assertEqual(stats.evictions, 3)
+
+
+class PurchaseOrderSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('purchase-order')
+        self.order_ids = {}
+        for supplier_name, item_names in (
+            ('Acme Corporation', ['Blue Widget', 'Red Widget', 'Widget Stand']),
+            ('Globex', ['Gadget']),
+            ('Acme Tools', ['Hammer']),
+        ):
+            line_items = [line_item(item_name, 1, '1.00', tax_amount='0.05') for item_name in item_names]
+            self.order_ids[supplier_name] = create_order(self, supplier_name, *line_items)
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(order['id'] for order in response.data['results'])
+
+    def test_contains_matches_substrings_once_per_order(self):
+        self.assertEqual(self.search(item_name='widget'), [self.order_ids['Acme Corporation']])
+        self.assertEqual(self.search(item_name='ADGE'), [self.order_ids['Globex']])
+        self.assertEqual(self.search(supplier_name='cme'), sorted([self.order_ids['Acme Corporation'], self.order_ids['Acme Tools']]))
+        self.assertEqual(self.search(supplier_name='me'), sorted([self.order_ids['Acme Corporation'], self.order_ids['Acme Tools']]))
+        # Every trigram of the query is present, but not as one substring.
+        self.assertEqual(self.search(item_name='widget blue'), [])
+
+    def test_prefix_and_exact_modes(self):
+        self.assertEqual(self.search(item_name='wid', match='prefix'), [self.order_ids['Acme Corporation']])
+        self.assertEqual(self.search(item_name='idget', match='prefix'), [])
+        self.assertEqual(self.search(supplier_name='acme t', match='prefix'), [self.order_ids['Acme Tools']])
+        self.assertEqual(self.search(supplier_name='ACME TOOLS', match='exact'), [self.order_ids['Acme Tools']])
+        self.assertEqual(self.search(supplier_name='acme', match='exact'), [])
+
+    def test_index_follows_updates(self):
+        order_id = self.order_ids['Globex']
+        line_item = LineItem.objects.get(purchase_order_id=order_id)
+        payload = {
+            "supplier": {"id": line_item.purchase_order.supplier_id, "name": "Initech", "email": "test@test.com"},
+            "line_items": [
+                {"id": line_item.id, "item_name": "Stapler", "quantity": 1, "price_without_tax": "1.00", "tax_name": "GST 5%", "tax_amount": "0.05"},
+            ]
+        }
+        self.client.put(reverse('purchase-order-id', kwargs={'id': order_id}), payload, format='json')
+        self.assertEqual(self.search(item_name='stapler'), [order_id])
+        self.assertEqual(self.search(item_name='gadget'), [])
+        self.assertEqual(self.search(supplier_name='initech', match='exact'), [order_id])
+
+    def test_orm_writes_are_indexed(self):
+        supplier = Supplier.objects.create(name='Umbrella', email='test@test.com')
+        purchase_order = PurchaseOrder.objects.create(supplier=supplier, total_quantity=1, total_amount=1.05, total_tax=0.05)
+        line_item = LineItem.objects.create(purchase_order=purchase_order, item_name='Umbrella Stand', quantity=1, price_without_tax=1.00, tax_name='GST 5%', tax_amount=0.05)
+        self.assertEqual(self.search(supplier_name='umbrella'), [purchase_order.id])
+        self.assertEqual(self.search(item_name='stand'), sorted([self.order_ids['Acme Corporation'], purchase_order.id]))
+
+        supplier.name = 'Initech'
+        supplier.save()
+        line_item.item_name = 'Stapler'
+        line_item.save()
+        self.assertEqual(self.search(supplier_name='umbrella'), [])
+        self.assertEqual(self.search(supplier_name='initech', match='exact'), [purchase_order.id])
+        self.assertEqual(self.search(item_name='stapler'), [purchase_order.id])
+        line_item.delete()
+        self.assertEqual(self.search(item_name='stapler'), [])
+
+    def test_missing_entries_are_indexed(self):
+        # Rows from before the index, or written without signals.
+        LineItemSearchEntry.objects.all().delete()
+        SupplierSearchEntry.objects.filter(supplier__name='Globex').delete()
+        self.assertEqual(self.search(supplier_name='globex'), [])
+        self.assertEqual(search.index_missing(), (1, 3))
+        self.assertEqual(self.search(supplier_name='globex'), [self.order_ids['Globex']])
+        self.assertEqual(self.search(item_name='hammer'), [self.order_ids['Acme Tools']])
+        self.assertEqual(search.index_missing(), (0, 0))
+
+    def test_rebuild_search_index(self):
+        LineItemSearchEntry.objects.all().delete()
+        self.assertEqual(self.search(item_name='stand'), [])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search(item_name='stand'), [self.order_ids['Acme Corporation']])
+
+    def test_invalid_match_mode(self):
+        response = self.client.get(self.url, {'item_name': 'widget', 'match': 'fuzzy'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class OrderListFilterTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('purchase-order')
+        self.order_ids = [
+            create_order(self, supplier_name, line_item('Widget', 1, price, 'None', '0.00'))
+            for supplier_name, price in (('Acme', '10.00'), ('Acme', '20.00'), ('Globex', '30.00'))
+        ]
+        self.last_week = timezone.now() - timedelta(days=7)
+        PurchaseOrder.objects.filter(id=self.order_ids[0]).update(order_time=self.last_week)
+        self.acme = Supplier.objects.get(name='Acme').id
+
+    def filter(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [order['id'] for order in response.data['results']]
+
+    def test_filters(self):
+        yesterday = (timezone.now() - timedelta(days=1)).isoformat()
+        self.assertEqual(self.filter(supplier_id=self.acme), self.order_ids[:2])
+        self.assertEqual(self.filter(order_time__gte=yesterday), self.order_ids[1:])
+        self.assertEqual(self.filter(order_time__lt=yesterday), self.order_ids[:1])
+        self.assertEqual(self.filter(supplier_id=self.acme, order_time__gte=yesterday), self.order_ids[1:2])
+        self.assertEqual(self.filter(total_amount__gte='20', total_amount__lte='30.00'), self.order_ids[1:])
+        self.assertEqual(self.filter(total_amount__lte='9.99'), [])
+        self.assertEqual(self.filter(supplier_id=self.acme, item_name='widget'), self.order_ids[:2])
+
+    def test_invalid_filters(self):
+        for params in ({'supplier_id': 'acme'}, {'order_time__gte': 'last week'}, {'total_amount__gte': 'x'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_query_plans_use_the_indexes(self):
+        supplier_time, time_id, amount = (index.name for index in PurchaseOrder._meta.indexes)
+        since = timezone.now() - timedelta(days=1)
+        cases = [
+            ({'supplier_id': self.acme}, supplier_time),
+            ({'supplier_id': self.acme, 'order_time__gte': since}, supplier_time),
+            ({'order_time__gte': self.last_week, 'order_time__lt': since}, time_id),
+            ({'total_amount__gte': 10, 'total_amount__lte': 20}, amount),
+        ]
+        for filters, index_name in cases:
+            # The query of the first list page.
+            plan = PurchaseOrder.objects.filter(**filters).order_by('order_number')[:11].explain()
+            self.assertIn(f'USING INDEX {index_name}', plan, filters)
+
+
+class PurchaseOrderBatchViewTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('purchase-order-batch')
+
+    def test_create_batch(self):
+        existing = Supplier.objects.create(name='Acme', email='test@test.com')
+        payload = [order_payload('Acme'), order_payload('Globex', line_item(quantity=2)), order_payload('Globex', line_item('Gadget'))]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 201])
+        self.assertEqual(Supplier.objects.count(), 2)
+        self.assertEqual(PurchaseOrder.objects.filter(supplier=existing).count(), 1)
+        order_numbers = list(PurchaseOrder.objects.order_by('id').values_list('order_number', flat=True))
+        self.assertEqual(order_numbers, [order_numbers[0], order_numbers[0] + 1, order_numbers[0] + 2])
+        second = PurchaseOrder.objects.get(id=response.data['results'][1]['data']['id'])
+        self.assertEqual(second.total_amount, Decimal('21.00'))
+        self.assertEqual(LineItem.objects.count(), 3)
+        search = self.client.get(reverse('purchase-order'), {'item_name': 'gadget'})
+        self.assertEqual([order['id'] for order in search.data['results']], [response.data['results'][2]['data']['id']])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, [order_payload()], format='json')
+        query_counts = []
+        for count in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, [order_payload() for _ in range(count)], format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_atomic_batch_fails_as_a_whole(self):
+        payload = [order_payload(), {"supplier": {"name": "No lines"}}, order_payload()]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], [424, 400, 424])
+        self.assertIn('line_items', response.data['results'][1]['errors'])
+        self.assertEqual(PurchaseOrder.objects.count(), 0)
+        self.assertEqual(Supplier.objects.count(), 0)
+
+    def test_partial_batch(self):
+        payload = [order_payload(), order_payload(), {"supplier": {"id": 999, "name": "Missing", "email": "test@test.com"}, "line_items": []}]
+        response = self.client.post(f'{self.url}?mode=partial', payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['results'][2]['errors'], {'supplier': {'id': ['Supplier not found.']}})
+        self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+    def test_supplier_given_by_id_is_updated(self):
+        supplier = Supplier.objects.create(name='Old Name', email='test@test.com')
+        payload = order_payload()
+        payload['supplier'] = {"id": supplier.id, "name": "New Name", "email": "new@test.com"}
+        response = self.client.post(self.url, [payload], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        supplier.refresh_from_db()
+        self.assertEqual((supplier.name, supplier.email), ('New Name', 'new@test.com'))
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(order_payload('Test Supplier', line_item(f'Item {i}'))) for i in range(3)) + '\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PurchaseOrder.objects.count(), 3)
+
+        response = self.client.post(self.url, '{"supplier": \n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_batches(self):
+        self.assertEqual(self.client.post(self.url, order_payload(), format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f'{self.url}?mode=eventually', [order_payload()], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SupplierResolutionTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Acme', email='acme@test.com')
+        self.supplier_id = self.supplier.id
+        self.purchase_order = PurchaseOrder.objects.create(supplier=self.supplier, total_quantity=1, total_amount=10.50, total_tax=0.50)
+
+    def test_lookups_take_one_query(self):
+        with self.assertNumQueries(1):
+            found = suppliers.bulk_upsert([{"name": "Acme", "email": "acme@test.com"}, {"id": self.supplier_id, "name": "Acme", "email": "acme@test.com"}])
+        self.assertEqual([supplier.id for supplier in found], [self.supplier_id, self.supplier_id])
+
+    def test_unchanged_supplier_is_not_written(self):
+        version = self.purchase_order.version
+        with CaptureQueriesContext(connection) as queries:
+            suppliers.upsert_supplier({"id": self.supplier_id, "name": "Acme", "email": "acme@test.com"})
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        self.purchase_order.refresh_from_db()
+        self.assertEqual(self.purchase_order.version, version)
+
+    def test_changed_supplier_is_written_and_orders_touched(self):
+        version = self.purchase_order.version
+        suppliers.upsert_supplier({"id": self.supplier_id, "name": "Acme Ltd", "email": "acme@test.com"})
+        self.supplier.refresh_from_db()
+        self.purchase_order.refresh_from_db()
+        self.assertEqual(self.supplier.name, 'Acme Ltd')
+        self.assertEqual(self.purchase_order.version, version + 1)
+
+        # The old name and email no longer resolve to the renamed supplier.
+        supplier = suppliers.upsert_supplier({"name": "Acme", "email": "acme@test.com"})
+        self.assertNotEqual(supplier.id, self.supplier_id)
+        self.assertEqual(Supplier.objects.count(), 2)
+
+    def test_writes_made_elsewhere_are_seen(self):
+        payload = {"id": self.supplier_id, "name": "Acme", "email": "acme@test.com"}
+        suppliers.upsert_supplier(payload)
+        # Queryset updates send no signals; the next upsert still writes.
+        Supplier.objects.filter(id=self.supplier_id).update(name='Renamed')
+        suppliers.upsert_supplier(payload)
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.name, 'Acme')
+
+        self.supplier.delete()
+        self.assertEqual(suppliers.bulk_upsert([payload]), [None])
+
+    def test_duplicates_in_one_upsert_are_created_once(self):
+        payload = {"name": "Globex", "email": "globex@test.com"}
+        found = suppliers.bulk_upsert([payload, dict(payload), {"id": 999, "name": "Missing", "email": "x@test.com"}])
+        self.assertEqual(found[0].id, found[1].id)
+        self.assertIsNone(found[2])
+        self.assertEqual(Supplier.objects.filter(name='Globex').count(), 1)
+
+    def test_unknown_supplier_id_is_rejected(self):
+        payload = {
+            "supplier": {"id": 999, "name": "Missing", "email": "x@test.com"},
+            "line_items": [{"item_name": "Test Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"}]
+        }
+        response = APIClient().post(reverse('purchase-order'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+
+class OrderReportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-report')
+
+    def report(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [dict(row) for row in response.data['results']]
+
+    def test_totals_follow_writes(self):
+        acme = create_order(self, 'Acme', line_item('Item', 1), line_item('Item', 2, tax_name='VAT'))
+        create_order(self, 'Acme', line_item('Item', 1))
+        globex = create_order(self, 'Globex', line_item('Item', 4, tax_name='VAT'))
+        today = str(timezone.localdate())
+
+        self.assertEqual(self.report(), [{'day': today, 'order_count': 3, 'total_quantity': 8, 'total_amount': '84.00', 'total_tax': '4.00'}])
+        by_supplier = self.report(group_by='supplier')
+        self.assertEqual([(row['supplier_name'], row['order_count'], row['total_amount']) for row in by_supplier], [('Acme', 2, '42.00'), ('Globex', 1, '42.00')])
+        by_tax = self.report(group_by='tax_name,day')
+        self.assertEqual([(row['tax_name'], row['order_count'], row['total_quantity'], row['total_tax']) for row in by_tax], [('GST 5%', 2, 2, '1.00'), ('VAT', 2, 6, '3.00')])
+
+        order = PurchaseOrder.objects.get(id=acme)
+        vat_line_item = order.line_items.get(tax_name='VAT')
+        payload = {
+            "supplier": {"id": order.supplier_id, "name": "Acme", "email": "test@test.com"},
+            "line_items": [{"id": vat_line_item.id, "item_name": "Item", "quantity": 3, "price_without_tax": "10.00", "tax_name": "VAT", "tax_amount": "0.50"}]
+        }
+        self.client.put(reverse('purchase-order-id', kwargs={'id': acme}), payload, format='json')
+        self.client.delete(reverse('purchase-order-id', kwargs={'id': globex}))
+
+        by_tax = self.report(group_by='tax_name')
+        self.assertEqual([(row['tax_name'], row['order_count'], row['total_quantity']) for row in by_tax], [('GST 5%', 1, 1), ('VAT', 1, 3)])
+        self.assertEqual([(row['supplier_name'], row['order_count'], row['total_amount']) for row in self.report(group_by='supplier')], [('Acme', 2, '42.00')])
+
+        incremental = self.report(group_by='supplier,day'), self.report(group_by='tax_name,day')
+        call_command('rebuild_order_rollups', stdout=io.StringIO())
+        self.assertEqual((self.report(group_by='supplier,day'), self.report(group_by='tax_name,day')), incremental)
+
+    def test_batch_create_and_date_range(self):
+        orders = [
+            {"supplier": {"name": name, "email": "test@test.com"}, "line_items": [{"item_name": "Item", "quantity": 1, "price_without_tax": "10.00", "tax_name": "VAT", "tax_amount": "0.50"}]}
+            for name in ('Acme', 'Acme', 'Globex')
+        ]
+        self.client.post(reverse('purchase-order-batch'), orders, format='json')
+        today = timezone.localdate()
+        self.assertEqual(self.report(start=str(today), end=str(today))[0]['order_count'], 3)
+        self.assertEqual(self.report(end=str(today - timedelta(days=1))), [])
+
+    def test_report_does_not_read_orders(self):
+        create_order(self, 'Acme', line_item('Item', 1, tax_name='VAT'))
+        with CaptureQueriesContext(connection) as queries:
+            self.report(group_by='supplier,day')
+        self.assertFalse([query for query in queries if 'shopapi_lineitem' in query['sql'] or 'shopapi_purchaseorder' in query['sql']])
+
+    def test_invalid_parameters(self):
+        for params in ({'group_by': 'month'}, {'group_by': 'supplier,tax_name'}, {'start': 'yesterday'}, {'start': '2024-02-01', 'end': '2024-01-01'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class FastSerializerParityTestCase(TestCase):
+    def setUp(self):
+        acme = Supplier.objects.create(name='Acme Größe', email='acme@test.com')
+        globex = Supplier.objects.create(name='Globex', email='globex@test.com')
+        for supplier, line_items in ((acme, [(1, '10.00', '0.50'), (3, '0.10', '0.00')]), (globex, []), (acme, [(250, '99999.99', '12.34')])):
+            purchase_order = PurchaseOrder.objects.create(supplier=supplier, total_quantity=0, total_amount=0, total_tax=0)
+            for quantity, price, tax in line_items:
+                LineItem.objects.create(purchase_order=purchase_order, item_name='Item "quoted" ✓', quantity=quantity, price_without_tax=Decimal(price), tax_name='GST 5%', tax_amount=Decimal(tax))
+
+    def assertParity(self, queryset):
+        reference = PurchaseOrderSerializer(queryset.with_related(), many=True).data
+        fast = serialize_orders(queryset.select_related('supplier'))
+        self.assertEqual(json.dumps(fast), json.dumps(reference))
+
+    def test_matches_drf_serializer(self):
+        self.assertParity(PurchaseOrder.objects.order_by('order_number'))
+        self.assertParity(PurchaseOrder.objects.order_by('-order_number'))
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_matches_drf_serializer_in_other_time_zone(self):
+        self.assertParity(PurchaseOrder.objects.order_by('order_number'))
+
+    def test_line_items_are_loaded_in_one_query(self):
+        with self.assertNumQueries(2):
+            data = serialize_orders(PurchaseOrder.objects.select_related('supplier'))
+        self.assertEqual([len(order['line_items']) for order in data], [2, 0, 1])
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        order_cache.clear()
+        self.client = APIClient()
+        for _ in range(3):
+            create_order(self, 'Acme', line_item('Widget', 2), email='acme@test.com')
+        self.order_id = PurchaseOrder.objects.order_by('id').first().id
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_header_only_list_skips_relations(self):
+        data, queries = self.get(reverse('purchase-order'), include='')
+        self.assertEqual(list(data['results'][0]), ['id', 'order_number', 'order_time', 'total_amount', 'total_quantity', 'total_tax'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('ShopAPI_supplier', queries[0])
+
+    def test_fields_select_only_their_columns(self):
+        data, queries = self.get(reverse('purchase-order'), fields='total_amount,supplier')
+        self.assertEqual(data['results'][0], {'id': self.order_id, 'supplier': {'id': Supplier.objects.get().id, 'name': 'Acme', 'email': 'acme@test.com'}, 'total_amount': '21.00'})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ShopAPI_supplier', queries[0])
+        self.assertNotIn('total_tax', queries[0])
+
+    def test_include_line_items_matches_full_response(self):
+        full, _ = self.get(reverse('purchase-order'))
+        data, queries = self.get(reverse('purchase-order'), include='line_items')
+        self.assertEqual(data['results'], [{key: value for key, value in order.items() if key != 'supplier'} for order in full['results']])
+        self.assertEqual(len(queries), 2)
+
+    def test_detail(self):
+        url = reverse('purchase-order-id', args=[self.order_id])
+        data, queries = self.get(url, fields='order_number,line_items')
+        self.assertEqual(list(data), ['id', 'order_number', 'line_items'])
+        self.assertEqual(data['line_items'][0]['line_total'], '21.00')
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(self.client.get(reverse('purchase-order-id', args=[0]), {'include': ''}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_etag_depends_on_fieldset(self):
+        url = reverse('purchase-order-id', args=[self.order_id])
+        full = self.client.get(url)
+        sparse = self.client.get(url, {'fields': 'total_amount'})
+        self.assertNotEqual(sparse['ETag'], full['ETag'])
+        self.assertEqual(self.client.get(url, {'include': 'supplier,line_items'})['ETag'], full['ETag'])
+
+        response = self.client.get(url, {'fields': 'total_amount'}, HTTP_IF_NONE_MATCH=full['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'id': self.order_id, 'total_amount': '21.00'})
+        response = self.client.get(url, {'fields': 'total_amount'}, HTTP_IF_NONE_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Writes only compare the version, whatever fieldset the ETag came from.
+        line_item = LineItem.objects.get(purchase_order_id=self.order_id)
+        payload = {
+            "supplier": {"id": line_item.purchase_order.supplier_id, "name": "Acme", "email": "acme@test.com"},
+            "line_items": [{"id": line_item.id, "item_name": "Widget", "quantity": 3, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"}]
+        }
+        response = self.client.put(url, payload, format='json', HTTP_IF_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.delete(url, HTTP_IF_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_stream(self):
+        response = self.client.get(reverse('purchase-order'), {'stream': 'ndjson', 'fields': 'total_quantity'})
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0]), {'id': self.order_id, 'total_quantity': 2})
+
+    def test_unknown_fields(self):
+        response = self.client.get(reverse('purchase-order'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Unknown fields: secret.', response.json()['fields'])
+        response = self.client.get(reverse('purchase-order-id', args=[self.order_id]), {'include': 'total_tax'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastJSONRendererTestCase(TestCase):
+    data = {
+        'id': 1,
+        'name': 'Größe "quoted" \u2028 ✓',
+        'total_amount': Decimal('10.50'),
+        'order_time': datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=dt_timezone.utc),
+        'day': date(2024, 1, 2),
+        'line_items': ReturnList([OrderedDict(id=2, quantity=3, tax_amount=Decimal('0.05'))], serializer=None),
+        'missing': None,
+        'flags': (True, False),
+        7: 'non-string key',
+    }
+
+    def test_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(StdlibJSONRenderer().render(self.data), expected)
+
+    def test_indented_output_matches_drf_renderer(self):
+        context = {'indent': 4}
+        self.assertEqual(FastJSONRenderer().render(self.data, renderer_context=context), JSONRenderer().render(self.data, renderer_context=context))
+
+    @override_settings(SHOP_JSON_DECIMALS='string')
+    def test_decimals_as_strings(self):
+        for use_orjson in (True, False):
+            self.assertEqual(json.loads(encode_json(self.data, use_orjson=use_orjson))['total_amount'], '10.50')
+
+    def test_fragments(self):
+        cached = encode_json({'id': 5, 'total_amount': Decimal('1.10')})
+        data = {'results': [Fragment(cached), {'id': 6}], 'trap': '\x00not-a-fragment:0\x00'}
+        for use_orjson in (True, False):
+            decoded = json.loads(encode_json(data, use_orjson=use_orjson))
+            self.assertEqual(decoded['results'], [{'id': 5, 'total_amount': 1.1}, {'id': 6}])
+            self.assertEqual(decoded['trap'], '\x00not-a-fragment:0\x00')
+        self.assertEqual(FastJSONRenderer().render(Fragment(cached)), cached)
+
+    def test_api_responses_use_renderer(self):
+        response = APIClient().get(reverse('purchase-order'))
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+
+
+class SQLitePragmaTestCase(SimpleTestCase):
+    """The backend of DATABASE_PROFILE=production, on a connection of its own."""
+
+    def setUp(self):
+        from ShopAPI.backends.sqlite3.base import DatabaseWrapper
+
+        directory = temporary_directory(self)
+        self.connection = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'ShopAPI.backends.sqlite3',
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+            'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS,
+            'TEST': {},
+        }, alias='production')
+        connections['production'] = self.connection
+        self.addCleanup(connections.__delitem__, 'production')
+        self.addCleanup(self.connection.close)
+
+    def test_pragmas_applied_on_connect(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_atomic_begins_immediate_transaction(self):
+        with CaptureQueriesContext(self.connection) as queries:
+            with transaction.atomic(using='production'):
+                pass
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        authentication.clear()
+        cache_stats(authentication.TOKEN_CACHE).reset()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('purchase-order')
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_second_request_skips_the_token_query(self):
+        response, queries = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('authtoken_token' in sql for sql in queries))
+        response, queries = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in sql for sql in queries))
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertEqual(response.wsgi_request.auth, self.token)
+        stats = cache_stats(authentication.TOKEN_CACHE).as_dict()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_entries_hold_no_secrets(self):
+        self.get()
+        entry = caches[authentication.TOKEN_CACHE].get(authentication._key(self.token.key))
+        self.assertNotIn(self.token.key, repr(entry))
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_deactivation_during_a_miss_is_not_cached(self):
+        # A request reads the token, the user is deactivated, then the request
+        # caches what it read.
+        cache = caches[authentication.TOKEN_CACHE]
+        generation = cache.get(authentication._generation_key(self.token.key))
+        token = Token.objects.select_related('user').get(key=self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        cache.set(authentication._key(self.token.key), authentication._entry(token, generation))
+
+        response, queries = self.get()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(any('authtoken_token' in sql for sql in queries))
+
+    def test_deactivated_user_is_rejected(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['detail'], 'User inactive or deleted.')
+
+    def test_deleted_token_is_rejected(self):
+        self.get()
+        self.token.delete()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['detail'], 'Invalid token.')
+
+    def test_forget_user_after_queryset_update(self):
+        self.get()
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertEqual(self.get()[0].status_code, status.HTTP_200_OK)
+        authentication.forget_user(self.user.id)
+        self.assertEqual(self.get()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.client = APIClient()
+        self.payload = order_payload('Test Supplier', line_item(quantity=2))
+
+    def get_metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_requests_recorded_per_route(self):
+        self.client.post(reverse('purchase-order'), self.payload, format='json')
+        order_id = PurchaseOrder.objects.get().id
+        self.client.get(reverse('purchase-order-id', args=[order_id]))
+        self.client.get(reverse('purchase-order-id', args=[order_id + 1]))
+
+        text = self.get_metrics()
+        route = 'api/purchase/orders/<int:id>/'
+        self.assertIn(f'shop_requests_total{{route="{route}",method="GET",status="200"}} 1', text)
+        self.assertIn(f'shop_requests_total{{route="{route}",method="GET",status="404"}} 1', text)
+        self.assertIn(f'shop_request_duration_seconds_count{{route="{route}",method="GET"}} 2', text)
+        self.assertIn(f'shop_request_duration_seconds_bucket{{route="{route}",method="GET",le="+Inf"}} 2', text)
+        for phase in metrics.PHASES:
+            self.assertIn(f'shop_request_phase_seconds_count{{route="{route}",method="GET",phase="{phase}"}} 2', text)
+        self.assertIn('shop_request_queries_count{route="api/purchase/orders/",method="POST"} 1', text)
+        self.assertIn('shop_cache_events_total{cache="orders",event="misses"}', text)
+
+    def test_query_count_histogram(self):
+        self.client.post(reverse('purchase-order'), self.payload, format='json')
+        order_id = PurchaseOrder.objects.get().id
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('purchase-order-id', args=[order_id]))
+        query_count = len(queries)
+
+        labels = 'route="api/purchase/orders/<int:id>/",method="GET"'
+        self.assertIn(f'shop_request_queries_sum{{{labels}}} {query_count}', self.get_metrics())
+
+    def test_unmatched_routes_share_a_label(self):
+        self.client.get('/no/such/page/')
+        self.client.get('/another/missing/page/')
+        self.assertIn('shop_requests_total{route="unmatched",method="GET",status="404"} 2', self.get_metrics())
+
+    @override_settings(SHOP_SLOW_REQUEST_MS=0)
+    def test_slow_requests_logged_with_queries(self):
+        with self.assertLogs('ShopAPI.metrics', 'WARNING') as logs:
+            self.client.get(reverse('purchase-order'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow request: GET /api/purchase/orders/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class SchemaTestCase(TestCase):
+    def setUp(self):
+        self.path = os.path.join(temporary_directory(self), 'openapi.json')
+        self.addCleanup(schema.clear)
+        schema.clear()
+
+    def build_schema(self, *args):
+        # drf-spectacular prints its warnings to stderr.
+        with override_settings(SHOP_SCHEMA_FILE=self.path), redirect_stderr(io.StringIO()):
+            call_command('build_schema', *args, stdout=io.StringIO())
+
+    def test_serves_the_artifact_with_caching_headers(self):
+        self.build_schema()
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        self.assertIn('/api/purchase/orders/', json.loads(content)['paths'])
+
+        with override_settings(SHOP_SCHEMA_FILE=self.path):
+            response = self.client.get(reverse('schema'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, content)
+            self.assertEqual(response['Content-Type'], schema.CONTENT_TYPE)
+            self.assertEqual(response['ETag'], f'"{schema.version(content)}"')
+            self.assertIn('max-age=3600', response['Cache-Control'])
+            self.assertIn('public', response['Cache-Control'])
+
+            not_modified = self.client.get(reverse('schema'), headers={'If-None-Match': response['ETag']})
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertIn('max-age=3600', not_modified['Cache-Control'])
+            self.assertEqual(self.client.post(reverse('schema')).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_generated_once_without_the_artifact(self):
+        with override_settings(SHOP_SCHEMA_FILE=self.path), redirect_stderr(io.StringIO()):
+            first = self.client.get(reverse('schema'))
+            second = self.client.get(reverse('schema'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], f'"{schema.version(first.content)}"')
+        self.assertIn('/api/purchase/orders/', json.loads(first.content)['paths'])
+
+    def test_stale_artifact_is_regenerated(self):
+        self.build_schema()
+        with open(self.path, 'rb') as file:
+            built = json.loads(file.read())
+        with open(self.path, 'w') as file:
+            json.dump({**built, 'paths': {}, schema.SOURCE_KEY: 'other-code'}, file)
+
+        with override_settings(SHOP_SCHEMA_FILE=self.path), redirect_stderr(io.StringIO()):
+            with self.assertLogs('ShopAPI.schema', 'WARNING') as logs:
+                response = self.client.get(reverse('schema'))
+        self.assertIn('out of date', logs.output[0])
+        served = json.loads(response.content)
+        self.assertEqual(served[schema.SOURCE_KEY], schema.source_version())
+        self.assertIn('/api/purchase/orders/', served['paths'])
+
+    def test_yaml_format(self):
+        self.build_schema()
+        with override_settings(SHOP_SCHEMA_FILE=self.path):
+            response = self.client.get(reverse('schema'), {'format': 'yaml'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi')
+            self.assertIn(b'/api/purchase/orders/:', response.content)
+            self.assertEqual(response['ETag'], f'"{schema.version(response.content)}"')
+            unknown = self.client.get(reverse('schema'), {'format': 'xml'})
+            self.assertEqual(unknown.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_check(self):
+        with self.assertRaisesMessage(CommandError, 'out of date'):
+            self.build_schema('--check')
+        self.build_schema()
+        self.build_schema('--check')
+        with open(self.path, 'ab') as file:
+            file.write(b' ')
+        with self.assertRaisesMessage(CommandError, 'out of date'):
+            self.build_schema('--check')
+
+
+class APIOnlyStartupTestCase(TestCase):
+    def test_leaves_out_the_admin_and_docs(self):
+        script = (
+            'import json\n'
+            'from MainApp.wsgi import application\n'
+            'from django.conf import settings\n'
+            'from django.urls import reverse\n'
+            'from MainApp.urls import urlpatterns\n'
+            'print(json.dumps({\n'
+            '    "apps": settings.INSTALLED_APPS,\n'
+            '    "middleware": settings.MIDDLEWARE,\n'
+            '    "urls": [str(pattern.pattern) for pattern in urlpatterns],\n'
+            '    "orders": reverse("purchase-order"),\n'
+            '}))\n'
+        )
+        environ = dict(os.environ, SHOP_API_ONLY='1', DJANGO_SETTINGS_MODULE='MainApp.settings')
+        output = subprocess.run([sys.executable, '-c', script], env=environ, cwd=settings.BASE_DIR, capture_output=True, check=True, text=True).stdout
+        result = json.loads(output)
+        self.assertNotIn('django.contrib.admin', result['apps'])
+        self.assertNotIn('drf_spectacular', result['apps'])
+        self.assertIn('rest_framework.authtoken', result['apps'])
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', result['middleware'])
+        self.assertEqual(result['urls'], ['api/', 'metrics', 'schema/'])
+        self.assertEqual(result['orders'], '/api/purchase/orders/')
+
+
+class ShopBenchTestCase(TestCase):
+    def setUp(self):
+        order_cache.clear()
+
+    def result(self, **metrics):
+        scenario = {'throughput': 100, 'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries': 3}
+        scenario.update(metrics)
+        return {'parameters': {}, 'scenarios': {'detail': scenario}}
+
+    def test_seed_and_run_scenarios(self):
+        order_ids = benchmarking.seed(suppliers=3, orders=12, lines=2, days=4)
+        self.assertEqual(PurchaseOrder.objects.count(), 12)
+        self.assertEqual(LineItem.objects.count(), 24)
+        self.assertEqual(Supplier.objects.count(), 3)
+        self.assertEqual(PurchaseOrder.objects.dates('order_time', 'day').count(), 4)
+        self.assertEqual(SupplierDayRollup.objects.aggregate(total=Sum('order_count'))['total'], 12)
+
+        bench = benchmarking.Benchmark(order_ids, suppliers=3, lines=2)
+        for scenario in benchmarking.SCENARIOS:
+            result = bench.run(scenario, requests=3, warmup=1)
+            self.assertEqual(result['requests'], 3, scenario)
+            self.assertEqual(result['errors'], 0, scenario)
+            self.assertGreater(result['queries'], 0, scenario)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'], scenario)
+        self.assertEqual(PurchaseOrder.objects.count(), 12)
+
+    def test_compare_flags_regressions(self):
+        rows, regressions = benchmarking.compare(
+            self.result(), self.result(throughput=80, p99_ms=32, queries=4), threshold=10
+        )
+        regressed = {metric for _, metric, _, _, _, flagged in rows if flagged}
+        self.assertEqual(regressed, {'throughput', 'queries'})
+        self.assertEqual(regressions, 2)
+
+    def test_compare_command_fails_on_regression(self):
+        directory = temporary_directory(self)
+        paths = []
+        for name, result in (('baseline', self.result()), ('current', self.result(p95_ms=30))):
+            paths.append(os.path.join(directory, f'{name}.json'))
+            with open(paths[-1], 'w') as file:
+                json.dump(result, file)
+
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 metrics regressed by more than 10%.'):
+            call_command('shopbench', compare=paths, stdout=out)
+        self.assertIn('p95_ms', out.getvalue())
+        call_command('shopbench', compare=paths, threshold=60, stdout=io.StringIO())
+
+
+class ImportOrdersTestCase(TestCase):
+    def setUp(self):
+        order_cache.clear()
+        self.directory = temporary_directory(self)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def import_orders(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_orders', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        orders = [
+            {"supplier": {"name": "Acme", "email": "acme@test.com"}, "order_time": "2024-03-01T10:00:00Z", "line_items": [
+                {"item_name": "Blue Widget", "quantity": 2, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"},
+                {"item_name": "Red Widget", "quantity": 1, "price_without_tax": 4.25, "tax_name": "VAT", "tax_amount": "0.85"},
+            ]},
+            {"supplier": {"name": "Acme", "email": "acme@test.com"}, "line_items": [
+                {"item_name": "Bolt", "quantity": 10, "price_without_tax": "1.00", "tax_name": "GST 5%", "tax_amount": "0.05"},
+            ]},
+        ]
+        path = self.write('orders.ndjson', '\n'.join(json.dumps(order) for order in orders) + '\n\n')
+
+        out, err = self.import_orders(path, batch_size=1)
+        self.assertIn('Imported 2 orders and 3 line items', out)
+        self.assertEqual(err, '')
+
+        self.assertEqual(Supplier.objects.count(), 1)
+        first, second = PurchaseOrder.objects.order_by('id')
+        self.assertEqual(first.order_time, datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual((first.total_quantity, first.total_amount, first.total_tax), (3, Decimal('26.10'), Decimal('1.85')))
+        self.assertEqual(second.order_number, first.order_number + 1)
+        self.assertEqual(second.version, 1)
+        self.assertEqual(sorted(LineItem.objects.values_list('line_total', flat=True)), [Decimal('5.10'), Decimal('10.50'), Decimal('21.00')])
+
+        # Rollups, the search index and the API see the imported orders.
+        response = APIClient().get(reverse('order-report'), {'group_by': 'day'})
+        self.assertEqual([row['day'] for row in response.data['results']], ['2024-03-01', str(timezone.localdate())])
+        response = APIClient().get(reverse('purchase-order'), {'item_name': 'widget'})
+        self.assertEqual([order['id'] for order in response.data['results']], [first.id])
+        detail = APIClient().get(reverse('purchase-order-id', args=[first.id])).data
+        self.assertEqual(detail['total_amount'], '26.10')
+
+    def test_import_csv_groups_rows_by_order_ref(self):
+        path = self.write('orders.csv', (
+            'order_ref,supplier_name,supplier_email,item_name,quantity,price_without_tax,tax_name,tax_amount\n'
+            'A,Acme,acme@test.com,Widget,1,10.00,GST 5%,0.50\n'
+            'A,Ignored,ignored@test.com,Gadget,2,5.00,GST 5%,0.25\n'
+            'B,Globex,globex@test.com,Widget,3,1.00,VAT,0.20\n'
+        ))
+        self.import_orders(path)
+
+        acme, globex = PurchaseOrder.objects.order_by('id')
+        self.assertEqual((acme.supplier.name, acme.line_items.count(), acme.total_amount), ('Acme', 2, Decimal('21.00')))
+        self.assertEqual((globex.supplier.name, globex.line_items.count(), globex.total_amount), ('Globex', 1, Decimal('3.60')))
+        self.assertEqual(Supplier.objects.count(), 2)
+
+    def test_invalid_orders_skipped_and_reported(self):
+        valid = {"supplier": {"name": "Acme", "email": "acme@test.com"}, "line_items": [
+            {"item_name": "Widget", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"}
+        ]}
+        invalid_price = json.loads(json.dumps(valid))
+        invalid_price['line_items'][0]['price_without_tax'] = '1.005'
+        unknown_supplier = dict(valid, supplier={"id": 999, "name": "Acme", "email": "acme@test.com"})
+        lines = [json.dumps(valid), '{not json', json.dumps(invalid_price), json.dumps(unknown_supplier), json.dumps(valid)]
+        path = self.write('orders.ndjson', '\n'.join(lines))
+
+        out, err = self.import_orders(path)
+        self.assertIn('Imported 2 orders', out)
+        self.assertIn('skipped 3 invalid orders', out)
+        self.assertIn('Line 2: JSON parse error', err)
+        self.assertIn('Line 3: price_without_tax: Ensure that there are no more than 2 decimal places.', err)
+        self.assertIn('Line 4: supplier: Supplier not found.', err)
+        self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+    def test_decimal_limits_match_the_api(self):
+        for price in ['123456789', '12345678.9', '99999999.99', '0.05', '1.005', '1E+8', '12345678901']:
+            order = {"supplier": {"name": "Acme", "email": "acme@test.com"}, "line_items": [
+                {"item_name": "Widget", "quantity": 1, "price_without_tax": price, "tax_name": "GST 5%", "tax_amount": "0.50"}
+            ]}
+            serializer = PurchaseOrderMutateSerializer(data=order)
+            try:
+                importing.clean_order(order)
+            except ValueError as error:
+                self.assertFalse(serializer.is_valid(), price)
+                self.assertIn(str(serializer.errors['line_items'][0]['price_without_tax'][0]), str(error))
+            else:
+                self.assertTrue(serializer.is_valid(), (price, serializer.errors))
+
+    def test_strict_stops_at_first_invalid_order(self):
+        valid = {"supplier": {"name": "Acme", "email": "acme@test.com"}, "line_items": [
+            {"item_name": "Widget", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"}
+        ]}
+        invalid = dict(valid, line_items=[])
+        path = self.write('orders.ndjson', '\n'.join(json.dumps(order) for order in [valid, valid, invalid, valid]))
+
+        with self.assertRaisesMessage(CommandError, 'Line 3: line_items: This field is required. Imported 2 orders before it.'):
+            self.import_orders(path, batch_size=2, strict=True)
+        self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+    def test_defer_index_rebuilds_at_the_end(self):
+        order = {"supplier": {"name": "Acme", "email": "acme@test.com"}, "line_items": [
+            {"item_name": "Widget", "quantity": 1, "price_without_tax": "10.00", "tax_name": "GST 5%", "tax_amount": "0.50"}
+        ]}
+        path = self.write('orders.ndjson', json.dumps(order))
+        self.import_orders(path, defer_index=True)
+
+        self.assertEqual(SupplierDayRollup.objects.get().order_count, 1)
+        response = APIClient().get(reverse('purchase-order'), {'item_name': 'widget'})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class OrderExportTestCase(TestCase):
+    def setUp(self):
+        order_cache.clear()
+        self.client = APIClient()
+        self.acme = create_order(self, 'Acme', line_item('Widget, large', 2, '10.00'), line_item('Gadget', 1, '4.25'))
+        self.globex = create_order(self, 'Globex', line_item('Bolt', 10, '1.00'))
+
+    def export(self, **params):
+        response = self.client.get(reverse('purchase-order-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_order_level_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(list(rows[0]), list(exporting.ORDER_COLUMNS))
+        self.assertEqual([(row['order_id'], row['supplier_name'], row['total_quantity'], row['total_amount']) for row in rows], [
+            (str(self.acme), 'Acme', '3', '25.75'),
+            (str(self.globex), 'Globex', '10', '15.00'),
+        ])
+        order = PurchaseOrder.objects.get(id=self.acme)
+        self.assertEqual(datetime.fromisoformat(rows[0]['order_time']), order.order_time)
+
+    def test_line_level_ndjson_keeps_decimals_exact(self):
+        _, content = self.export(level='line', output='ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(row['order_id'], row['supplier_name'], row['item_name'], row['line_total']) for row in rows], [
+            (self.acme, 'Acme', 'Widget, large', '21.00'),
+            (self.acme, 'Acme', 'Gadget', '4.75'),
+            (self.globex, 'Globex', 'Bolt', '15.00'),
+        ])
+
+    def test_columnar_round_trip(self):
+        response, content = self.export(level='line', output='columnar')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        groups = list(exporting.read_columnar(io.BytesIO(content)))
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(list(groups[0]), list(exporting.LINE_COLUMNS))
+        self.assertEqual(groups[0]['item_name'], ['Widget, large', 'Gadget', 'Bolt'])
+        self.assertEqual(groups[0]['price_without_tax'], [Decimal('10.00'), Decimal('4.25'), Decimal('1.00')])
+        order = PurchaseOrder.objects.get(id=self.globex)
+        self.assertEqual(groups[0]['order_time'][2], order.order_time)
+
+    async def test_asgi_streams_asynchronously(self):
+        _, expected = await sync_to_async(self.export)(level='line')
+        response = await AsyncClient().get(reverse('purchase-order-export'), {'level': 'line'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync body would be read into a list before the first byte is sent.
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content, expected)
+
+    def test_incremental_export(self):
+        _, content = self.export(after_id=self.acme, output='ndjson')
+        self.assertEqual([json.loads(line)['order_id'] for line in content.splitlines()], [self.globex])
+
+        since = timezone.now()
+        PurchaseOrder.objects.filter(id=self.acme).touch()
+        _, content = self.export(since=since.isoformat(), output='ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(row['order_id'], row['version']) for row in rows], [(self.acme, 2)])
+
+    def test_pages_of_orders(self):
+        chunks = list(exporting.iter_rows('line', chunk_size=1))
+        self.assertEqual([len(rows) for rows in chunks], [2, 1])
+        with self.assertNumQueries(2):
+            next(exporting.iter_rows('line', chunk_size=1))
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('purchase-order-export'), {'output': 'xml'}, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('output', response.json())
+
+    def test_export_orders_command(self):
+        path = os.path.join(temporary_directory(self), 'lines.shopcol')
+        err = io.StringIO()
+        call_command('export_orders', path, level='line', after_id=self.acme, stderr=err)
+        self.assertIn('Exported 1 orders as 1 rows', err.getvalue())
+        self.assertIn(f'continue after order id {self.globex}.', err.getvalue())
+        with open(path, 'rb') as file:
+            groups = list(exporting.read_columnar(file))
+        self.assertEqual([group['order_id'] for group in groups], [[self.globex]])
+
+
+class async_urlconf:
+    urlpatterns = [path('api/', include(build_urlpatterns(async_views=True)))]
+
+
+@override_settings(ROOT_URLCONF=async_urlconf)
+class AsyncPurchaseOrderViewTestCase(TestCase):
+    def setUp(self):
+        self.client = AsyncClient()
+        order_cache.clear()
+        self.payload = order_payload('Test Supplier', line_item(quantity=2))
+
+    async def create_order(self):
+        response = await self.client.post(reverse('purchase-order'), self.payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()['data']['id']
+
+    async def test_create_and_retrieve(self):
+        order_id = await self.create_order()
+        url = reverse('purchase-order-id', kwargs={'id': order_id})
+        response = await self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.json()['total_amount']), Decimal('21.00'))
+
+        not_modified = await self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_matches_sync_views(self):
+        order_id = await self.create_order()
+        async_response = await self.client.get(reverse('purchase-order'))
+        with override_settings(ROOT_URLCONF='MainApp.urls'):
+            sync_response = await self.client.get(reverse('purchase-order'))
+            sync_detail = await self.client.get(reverse('purchase-order-id', kwargs={'id': order_id}))
+        self.assertEqual(async_response.json(), sync_response.json())
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+
+        async_detail = await self.client.get(reverse('purchase-order-id', kwargs={'id': order_id}))
+        self.assertEqual(async_detail.json(), sync_detail.json())
+
+    async def test_sparse_fieldsets_match_sync_views(self):
+        order_id = await self.create_order()
+        detail_url = reverse('purchase-order-id', kwargs={'id': order_id})
+        params = {'fields': 'total_amount', 'include': 'supplier'}
+        async_list = await self.client.get(reverse('purchase-order'), params)
+        async_detail = await self.client.get(detail_url, params)
+        with override_settings(ROOT_URLCONF='MainApp.urls'):
+            sync_list = await self.client.get(reverse('purchase-order'), params)
+            sync_detail = await self.client.get(detail_url, params)
+        self.assertEqual(async_list.json(), sync_list.json())
+        self.assertEqual(async_detail.json(), sync_detail.json())
+        self.assertEqual(async_detail['ETag'], sync_detail['ETag'])
+        self.assertEqual(list(async_detail.json()), ['id', 'supplier', 'total_amount'])
+        full = await self.client.get(detail_url)
+        self.assertNotEqual(async_detail['ETag'], full['ETag'])
+        response = await self.client.get(detail_url, params, headers={'If-None-Match': full['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_filters_match_sync_views(self):
+        await self.create_order()
+        supplier_id = (await PurchaseOrder.objects.afirst()).supplier_id
+        for params in ({'supplier_id': supplier_id, 'total_amount__gte': '21.00'}, {'supplier_id': supplier_id + 1}, {'order_time__lt': 'never'}):
+            async_response = await self.client.get(reverse('purchase-order'), params)
+            with override_settings(ROOT_URLCONF='MainApp.urls'):
+                sync_response = await self.client.get(reverse('purchase-order'), params)
+            self.assertEqual(async_response.status_code, sync_response.status_code)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+    async def test_stream(self):
+        await self.create_order()
+        response = await self.client.get(reverse('purchase-order'), {'stream': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['total_quantity'], 2)
+
+    async def test_update_and_delete(self):
+        order_id = await self.create_order()
+        url = reverse('purchase-order-id', kwargs={'id': order_id})
+        etag = (await self.client.get(url))['ETag']
+        line_item = await LineItem.objects.aget(purchase_order_id=order_id)
+        supplier_id = (await PurchaseOrder.objects.aget(id=order_id)).supplier_id
+        payload = {
+            "supplier": {"id": supplier_id, "name": "Test Supplier", "email": "test@test.com"},
+            "line_items": [dict(self.payload['line_items'][0], id=line_item.id, quantity=3)]
+        }
+        response = await self.client.put(url, payload, content_type='application/json', headers={'If-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = await self.client.delete(url, headers={'If-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = await self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await PurchaseOrder.objects.filter(id=order_id).aexists())
+        self.assertEqual((await self.client.get(url)).status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_cached_token(self):
+        user = await User.objects.acreate(username='alice')
+        token = await Token.objects.acreate(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+        response = await self.client.get(reverse('purchase-order'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(await caches[authentication.TOKEN_CACHE].aget(authentication._key(token.key)))
+
+        user.is_active = False
+        await user.asave()
+        response = await self.client.get(reverse('purchase-order'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_invalid_token(self):
+        response = await self.client.get(reverse('purchase-order'), headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_errors_match_sync_views(self):
+        requests = [
+            ('post', reverse('purchase-order'), {'data': '{"line_items": [', 'content_type': 'application/json'}),
+            ('get', reverse('purchase-order'), {'headers': {'Authorization': 'Token a b'}}),
+            ('get', reverse('purchase-order'), {'headers': {'Authorization': 'Token nope'}}),
+            ('get', reverse('purchase-order-id', kwargs={'id': 999}), {}),
+            ('patch', reverse('purchase-order-id', kwargs={'id': 999}), {}),
+        ]
+        for method, url, kwargs in requests:
+            async_response = await getattr(self.client, method)(url, **kwargs)
+            with override_settings(ROOT_URLCONF='MainApp.urls'):
+                sync_response = await getattr(self.client, method)(url, **kwargs)
+            self.assertEqual(async_response.status_code, sync_response.status_code)
+            self.assertEqual(async_response.json(), sync_response.json())
+            self.assertEqual(async_response.get('WWW-Authenticate'), sync_response.get('WWW-Authenticate'))
+
+    async def test_cursor_pages(self):
+        for _ in range(3):
+            await self.create_order()
+        response = await self.client.get(reverse('purchase-order'), {'page_size': 2})
+        self.assertEqual(len(response.json()['results']), 2)
+        response = await self.client.get(response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNone(response.json()['next'])
+
+    async def test_invalid_payload(self):
+        response = await self.client.post(reverse('purchase-order'), {"line_items": []}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = await self.client.get(reverse('purchase-order'), {'match': 'fuzzy', 'item_name': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,43 @@
+from decimal import Decimal
+from operator import mul
+from typing import NamedTuple
+
+# LineItem.line_total and the PurchaseOrder totals are stored with two
+# decimal places.
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+class OrderTotals(NamedTuple):
+    line_totals: list
+    total_quantity: int
+    total_amount: Decimal
+    total_tax: Decimal
+
+
+def calculate_line_total(quantity, price_without_tax, tax_amount):
+    return (quantity * (price_without_tax + tax_amount)).quantize(CENT)
+
+
+def calculate_totals(line_items_data):
+    """Compute every line total and the order aggregates in one pass.
+
+    ``line_items_data`` is a sequence of mappings with ``quantity``,
+    ``price_without_tax`` and ``tax_amount`` keys, as produced by
+    ``LineItemPostSerializer``. All arithmetic stays in ``Decimal``, so
+    ``total_amount`` is exactly the sum of the stored ``line_total`` values.
+    """
+    quantities = [int(item["quantity"]) for item in line_items_data]
+    tax_amounts = [item["tax_amount"] for item in line_items_data]
+    line_totals = [
+        calculate_line_total(quantity, item["price_without_tax"], tax_amount)
+        for quantity, item, tax_amount in zip(
+            quantities, line_items_data, tax_amounts
+        )
+    ]
+    return OrderTotals(
+        line_totals=line_totals,
+        total_quantity=sum(quantities),
+        total_amount=sum(line_totals, ZERO),
+        total_tax=sum(map(mul, quantities, tax_amounts), ZERO).quantize(CENT),
+    )
@@ -1,11 +1,47 @@
+from django.conf import settings
 from django.urls import path
-from .views import PurchaseOrderView, PurchaseOrderIDView
-
-urlpatterns = [
-    path("purchase/orders/", PurchaseOrderView.as_view(), name="purchase-order"),
-    path(
-        "purchase/orders/<int:id>/",
-        PurchaseOrderIDView.as_view(),
-        name="purchase-order-id",
-    ),
-]
+
+from .views import (
+    OrderExportView,
+    OrderReportView,
+    PurchaseOrderBatchDeleteView,
+    PurchaseOrderBatchView,
+)
+
+
+def build_urlpatterns(async_views=False):
+    if async_views:
+        from .async_views import (
+            AsyncPurchaseOrderIDView as PurchaseOrderIDView,
+            AsyncPurchaseOrderView as PurchaseOrderView,
+        )
+    else:
+        from .views import PurchaseOrderIDView, PurchaseOrderView
+
+    return [
+        path("purchase/orders/", PurchaseOrderView.as_view(), name="purchase-order"),
+        path(
+            "purchase/orders/batch/",
+            PurchaseOrderBatchView.as_view(),
+            name="purchase-order-batch",
+        ),
+        path(
+            "purchase/orders/batch/delete/",
+            PurchaseOrderBatchDeleteView.as_view(),
+            name="purchase-order-batch-delete",
+        ),
+        path(
+            "purchase/orders/<int:id>/",
+            PurchaseOrderIDView.as_view(),
+            name="purchase-order-id",
+        ),
+        path(
+            "purchase/orders/export/",
+            OrderExportView.as_view(),
+            name="purchase-order-export",
+        ),
+        path("purchase/reports/", OrderReportView.as_view(), name="order-report"),
+    ]
+
+
+urlpatterns = build_urlpatterns(getattr(settings, "SHOP_ASYNC_VIEWS", False))
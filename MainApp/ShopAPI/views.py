@@ -1,22 +1,55 @@
+import hashlib
+
 from rest_framework import status
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from .serializers import (
+    OrderBatchDeleteResultSerializer,
+    OrderBatchDeleteSerializer,
+    OrderExportParametersSerializer,
+    OrderFilterSerializer,
+    OrderReportParametersSerializer,
+    OrderReportSerializer,
     PurchaseOrderMutateSerializer,
     PurchaseOrderSerializer,
+    claim_order,
 )
+from . import batch, deletion, exporting, fieldsets, metrics, reports, search
 from .models import PurchaseOrder
-from drf_spectacular.utils import extend_schema
+from .order_cache import get_order_data
+from .fast_serializers import serialize_orders
+from .pagination import PurchaseOrderCursorPagination
+from .parsers import NDJSONParser
+from .streaming import STREAM_CONTENT_TYPES, aiterate, is_asgi, stream_orders
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import condition
+
 
+def not_found():
+    return Response("Entry not found", status=status.HTTP_404_NOT_FOUND)
 
-def fetch_resource(model_class):
+
+def fetch_resource(resource):
+    """Look up the ``id`` URL kwarg in a model class or queryset."""
     def wrapper(func):
         def inner(*args, **kwargs):
+            if hasattr(resource, "objects"):
+                queryset = resource.objects.all()
+            else:
+                queryset = resource.all()
             try:
-                kwargs["instance"] = model_class.objects.get(id=kwargs.pop("id"))
+                kwargs["instance"] = queryset.get(id=kwargs.pop("id"))
             except ObjectDoesNotExist:
-                return Response("Entry not found", status=status.HTTP_404_NOT_FOUND)
+                return not_found()
             return func(*args, **kwargs)
 
         return inner
@@ -24,6 +57,122 @@ def fetch_resource(model_class):
     return wrapper
 
 
+def order_etag(order_id, version, fields=fieldsets.ORDER_FIELDS):
+    """The ETag of an order's detail response with ``fields``.
+
+    Sparse responses get their fieldset appended, so a client's copy of one
+    shape never validates a request for another.
+    """
+    tag = f"{order_id}-{version}"
+    if fields != fieldsets.ORDER_FIELDS:
+        tag += "-" + "+".join(fields)
+    return quote_etag(tag)
+
+
+def if_match_versions(request, order_id):
+    """Return the order versions ``If-Match`` accepts, or None for any.
+
+    Only the version part of the ETags counts, so the ETag of any fieldset of
+    the current version lets a write through.
+    """
+    header = request.headers.get("If-Match")
+    if header is None:
+        return None
+    etags = parse_etags(header)
+    if etags == ["*"]:
+        return None
+    prefix = f'"{order_id}-'
+    # Weak ETags never match, since If-Match compares strongly.
+    return {
+        int(version)
+        for version in (
+            etag[len(prefix) : -1].split("-")[0]
+            for etag in etags
+            if etag.startswith(prefix)
+        )
+        if version.isdigit()
+    }
+
+
+def _order_state(request, id):
+    # Shared by the ETag, Last-Modified and view code so the lookup runs once.
+    if not hasattr(request, "_order_state"):
+        request._order_state = (
+            PurchaseOrder.objects.filter(id=id)
+            .values_list("version", "updated_at")
+            .first()
+        )
+    return request._order_state
+
+
+def _order_etag(request, id):
+    state = _order_state(request, id)
+    if state is None:
+        return None
+    return order_etag(id, state[0], fieldsets.get_fields(request))
+
+
+def _order_last_modified(request, id):
+    state = _order_state(request, id)
+    return state[1] if state else None
+
+
+def filter_orders(request):
+    supplier_name = request.query_params.get("supplier_name")
+    item_name = request.query_params.get("item_name")
+    match = search.get_match_mode(request)
+    filters = OrderFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+
+    queryset = PurchaseOrder.objects.filter(**filters.validated_data)
+
+    if supplier_name:
+        queryset = search.filter_supplier_name(queryset, supplier_name, match)
+
+    if item_name:
+        queryset = search.filter_item_name(queryset, item_name, match)
+
+    return queryset
+
+
+def page_etag(request, paginator, page):
+    # Every write bumps the version of the orders it touches, so the ids and
+    # versions on the page plus the page links identify the response body.
+    marker = [
+        request.get_full_path(),
+        str(paginator.get_next_link()),
+        str(paginator.get_previous_link()),
+    ]
+    marker += [f"{order.id}-{order.version}" for order in page]
+    digest = hashlib.md5("|".join(marker).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def delete_order(purchase_order, versions=None):
+    """Delete an order if its version is one of ``versions`` (any if None)."""
+    with transaction.atomic():
+        claim_order(purchase_order, versions)
+        deletion.delete_orders(PurchaseOrder.objects.filter(id=purchase_order.id))
+
+
+order_condition = method_decorator(
+    condition(etag_func=_order_etag, last_modified_func=_order_last_modified)
+)
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        str,
+        description="Comma separated: " + ", ".join(fieldsets.ORDER_FIELDS),
+    ),
+    OpenApiParameter(
+        "include",
+        str,
+        description="Comma separated: " + ", ".join(fieldsets.RELATIONS),
+    ),
+]
+
+
 class PurchaseOrderView(APIView):
     @extend_schema(request=PurchaseOrderMutateSerializer)
     def post(self, request, format=None):
@@ -35,48 +184,201 @@ class PurchaseOrderView(APIView):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @extend_schema(responses=PurchaseOrderSerializer)
+    @extend_schema(
+        responses=PurchaseOrderSerializer(many=True),
+        parameters=[
+            OpenApiParameter("cursor", str),
+            OpenApiParameter("page_size", int),
+            OpenApiParameter("stream", str, enum=list(STREAM_CONTENT_TYPES)),
+            OpenApiParameter("supplier_name", str),
+            OpenApiParameter("item_name", str),
+            OpenApiParameter("match", str, enum=list(search.MATCH_MODES)),
+            OrderFilterSerializer,
+            *FIELDSET_PARAMETERS,
+        ],
+    )
     def get(self, request, format=None):
-        supplier_name = request.query_params.get("supplier_name")
-        item_name = request.query_params.get("item_name")
+        stream_format = request.query_params.get("stream")
+        if stream_format and stream_format not in STREAM_CONTENT_TYPES:
+            return Response(
+                f"Unsupported stream format: {stream_format}",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fields = fieldsets.get_fields(request)
+        queryset = fieldsets.select_fields(filter_orders(request), fields)
+
+        if stream_format:
+            # Under ASGI a sync body would be read into memory before sending.
+            return stream_orders(
+                queryset, stream_format, asynchronous=is_asgi(request), fields=fields
+            )
 
-        queryset = PurchaseOrder.objects.all()
+        paginator = PurchaseOrderCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        etag = page_etag(request, paginator, page)
+        # No Last-Modified: deleting an order from the page would not move it.
+        response = get_conditional_response(request, etag)
+        if response is None:
+            with metrics.phase("serialize"):
+                data = serialize_orders(page, fields)
+            response = paginator.get_paginated_response(data)
+        response["ETag"] = etag
+        return response
 
-        if supplier_name:
-            queryset = queryset.filter(supplier__name__icontains=supplier_name)
 
-        if item_name:
-            queryset = queryset.filter(line_items__item_name__icontains=item_name)
+class PurchaseOrderBatchView(APIView):
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @extend_schema(
+        request=PurchaseOrderMutateSerializer(many=True),
+        parameters=[OpenApiParameter("mode", str, enum=list(batch.BATCH_MODES))],
+    )
+    def post(self, request, format=None):
+        mode = batch.get_batch_mode(request)
+        results, created = batch.create_orders(request.data, mode)
+        failed = sum(
+            result["status"] == status.HTTP_400_BAD_REQUEST for result in results
+        )
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {"created": created, "failed": failed, "results": results},
+            status=response_status,
+        )
 
-        serializer = PurchaseOrderSerializer(queryset, many=True)
 
-        return Response(serializer.data)
+class PurchaseOrderBatchDeleteView(APIView):
+    @extend_schema(
+        request=OrderBatchDeleteSerializer,
+        responses=OrderBatchDeleteResultSerializer,
+    )
+    def post(self, request, format=None):
+        serializer = OrderBatchDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        orders = serializer.get_queryset()
+        dry_run = serializer.validated_data["dry_run"]
+        if dry_run:
+            deleted = deletion.count_orders(orders)
+        else:
+            deleted = deletion.delete_orders(orders)
+        return Response({"dry_run": dry_run, **deleted._asdict()})
 
 
 class PurchaseOrderIDView(APIView):
-    @extend_schema(responses=PurchaseOrderSerializer)
-    @fetch_resource(PurchaseOrder)
-    def get(self, request, instance=None):
-        serializer = PurchaseOrderSerializer(instance)
-        return Response(serializer.data)
+    @extend_schema(
+        responses=PurchaseOrderSerializer, parameters=FIELDSET_PARAMETERS
+    )
+    @order_condition
+    def get(self, request, id):
+        state = _order_state(request, id)
+        if state is None:
+            return not_found()
+        version = state[0]
+        fields = fieldsets.get_fields(request)
+        if fields != fieldsets.ORDER_FIELDS:
+            # The cache only holds complete orders; a narrow query is cheaper.
+            queryset = PurchaseOrder.objects.filter(id=id)
+            with metrics.phase("serialize"):
+                data = serialize_orders(
+                    fieldsets.select_fields(queryset, fields), fields
+                )
+            if not data:
+                return not_found()
+            return Response(data[0])
+
+        def serialize():
+            instance = PurchaseOrder.objects.with_related().get(id=id)
+            return PurchaseOrderSerializer(instance).data
+
+        try:
+            with metrics.phase("serialize"):
+                data = get_order_data(id, version, serialize)
+        except ObjectDoesNotExist:
+            return not_found()
+        return Response(data)
 
     @extend_schema(request=PurchaseOrderMutateSerializer)
     @fetch_resource(PurchaseOrder)
     def put(self, request, instance):
         serializer = PurchaseOrderMutateSerializer(
-            instance, data=request.data, partial=True
+            instance,
+            data=request.data,
+            partial=True,
+            context={"if_match": if_match_versions(request, instance.id)},
         )
         if serializer.is_valid():
             try:
                 response_data = serializer.save()
             except KeyError:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            response = Response(response_data, status=status.HTTP_201_CREATED)
+            response["ETag"] = order_etag(instance.id, instance.version)
+            return response
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @fetch_resource(PurchaseOrder)
     def delete(self, request, instance):
-        instance.line_items.all().delete()
-        instance.delete()
+        delete_order(instance, if_match_versions(request, instance.id))
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class OrderReportView(APIView):
+    @extend_schema(
+        parameters=[OrderReportParametersSerializer],
+        responses=OrderReportSerializer(many=True),
+    )
+    def get(self, request, format=None):
+        parameters = OrderReportParametersSerializer(data=request.query_params)
+        parameters.is_valid(raise_exception=True)
+        rows = reports.report(**parameters.validated_data)
+        return Response({"results": OrderReportSerializer(rows, many=True).data})
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """Picks the first renderer whatever the client accepts.
+
+    Exports write their own body and content type; the renderer is only used
+    for error responses, so ``Accept: text/csv`` must not end in a 406.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class OrderExportView(APIView):
+    content_negotiation_class = ExportContentNegotiation
+
+    @extend_schema(
+        parameters=[OrderExportParametersSerializer],
+        responses={
+            (200, content_type): OpenApiTypes.BINARY
+            for content_type in exporting.CONTENT_TYPES.values()
+        },
+    )
+    def get(self, request, format=None):
+        parameters = OrderExportParametersSerializer(data=request.query_params)
+        parameters.is_valid(raise_exception=True)
+        level = parameters.validated_data["level"]
+        output = parameters.validated_data["output"]
+        chunks = exporting.iter_rows(
+            level,
+            parameters.validated_data.get("after_id"),
+            parameters.validated_data.get("since"),
+        )
+        content = exporting.ENCODERS[output](level, chunks)
+        if is_asgi(request):
+            content = aiterate(content)
+        response = StreamingHttpResponse(
+            content, content_type=exporting.CONTENT_TYPES[output]
+        )
+        filename = f"{level}s.{exporting.EXTENSIONS[output]}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
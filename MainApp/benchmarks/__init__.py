@@ -0,0 +1,81 @@
+"""Stand-alone benchmark scripts for the ShopAPI app.
+
+Run them from the ``MainApp`` directory, e.g.::
+
+    python -m benchmarks.bench_order_numbers --processes 8
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+import django
+
+
+def setup_django(database=None):
+    """Configure Django, optionally against a fresh SQLite file.
+
+    Pass ``database=True`` to create a throwaway database in the temp dir, or a
+    path to reuse an existing file. Either is brought up to date with
+    ``migrate``.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MainApp.settings")
+    from django.conf import settings
+
+    if database is True:
+        directory = tempfile.mkdtemp(prefix="shopbench-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        database = os.path.join(directory, "db.sqlite3")
+    if database:
+        settings.DATABASES["default"]["NAME"] = database
+    django.setup()
+    if database:
+        from django.core.management import call_command
+
+        call_command("migrate", verbosity=0)
+    return database
+
+
+class Timer:
+    """Context manager recording the wall-clock seconds spent in its block."""
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = perf_counter() - self.start
+
+
+def seed_orders(orders, lines):
+    """Bulk insert ``orders`` orders of ``lines`` line items; return their ids."""
+    from ShopAPI.models import LineItem, PurchaseOrder, Supplier
+    from ShopAPI.order_numbers import allocate_order_numbers
+
+    supplier = Supplier.objects.create(name="Bench Supplier", email="bench@test.com")
+    numbers = allocate_order_numbers(orders)
+    purchase_orders = PurchaseOrder.objects.bulk_create(
+        PurchaseOrder(
+            supplier=supplier,
+            order_number=number,
+            total_quantity=lines,
+            total_amount=lines * 10.5,
+            total_tax=lines * 0.5,
+        )
+        for number in numbers
+    )
+    LineItem.objects.bulk_create(
+        LineItem(
+            purchase_order=purchase_order,
+            item_name=f"Item {index}",
+            quantity=1,
+            price_without_tax=10,
+            tax_name="GST 5%",
+            tax_amount=0.5,
+            line_total=10.5,
+        )
+        for purchase_order in purchase_orders
+        for index in range(lines)
+    )
+    return [purchase_order.id for purchase_order in purchase_orders]
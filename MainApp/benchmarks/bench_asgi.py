@@ -0,0 +1,111 @@
+"""Throughput of the sync (WSGI) and native async (ASGI) order views.
+
+Seeds a SQLite file, then replays the same mix of list and detail requests
+against each mode in its own process: the sync views through the WSGI handler
+from a thread pool, the async views through the ASGI handler with
+``asyncio.gather``. Reports requests per second and p50/p99 latency.
+
+With SQLite the async ORM still runs each query on Django's single
+thread-sensitive executor, so the numbers mostly show the event loop overhead;
+the gap to measure is against a server database with ``CONN_MAX_AGE`` set.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from benchmarks import Timer, seed_orders, setup_django
+
+
+def _paths(order_ids, requests):
+    rng = random.Random(0)
+    paths = []
+    for _ in range(requests):
+        if rng.random() < 0.2:
+            paths.append("/api/purchase/orders/?page_size=20")
+        else:
+            paths.append(f"/api/purchase/orders/{rng.choice(order_ids)}/")
+    return paths
+
+
+def _run_wsgi(paths, concurrency):
+    from django.test import Client
+
+    client = Client()
+
+    def fetch(path):
+        start = perf_counter()
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+        return perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(fetch, paths))
+
+
+def _run_asgi(paths, concurrency):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(path):
+        async with semaphore:
+            start = perf_counter()
+            response = await client.get(path)
+            assert response.status_code == 200, response.status_code
+            return perf_counter() - start
+
+    async def run():
+        return await asyncio.gather(*(fetch(path) for path in paths))
+
+    return asyncio.run(run())
+
+
+def _worker(args):
+    mode, database, paths, concurrency = args
+    from django.conf import settings
+
+    # Must be set before ShopAPI.urls is imported.
+    setup_django(database)
+    settings.SHOP_ASYNC_VIEWS = mode == "asgi"
+    settings.ALLOWED_HOSTS = ["*"]
+    run = _run_asgi if mode == "asgi" else _run_wsgi
+    run(paths[:50], concurrency)  # warm up caches and the URL resolver
+    with Timer() as timer:
+        latencies = run(paths, concurrency)
+    return timer.seconds, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    options = parser.parse_args()
+
+    database = setup_django(True)
+    order_ids = seed_orders(options.orders, options.lines)
+    paths = _paths(order_ids, options.requests)
+    from django.db import connections
+
+    connections.close_all()
+    context = multiprocessing.get_context("spawn")
+    for mode in ("wsgi", "asgi"):
+        with context.Pool(1) as pool:
+            seconds, latencies = pool.apply(
+                _worker, [(mode, database, paths, options.concurrency)]
+            )
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{mode}: {len(latencies) / seconds:8,.0f} req/s"
+            f"  p50 {quantiles[49] * 1000:6.2f} ms  p99 {quantiles[98] * 1000:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-request cost of DRF's TokenAuthentication and CachedTokenAuthentication.
+
+Creates ``--users`` users with a token each in a throwaway SQLite database and
+authenticates ``--requests`` random tokens with both classes, first on their
+own and then as part of a header-only ``GET /api/purchase/orders/``. The
+token cache starts empty, so its misses are included; the hit rate is
+printed alongside.
+"""
+import argparse
+import random
+
+from benchmarks import Timer, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    setup_django(True)
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+
+    from ShopAPI import authentication
+    from ShopAPI.caching import cache_stats
+    from ShopAPI.views import PurchaseOrderView
+
+    setup_test_environment(debug=False)
+    users = User.objects.bulk_create(
+        User(username=f"user{number}") for number in range(options.users)
+    )
+    keys = [Token.objects.create(user=user).key for user in users]
+    rng = random.Random(options.seed)
+    sample = [rng.choice(keys) for _ in range(options.requests)]
+    classes = {
+        "drf": TokenAuthentication,
+        "cached": authentication.CachedTokenAuthentication,
+    }
+    stats = cache_stats(authentication.TOKEN_CACHE)
+
+    print(f"{'':8} {'lookup us':>10} {'request us':>11} {'hit rate':>9}")
+    for name, auth_class in classes.items():
+        authentication.clear()
+        stats.reset()
+        backend = auth_class()
+        with Timer() as lookup:
+            for key in sample:
+                backend.authenticate_credentials(key)
+        hits = stats.hits / (stats.hits + stats.misses) if stats.hits else 0
+
+        PurchaseOrderView.authentication_classes = [auth_class]
+        client = Client()
+        url = reverse("purchase-order")
+        with Timer() as request:
+            for key in sample:
+                client.get(
+                    url, {"include": ""}, headers={"Authorization": f"Token {key}"}
+                )
+        print(
+            f"{name:8} {lookup.seconds / len(sample) * 1e6:10.1f}"
+            f" {request.seconds / len(sample) * 1e6:11.1f} {hits:9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
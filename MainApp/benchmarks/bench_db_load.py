@@ -0,0 +1,128 @@
+"""Concurrent read/write load test for the SQLite database profile.
+
+Runs ``--processes`` worker processes against one SQLite file for
+``--duration`` seconds each, once with Django's defaults (rollback journal, a
+new connection per request, 5 s lock timeout) and once with
+``DATABASE_PROFILE=production`` (WAL, immediate transactions, persistent
+connections). Each worker sends a mix of order detail reads, list page reads and order creates
+through the full request stack and counts requests per second and failures
+such as "database is locked".
+"""
+import argparse
+import multiprocessing
+import random
+import statistics
+from time import perf_counter
+
+from benchmarks import seed_orders, setup_django
+
+PROFILES = ("default", "production")
+
+
+def _configure(profile, database):
+    import os
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MainApp.settings")
+    # Workers are spawned, so the settings are not loaded yet.
+    os.environ["DATABASE_PROFILE"] = profile
+    from django.conf import settings
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ["*"]
+    return setup_django(database)
+
+
+def _seed(profile, database, orders, lines):
+    _configure(profile, database)
+    return seed_orders(orders, lines)
+
+
+def _worker(args):
+    profile, database, order_ids, duration, write_ratio, seed = args
+    _configure(profile, database)
+    from django.db import OperationalError
+    from django.test import Client
+
+    client = Client()
+    rng = random.Random(seed)
+    payload = {
+        "supplier": {"name": f"Load Supplier {seed}", "email": "load@test.com"},
+        "line_items": [
+            {
+                "item_name": "Load Item",
+                "quantity": 2,
+                "price_without_tax": "10.00",
+                "tax_name": "GST 5%",
+                "tax_amount": "0.50",
+            }
+        ],
+    }
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    latencies = []
+    deadline = perf_counter() + duration
+    while perf_counter() < deadline:
+        write = rng.random() < write_ratio
+        start = perf_counter()
+        try:
+            if write:
+                response = client.post(
+                    "/api/purchase/orders/", payload, content_type="application/json"
+                )
+            elif rng.random() < 0.8:
+                response = client.get(
+                    f"/api/purchase/orders/{rng.choice(order_ids)}/"
+                )
+            else:
+                response = client.get("/api/purchase/orders/?page_size=20")
+            failed = response.status_code >= 500
+        except OperationalError:
+            failed = True
+        latencies.append(perf_counter() - start)
+        if failed:
+            counts["errors"] += 1
+        else:
+            counts["writes" if write else "reads"] += 1
+    return counts, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=10)
+    options = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for profile in PROFILES:
+        # A fresh file per profile, since WAL mode persists in the file.
+        with context.Pool(1) as pool:
+            database = pool.apply(_configure, (profile, True))
+            order_ids = pool.apply(
+                _seed, (profile, database, options.orders, options.lines)
+            )
+        jobs = [
+            (profile, database, order_ids, options.duration, options.write_ratio, n)
+            for n in range(options.processes)
+        ]
+        with context.Pool(options.processes) as pool:
+            results = pool.map(_worker, jobs)
+
+        totals = {
+            key: sum(counts[key] for counts, _ in results) for key in results[0][0]
+        }
+        latencies = [latency for _, worker in results for latency in worker]
+        quantiles = statistics.quantiles(latencies, n=100)
+        requests = totals["reads"] + totals["writes"]
+        print(
+            f"{profile:10} {requests / options.duration:8,.0f} req/s"
+            f"  (reads {totals['reads'] / options.duration:,.0f}/s,"
+            f" writes {totals['writes'] / options.duration:,.0f}/s)"
+            f"  errors {totals['errors']:5}"
+            f"  p50 {quantiles[49] * 1000:6.1f} ms  p99 {quantiles[98] * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
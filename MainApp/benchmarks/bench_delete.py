@@ -0,0 +1,67 @@
+"""Purge a range of orders one by one and with ``deletion.delete_orders``.
+
+Seeds ``--orders`` orders of ``--lines`` line items, with their search entries
+and rollups, into a throwaway SQLite database. The first ``--baseline`` orders
+are deleted the way ``DELETE /purchase/orders/<id>/`` used to: load the line
+items, update the rollups, then ``QuerySet.delete()`` and ``Model.delete()``.
+The rest go in one :func:`ShopAPI.deletion.delete_orders` call. Both rates are
+printed in orders per second.
+"""
+import argparse
+
+from benchmarks import Timer, seed_orders, setup_django
+
+
+def delete_one(purchase_order):
+    from django.db import transaction
+
+    from ShopAPI import reports
+    from ShopAPI.models import LineItem
+
+    with transaction.atomic():
+        line_items = list(purchase_order.line_items.all())
+        rollups = reports.Rollups()
+        rollups.remove_order(purchase_order, line_items)
+        rollups.save()
+        LineItem.objects.filter(purchase_order=purchase_order).delete()
+        purchase_order.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--baseline", type=int, default=2_000)
+    options = parser.parse_args()
+
+    setup_django(True)
+    from django.db import transaction
+
+    from ShopAPI import deletion, reports, search
+    from ShopAPI.models import LineItem, PurchaseOrder
+
+    order_ids = seed_orders(options.orders, options.lines)
+    search.index_new_orders(
+        LineItem.objects.values_list("purchase_order_id", "item_name")
+    )
+    with transaction.atomic():
+        reports.rebuild()
+    split = order_ids[min(options.baseline, len(order_ids) - 1)]
+
+    with Timer() as baseline:
+        for purchase_order in PurchaseOrder.objects.filter(id__lt=split):
+            delete_one(purchase_order)
+    with Timer() as fast:
+        deleted = deletion.delete_orders(PurchaseOrder.objects.filter(id__gte=split))
+
+    print(f"{'':16} {'orders':>8} {'seconds':>8} {'orders/s':>10}")
+    for name, count, timer in (
+        ("one by one", split - order_ids[0], baseline),
+        ("delete_orders", deleted.orders, fast),
+    ):
+        rate = count / timer.seconds
+        print(f"{name:16} {count:8} {timer.seconds:8.2f} {rate:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
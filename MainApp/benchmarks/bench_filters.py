@@ -0,0 +1,135 @@
+"""Latency of the order list filters with and without the composite indexes.
+
+Seeds a throwaway SQLite database with ``--orders`` orders (1M by default)
+spread over a year and ``--suppliers`` suppliers, then times the first page of
+``GET /api/purchase/orders/?include=`` for a few filters. The filters are timed
+twice: with the indexes of ``PurchaseOrder.Meta`` and after swapping them for
+the single ``supplier_id`` index the table had before.
+"""
+import argparse
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from benchmarks import Timer, setup_django
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def seed(orders, suppliers, seed=0):
+    from django.db import transaction
+
+    from ShopAPI import bulk
+    from ShopAPI.models import PurchaseOrder, Supplier
+
+    rng = random.Random(seed)
+    step = timedelta(days=365) / orders
+    with transaction.atomic():
+        Supplier.objects.bulk_create(
+            Supplier(name=f"Supplier {i:05d}", email=f"supplier{i}@example.com")
+            for i in range(suppliers)
+        )
+        supplier_ids = list(Supplier.objects.values_list("id", flat=True))
+        # Raw rows, since bulk_create() would stamp every order_time with now.
+        for start in range(0, orders, 10_000):
+            bulk.insert_rows(
+                PurchaseOrder,
+                (
+                    "supplier",
+                    "order_time",
+                    "order_number",
+                    "total_quantity",
+                    "total_amount",
+                    "total_tax",
+                    "version",
+                    "updated_at",
+                ),
+                [
+                    (
+                        rng.choice(supplier_ids),
+                        (START + number * step).isoformat(),
+                        number + 1,
+                        1,
+                        str(Decimal(rng.randrange(100, 100_000)) / 100),
+                        "0.00",
+                        1,
+                        START.isoformat(),
+                    )
+                    for number in range(start, min(start + 10_000, orders))
+                ],
+            )
+
+
+def use_old_indexes():
+    """Drop the Meta indexes and restore the foreign key's own index."""
+    from django.db import connection, models
+
+    from ShopAPI.models import PurchaseOrder
+
+    supplier = PurchaseOrder._meta.get_field("supplier")
+    with connection.schema_editor() as editor:
+        for index in PurchaseOrder._meta.indexes:
+            editor.remove_index(PurchaseOrder, index)
+        editor.add_index(PurchaseOrder, models.Index(fields=[supplier.name]))
+
+
+def time_page(client, url, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            response = client.get(url, {"include": "", **params})
+        assert response.status_code == 200, response.content
+        timings.append(timer.seconds * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--suppliers", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django(True)
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    setup_test_environment(debug=False)
+    with Timer() as timer:
+        seed(options.orders, options.suppliers)
+    print(f"seeded {options.orders:,} orders in {timer.seconds:.1f}s")
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    month = {
+        "order_time__gte": (START + timedelta(days=180)).isoformat(),
+        "order_time__lt": (START + timedelta(days=210)).isoformat(),
+    }
+    day = {
+        "order_time__gte": (START + timedelta(days=180)).isoformat(),
+        "order_time__lt": (START + timedelta(days=181)).isoformat(),
+    }
+    cases = [
+        ("supplier", {"supplier_id": 42}),
+        ("one day", day),
+        ("one month", month),
+        ("supplier, one month", {"supplier_id": 42, **month}),
+        ("total_amount 500-501", {"total_amount__gte": 500, "total_amount__lte": 501}),
+    ]
+    client = Client()
+    url = reverse("purchase-order")
+    indexed = {
+        name: time_page(client, url, params, options.repeat) for name, params in cases
+    }
+    use_old_indexes()
+    print(f"{'filter':<22} {'before ms':>10} {'indexed ms':>11}")
+    for name, params in cases:
+        before = time_page(client, url, params, options.repeat)
+        print(f"{name:<22} {before:10.2f} {indexed[name]:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Stress test for order number allocation across processes.
+
+Every worker process allocates numbers one at a time (as ``PurchaseOrder.save``
+does) and in blocks (as bulk imports do) against a shared SQLite file. The run
+fails if any number is handed out twice and reports allocations per second.
+"""
+import argparse
+import multiprocessing
+
+from benchmarks import Timer, setup_django
+
+
+def _worker(args):
+    database, single, batches, batch_size = args
+    setup_django(database)
+    from ShopAPI.order_numbers import allocate_order_numbers
+
+    numbers = []
+    for _ in range(single):
+        numbers.extend(allocate_order_numbers(1))
+    for _ in range(batches):
+        numbers.extend(allocate_order_numbers(batch_size))
+    return numbers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--single", type=int, default=500)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    options = parser.parse_args()
+
+    database = setup_django(True)
+    from django.db import connections
+
+    connections.close_all()
+    jobs = [(database, options.single, options.batches, options.batch_size)]
+    with multiprocessing.Pool(options.processes) as pool, Timer() as timer:
+        results = pool.map(_worker, jobs * options.processes)
+
+    numbers = [number for result in results for number in result]
+    duplicates = len(numbers) - len(set(numbers))
+    calls = options.processes * (options.single + options.batches)
+    print(f"processes:           {options.processes}")
+    print(f"numbers allocated:   {len(numbers)}")
+    print(f"duplicates:          {duplicates}")
+    print(f"allocation calls/s:  {calls / timer.seconds:,.0f}")
+    print(f"numbers/s:           {len(numbers) / timer.seconds:,.0f}")
+    if duplicates:
+        raise SystemExit("duplicate order numbers were allocated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Bytes per second of DRF's JSONRenderer and ShopAPI's FastJSONRenderer.
+
+Renders large list responses: a page of ``--orders`` orders as the list
+endpoint returns them (strings and integers only), and the same orders in the
+``purchase_order_formatter`` shape of create responses, which is full of
+``Decimal`` and ``datetime`` values. Both renderers see identical data and
+must produce identical bytes.
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+
+def make_orders(count, lines, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    orders = []
+    for order_id in range(1, count + 1):
+        line_items = [
+            {
+                "id": order_id * lines + index,
+                "item_name": f"Item {rng.randrange(1000)}",
+                "quantity": rng.randrange(1, 50),
+                "price_without_tax": Decimal(rng.randrange(1, 100000)) / 100,
+                "tax_name": "GST 5%",
+                "tax_amount": Decimal(rng.randrange(0, 5000)) / 100,
+                "line_total": Decimal(rng.randrange(1, 10**7)) / 100,
+            }
+            for index in range(lines)
+        ]
+        orders.append(
+            {
+                "id": order_id,
+                "supplier": {"id": 1, "name": "Bench Supplier", "email": "b@test.com"},
+                "order_number": order_id,
+                "order_time": start + timedelta(seconds=order_id * 37),
+                "total_amount": sum(line["line_total"] for line in line_items),
+                "total_quantity": sum(line["quantity"] for line in line_items),
+                "total_tax": Decimal(rng.randrange(0, 10**6)) / 100,
+                "line_items": line_items,
+            }
+        )
+    return orders
+
+
+def as_strings(value):
+    # What the DRF serializers emit: Decimal and datetime already formatted.
+    if isinstance(value, dict):
+        return {key: as_strings(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [as_strings(item) for item in value]
+    if isinstance(value, Decimal):
+        return f"{value:f}"
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--number", type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from ShopAPI import renderers
+
+    orders = make_orders(options.orders, options.lines)
+    payloads = {
+        "list page": {"next": None, "previous": None, "results": as_strings(orders)},
+        "formatter": {"results": orders},
+    }
+    candidates = {"drf": JSONRenderer(), "stdlib": renderers.StdlibJSONRenderer()}
+    if renderers.orjson is not None:
+        candidates["orjson"] = renderers.FastJSONRenderer()
+    else:
+        print("orjson is not installed; only the fallback is measured")
+
+    for name, payload in payloads.items():
+        expected = JSONRenderer().render(payload)
+        print(f"{name}: {len(expected) / 1e6:.1f} MB")
+        for renderer_name, renderer in candidates.items():
+            if renderer.render(payload) != expected:
+                raise SystemExit(f"{renderer_name} output differs from DRF's")
+            seconds = min(
+                timeit.repeat(
+                    lambda: renderer.render(payload), number=1, repeat=options.number
+                )
+            )
+            print(
+                f"  {renderer_name:7} {seconds * 1000:8.1f} ms"
+                f"  {len(expected) / seconds / 1e6:8.1f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Latency of the supplier_name / item_name filters with and without the index.
+
+Seeds a throwaway SQLite database (1M line items by default), builds the search
+index and times the first page of ``GET /api/purchase/orders/`` for a few
+queries, using the previous ``icontains`` join and ``ShopAPI.search``.
+"""
+import argparse
+import random
+import statistics
+from decimal import Decimal
+
+from benchmarks import Timer, setup_django
+
+ADJECTIVES = ["Blue", "Red", "Large", "Small", "Steel", "Plastic", "Heavy", "Spare"]
+NOUNS = ["Widget", "Gadget", "Bolt", "Washer", "Bracket", "Hinge", "Panel", "Valve"]
+
+
+def catalogue(size, rng):
+    """Item names as a shop would have them: a fixed set of products."""
+    return [
+        f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {code:06d}"
+        for code in rng.sample(range(1_000_000), size)
+    ]
+
+
+def seed(orders, lines, suppliers, products, seed=0):
+    from django.db import transaction
+
+    from ShopAPI.models import LineItem, PurchaseOrder, Supplier
+
+    rng = random.Random(seed)
+    item_names = catalogue(products, rng)
+    with transaction.atomic():
+        Supplier.objects.bulk_create(
+            Supplier(name=f"Supplier {i:05d}", email=f"supplier{i}@example.com")
+            for i in range(suppliers)
+        )
+        supplier_ids = list(Supplier.objects.values_list("id", flat=True))
+        PurchaseOrder.objects.bulk_create(
+            (
+                PurchaseOrder(
+                    supplier_id=rng.choice(supplier_ids),
+                    order_number=number,
+                    total_quantity=lines,
+                    total_amount=Decimal("0.00"),
+                    total_tax=Decimal("0.00"),
+                )
+                for number in range(1, orders + 1)
+            ),
+            batch_size=5000,
+        )
+        order_ids = list(PurchaseOrder.objects.values_list("id", flat=True))
+        price = Decimal("1.00")
+        tax = Decimal("0.05")
+        LineItem.objects.bulk_create(
+            (
+                LineItem(
+                    purchase_order_id=order_id,
+                    item_name=rng.choice(item_names),
+                    quantity=1,
+                    price_without_tax=price,
+                    tax_name="GST 5%",
+                    tax_amount=tax,
+                    line_total=price + tax,
+                )
+                for order_id in order_ids
+                for _ in range(lines)
+            ),
+            batch_size=5000,
+        )
+
+
+def time_query(build, repeat):
+    timings = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            list(build().order_by("order_number")[:11])
+        timings.append(timer.seconds * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--suppliers", type=int, default=1_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django(True)
+    from django.core.management import call_command
+
+    from ShopAPI import search
+    from ShopAPI.models import LineItem, PurchaseOrder
+
+    with Timer() as timer:
+        seed(options.orders, options.lines, options.suppliers, options.products)
+    print(f"seeded {LineItem.objects.count():,} line items in {timer.seconds:.1f}s")
+    with Timer() as timer:
+        call_command("rebuild_search_index", verbosity=0)
+    print(f"built the search index in {timer.seconds:.1f}s")
+
+    rare_item = LineItem.objects.order_by("?").values_list("item_name", flat=True)[0]
+    cases = [
+        ("item_name", rare_item.split()[-1], search.CONTAINS),
+        ("item_name", rare_item, search.EXACT),
+        ("item_name", rare_item.split()[-1][:4], search.PREFIX),
+        ("item_name", "no such item", search.CONTAINS),
+        ("supplier_name", "Supplier 0042", search.CONTAINS),
+        ("supplier_name", "supplier 004", search.PREFIX),
+    ]
+    legacy_lookups = {
+        "item_name": "line_items__item_name__icontains",
+        "supplier_name": "supplier__name__icontains",
+    }
+    filters = {
+        "item_name": search.filter_item_name,
+        "supplier_name": search.filter_supplier_name,
+    }
+    print(f"{'filter':<45} {'icontains ms':>13} {'indexed ms':>11}")
+    for field, value, mode in cases:
+        legacy = time_query(
+            lambda: PurchaseOrder.objects.filter(**{legacy_lookups[field]: value}),
+            options.repeat,
+        )
+        indexed = time_query(
+            lambda: filters[field](PurchaseOrder.objects.all(), value, mode),
+            options.repeat,
+        )
+        label = f"{field}={value!r} ({mode})"
+        print(f"{label:<45} {legacy:13.2f} {indexed:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
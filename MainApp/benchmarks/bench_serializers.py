@@ -0,0 +1,61 @@
+"""Rows per second of the DRF order serializer and the fast path.
+
+Seeds a SQLite file with ``--orders`` orders of ``--lines`` line items and
+serializes all of them, in pages of ``--page-size`` like the list endpoint,
+with ``PurchaseOrderSerializer`` (prefetched line items) and with
+``ShopAPI.fast_serializers.serialize_orders``. Query time is included in both.
+"""
+import argparse
+import json
+
+from benchmarks import Timer, seed_orders, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    options = parser.parse_args()
+
+    setup_django(True)
+    seed_orders(options.orders, options.lines)
+    from ShopAPI.fast_serializers import serialize_orders
+    from ShopAPI.models import PurchaseOrder
+    from ShopAPI.serializers import PurchaseOrderSerializer
+
+    def pages(queryset):
+        queryset = queryset.order_by("order_number")
+        for start in range(0, options.orders, options.page_size):
+            yield queryset[start : start + options.page_size]
+
+    def drf():
+        for page in pages(PurchaseOrder.objects.with_related()):
+            yield PurchaseOrderSerializer(page, many=True).data
+
+    def fast():
+        for page in pages(PurchaseOrder.objects.select_related("supplier")):
+            yield serialize_orders(page)
+
+    first_page = next(drf()), next(fast())
+    if json.dumps(first_page[0]) != json.dumps(first_page[1]):
+        raise SystemExit("the fast serializer output differs from DRF's")
+
+    rows = options.orders * (options.lines + 1)
+    print(f"{options.orders} orders x {options.lines} line items")
+    for name, serializer in (("drf", drf), ("fast", fast)):
+        best = None
+        for _ in range(options.repeat):
+            with Timer() as timer:
+                for _ in serializer():
+                    pass
+            best = min(best or timer.seconds, timer.seconds)
+        print(
+            f"{name:5} {best:7.2f} s  {options.orders / best:10,.0f} orders/s"
+            f"  {rows / best:12,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
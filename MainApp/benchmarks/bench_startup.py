@@ -0,0 +1,147 @@
+"""Startup time and first-request latency of ``MainApp.wsgi`` and ``MainApp.asgi``.
+
+Every run is a fresh Python process that imports the entry point, then sends
+it ``GET /api/purchase/orders/?include=`` and ``GET /schema/`` twice each,
+without a server in between. Runs cover both entry points in the full and the
+API-only (``SHOP_API_ONLY=1``) configuration, with and without the schema
+artifact of ``build_schema``. Medians of ``--runs`` processes are printed:
+import time, first and second request to each URL, and peak RSS.
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+URLS = {"orders": ("/api/purchase/orders/", "include="), "schema": ("/schema/", "")}
+
+
+def wsgi_get(application, path, query):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {"PATH_INFO": path, "QUERY_STRING": query, "HTTP_HOST": "localhost"}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = b"".join(
+        application(environ, lambda status, headers: statuses.append(status))
+    )
+    return int(statuses[0].split()[0]), body
+
+
+def asgi_get(application, path, query):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client never disconnects; Django cancels this once it responds.
+        await asyncio.Future()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], body
+
+
+def child(entry):
+    """Measure one process; the result goes to stdout as JSON."""
+    start = perf_counter()
+    if entry == "wsgi":
+        from MainApp.wsgi import application
+
+        get = wsgi_get
+    else:
+        from MainApp.asgi import application
+
+        get = asgi_get
+    result = {"import": perf_counter() - start}
+    for name, (path, query) in URLS.items():
+        for attempt in ("first", "second"):
+            start = perf_counter()
+            status, _ = get(application, path, query)
+            assert status == 200, (path, status)
+            result[f"{name} {attempt}"] = perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["rss"] = rss * 1024
+    json.dump(result, sys.stdout)
+
+
+def run(entry, environ):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", entry],
+        env=environ,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=("wsgi", "asgi"), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.child:
+        return child(options.child)
+
+    directory = tempfile.mkdtemp(prefix="shopbench-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    artifact = os.path.join(directory, "openapi.json")
+    environ = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "MainApp.settings",
+        "SQLITE_PATH": os.path.join(directory, "db.sqlite3"),
+        "SHOP_SCHEMA_FILE": artifact,
+    }
+    for command in (["migrate"], ["build_schema"]):
+        subprocess.run(
+            [sys.executable, "manage.py", *command, "-v", "0"],
+            env=environ,
+            check=True,
+            stderr=subprocess.DEVNULL,
+        )
+    configurations = {
+        "full": {"SHOP_API_ONLY": "0", "SHOP_SCHEMA_FILE": artifact + ".missing"},
+        "full+artifact": {"SHOP_API_ONLY": "0"},
+        "api-only+artifact": {"SHOP_API_ONLY": "1"},
+    }
+
+    columns = ["import", *(f"{n} {a}" for n in URLS for a in ("first", "second"))]
+    print(f"{'':24}" + "".join(f"{c:>14}" for c in columns) + f"{'RSS MB':>9}")
+    for entry in ("wsgi", "asgi"):
+        for name, overrides in configurations.items():
+            environ_overrides = {**environ, **overrides}
+            results = [run(entry, environ_overrides) for _ in range(options.runs)]
+            timings = "".join(
+                f"{statistics.median(r[c] for r in results) * 1000:11.1f} ms"
+                for c in columns
+            )
+            rss = statistics.median(r["rss"] for r in results) / 2**20
+            print(f"{entry + ' ' + name:24}{timings}{rss:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
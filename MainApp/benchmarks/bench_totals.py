@@ -0,0 +1,73 @@
+"""Micro-benchmark for order total calculation on large orders.
+
+Compares ``ShopAPI.totals.calculate_totals`` with the per-item float loop the
+serializers used before, and reports how far the float totals drift from the
+exact Decimal ones.
+"""
+import argparse
+import random
+import timeit
+from decimal import Decimal
+
+from ShopAPI.totals import calculate_totals
+
+
+def float_loop(line_items_data):
+    """The previous serializer implementation, kept as the baseline."""
+    _total_amount = 0
+    _total_quantity = 0
+    _total_tax = 0
+    line_totals = []
+    for line_item_data in line_items_data:
+        _total_amount += int(line_item_data["quantity"]) * (
+            float(line_item_data["price_without_tax"])
+            + float(line_item_data["tax_amount"])
+        )
+        _total_quantity += int(line_item_data["quantity"])
+        _total_tax += int(line_item_data["quantity"]) * float(
+            line_item_data["tax_amount"]
+        )
+        # LineItem.save() then recomputed the line total in Decimal.
+        line_totals.append(
+            line_item_data["quantity"]
+            * (line_item_data["price_without_tax"] + line_item_data["tax_amount"])
+        )
+    return line_totals, _total_quantity, _total_amount, _total_tax
+
+
+def make_line_items(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "quantity": rng.randint(1, 50),
+            "price_without_tax": Decimal(rng.randint(1, 100_000)).scaleb(-2),
+            "tax_amount": Decimal(rng.randint(0, 5_000)).scaleb(-2),
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    options = parser.parse_args()
+
+    line_items_data = make_line_items(options.lines)
+    candidates = (("float loop", float_loop), ("calculate_totals", calculate_totals))
+    for name, func in candidates:
+        seconds = timeit.timeit(lambda: func(line_items_data), number=options.repeat)
+        per_order = seconds / options.repeat
+        print(
+            f"{name:<17} {per_order * 1000:8.2f} ms/order "
+            f"{options.lines / per_order:12,.0f} lines/s"
+        )
+
+    exact = calculate_totals(line_items_data)
+    _, _, float_amount, float_tax = float_loop(line_items_data)
+    print(f"float amount drift: {Decimal(float_amount) - exact.total_amount:.2E}")
+    print(f"float tax drift:    {Decimal(float_tax) - exact.total_tax:.2E}")
+
+
+if __name__ == "__main__":
+    main()